@@ -0,0 +1,51 @@
+"""Бенчмарки горячих путей на SQLite в памяти.
+
+Запуск: python -m benchmarks.<имя модуля>
+"""
+from contextlib import contextmanager
+import time
+
+from sqlalchemy import event
+
+from portfolio_tracker.app import create_app, db
+from portfolio_tracker.settings import Config
+
+
+class BenchmarkConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SERVER_NAME = 'Dev'
+
+    CRYPTO_PREFIX = ''
+    STOCKS_PREFIX = ''
+    CURRENCY_PREFIX = 'currency_'
+
+
+app = create_app(BenchmarkConfig)
+
+
+@contextmanager
+def measure():
+    """Время выполнения блока, количество SQL запросов и наборов параметров
+    (executemany считается одним запросом с несколькими наборами)."""
+    result = {'statements': 0, 'parameters': 0, 'seconds': 0.0}
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context,
+                              executemany):
+        result['statements'] += 1
+        result['parameters'] += len(parameters) if executemany else 1
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result['seconds'] = time.perf_counter() - start
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def report(name: str, result: dict) -> None:
+    print(f"{name:<40} {result['seconds']:>9.3f} сек. "
+          f"{result['statements']:>7} запросов "
+          f"{result['parameters']:>7} наборов параметров")
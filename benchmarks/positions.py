@@ -0,0 +1,95 @@
+"""Пересчет активов пользователя: последовательное применение транзакций
+против сгруппированных сумм в базе."""
+import random
+
+from portfolio_tracker.portfolio.models import Asset, Portfolio, Ticker, \
+    Transaction
+from portfolio_tracker.user.models import User
+from portfolio_tracker.wallet.models import Wallet, WalletAsset
+from benchmarks import app, db, measure, report
+
+TICKERS = 50
+PORTFOLIOS = 5
+
+
+def fill(count: int) -> None:
+    db.drop_all()
+    db.create_all()
+    db.session.add(User(id=1, email='bench@example.com', password=''))
+    db.session.execute(db.insert(Ticker), [
+        {'id': f'coin-{n}', 'name': f'Coin {n}', 'symbol': f'c{n}',
+         'market': 'crypto', 'price': random.uniform(1, 100)}
+        for n in range(TICKERS)] + [
+        {'id': 'usdt', 'name': 'Tether', 'symbol': 'usdt', 'market': 'crypto',
+         'price': 1}])
+    db.session.add_all([Portfolio(id=n, user_id=1, market='crypto',
+                                  name=f'Portfolio {n}')
+                        for n in range(1, PORTFOLIOS + 1)])
+    db.session.add(Wallet(id=1, user_id=1, name='Wallet'))
+
+    rows = []
+    for _ in range(count):
+        ticker_id = f'coin-{random.randrange(TICKERS)}'
+        quantity = random.uniform(-1, 1)
+        price = random.uniform(1, 100)
+        rows.append({
+            'type': 'Buy' if quantity > 0 else 'Sell',
+            'portfolio_id': random.randint(1, PORTFOLIOS), 'wallet_id': 1,
+            'ticker_id': ticker_id, 'ticker2_id': 'usdt',
+            'quantity': quantity, 'quantity2': -quantity * price,
+            'price': price, 'price_usd': price,
+            'order': random.random() < 0.1})
+    db.session.execute(db.insert(Transaction), rows)
+
+    # Активы, как их создает интерфейс
+    db.session.execute(db.insert(Asset), [
+        {'portfolio_id': p, 'ticker_id': t}
+        for p in range(1, PORTFOLIOS + 1)
+        for t in [f'coin-{n}' for n in range(TICKERS)] + ['usdt']])
+    db.session.execute(db.insert(WalletAsset), [
+        {'wallet_id': 1, 'ticker_id': t}
+        for t in [f'coin-{n}' for n in range(TICKERS)] + ['usdt']])
+    db.session.commit()
+
+
+def replay() -> None:
+    """Прежний пересчет: сброс активов и применение каждой транзакции"""
+    user = db.session.get(User, 1)
+    transactions = []
+    for p in user.portfolios:
+        for a in p.assets:
+            a.service.set_default_data()
+        for t in p.transactions:
+            if t not in transactions:
+                transactions.append(t)
+    for w in user.wallets:
+        for a in w.assets:
+            a.service.set_default_data()
+        for t in w.transactions:
+            if t not in transactions:
+                transactions.append(t)
+    for t in transactions:
+        t.service.update_dependencies()
+    db.session.commit()
+
+
+def engine() -> None:
+    db.session.get(User, 1).service.recalculate()
+    db.session.commit()
+
+
+def main() -> None:
+    with app.app_context():
+        for count, funcs in ((10_000, (('Применение транзакций', replay),
+                                       ('Суммы в базе', engine))),
+                             (100_000, (('Суммы в базе', engine),))):
+            for name, func in funcs:
+                fill(count)
+                db.session.remove()
+                with measure() as result:
+                    func()
+                report(f'{count} транзакций. {name}', result)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""Сопоставление тикеров загрузчиком: перебор списка против индекса.
+
+Полный проход загрузчика: каждый тикер из ответа ищется среди тикеров рынка
+и исключается из ненайденных. Перебор растет квадратично, индекс - линейно.
+"""
+import random
+import time
+
+from portfolio_tracker.admin.services.other_services import TickersIndex
+from portfolio_tracker.general_functions import add_prefix
+from portfolio_tracker.portfolio.models import Ticker
+from benchmarks import app
+
+MARKET = 'crypto'
+
+
+def linear_scan(tickers: list[Ticker], external_ids: list[str]) -> None:
+    not_found_ids = [ticker.id for ticker in tickers]
+    for external_id in external_ids:
+        ticker_id = add_prefix(external_id, MARKET)
+        ticker = next((t for t in tickers if t.id == ticker_id), None)
+        if ticker and ticker.id in not_found_ids:
+            not_found_ids.remove(ticker.id)
+
+
+def index(tickers: list[Ticker], external_ids: list[str]) -> None:
+    tickers_index = TickersIndex(tickers, MARKET)
+    for external_id in external_ids:
+        tickers_index.get_or_create(external_id)
+
+
+def main() -> None:
+    with app.app_context():
+        for count in (1_000, 2_000, 4_000, 8_000, 20_000):
+            tickers = [Ticker(id=f'coin-{n}', market=MARKET)
+                       for n in range(count)]
+            external_ids = [ticker.id for ticker in tickers]
+            random.shuffle(external_ids)
+
+            for name, func in (('Перебор списка', linear_scan),
+                               ('Индекс', index)):
+                start = time.perf_counter()
+                func(tickers, external_ids)
+                seconds = time.perf_counter() - start
+                print(f'{count} тикеров. {name:<30} {seconds:>9.3f} сек.')
+
+
+if __name__ == '__main__':
+    main()
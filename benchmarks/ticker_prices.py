@@ -0,0 +1,46 @@
+"""Запись цен тикеров: по одному ORM объекту против массового UPDATE."""
+import random
+
+from portfolio_tracker.admin.services.other_services import get_tickers, \
+    get_tickers_ids
+from portfolio_tracker.portfolio.models import Ticker
+from portfolio_tracker.portfolio.repository import TickerRepository
+from benchmarks import app, db, measure, report
+
+
+def fill(count: int) -> None:
+    db.drop_all()
+    db.create_all()
+    db.session.execute(db.insert(Ticker), [
+        {'id': f'coin-{n}', 'name': f'Coin {n}', 'symbol': f'c{n}',
+         'market': 'crypto', 'market_cap_rank': n, 'price': 0}
+        for n in range(count)])
+    db.session.commit()
+
+
+def orm_objects() -> None:
+    for ticker in get_tickers('crypto'):
+        ticker.price = random.random()
+    db.session.commit()
+
+
+def bulk_update() -> None:
+    ids = get_tickers_ids('crypto')
+    TickerRepository.update_prices({ticker_id: random.random()
+                                    for ticker_id in ids})
+
+
+def main() -> None:
+    with app.app_context():
+        for count in (10_000, 50_000):
+            for name, func in (('ORM объекты', orm_objects),
+                               ('Массовое обновление', bulk_update)):
+                fill(count)
+                db.session.remove()
+                with measure() as result:
+                    func()
+                report(f'{count} тикеров. {name}', result)
+
+
+if __name__ == '__main__':
+    main()
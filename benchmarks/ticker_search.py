@@ -0,0 +1,101 @@
+"""Поиск тикеров при добавлении актива: LIKE '%x%' с OFFSET против индекса.
+
+Время одной страницы (20 тикеров) для разных запросов на первой и далекой
+странице. Индекс строится один раз на процесс, время построения выводится
+отдельно.
+"""
+import random
+import time
+
+from portfolio_tracker.portfolio.models import Ticker
+from portfolio_tracker.services.ticker_search import PER_PAGE, TickerEntry, \
+    TickerIndex
+from benchmarks import app, db, measure, report
+
+MARKET = 'crypto'
+COUNT = 50_000
+SYLLABLES = ('bit', 'coin', 'eth', 'sol', 'do', 'ge', 'chain', 'link',
+             'ma', 'ti', 'ka', 'ra', 'swap', 'fi', 'nu', 'zo')
+QUERIES = ('', 'b', 'coin', 'chainlink', 'swapfi', 'qwerty')
+DEEP_PAGE = 100
+
+
+def fill() -> None:
+    db.drop_all()
+    db.create_all()
+    random.seed(1)
+    rows = []
+    for n in range(COUNT):
+        name = ''.join(random.choices(SYLLABLES, k=random.randint(2, 4)))
+        rows.append({'id': f'coin-{n}', 'name': name.title(),
+                     'symbol': name[:random.randint(3, 5)], 'market': MARKET,
+                     'market_cap_rank': n or None, 'price': 0})
+    db.session.execute(db.insert(Ticker), rows)
+    db.session.commit()
+
+
+def like_offset(search: str, page: int) -> list:
+    """Прежний запрос: вхождение через LIKE и OFFSET"""
+    select = db.select(Ticker).where(Ticker.market == MARKET)
+    select = select.order_by(Ticker.market_cap_rank.is_(None),
+                             Ticker.market_cap_rank.asc())
+    if search:
+        select = select.filter(Ticker.name.contains(search) |
+                               Ticker.symbol.contains(search))
+    return db.paginate(select, page=page, per_page=PER_PAGE,
+                       error_out=False).items
+
+
+def build_index() -> TickerIndex:
+    select = (db.select(Ticker.id, Ticker.symbol, Ticker.name,
+                        Ticker.market_cap_rank, Ticker.image, Ticker.market)
+              .where(Ticker.market == MARKET))
+    return TickerIndex(TickerEntry(*row) for row in db.session.execute(select))
+
+
+def index_page(index: TickerIndex, search: str, page: int) -> list:
+    # Ключ последнего тикера предыдущей страницы (как его передает клиент)
+    tickers, after = [], None
+    for _ in range(page):
+        if tickers:
+            after = tickers[-1].cursor
+        tickers, _ = index.search(search, after)
+    return tickers
+
+
+def main() -> None:
+    with app.app_context():
+        fill()
+        db.session.remove()
+
+        with measure() as result:
+            index = build_index()
+        report(f'{COUNT} тикеров. Построение индекса', result)
+
+        for search in QUERIES:
+            for page in (1, DEEP_PAGE):
+                db.session.remove()
+                with measure() as result:
+                    expected = like_offset(search, page)
+                report(f'"{search}" стр. {page}. LIKE + OFFSET', result)
+
+                # Далекая страница - время только последнего запроса
+                after = None
+                if page > 1:
+                    previous = index_page(index, search, page - 1)
+                    if not previous:
+                        continue
+                    after = previous[-1].cursor
+                start = time.perf_counter()
+                tickers, _ = index.search(search, after)
+                seconds = time.perf_counter() - start
+                label = f'"{search}" стр. {page}. Индекс'
+                print(f'{label:<40} {seconds:>9.4f} сек.')
+
+                # Без точных совпадений символа порядок одинаковый
+                if search not in index.symbols:
+                    assert [t.id for t in tickers] == [t.id for t in expected]
+
+
+if __name__ == '__main__':
+    main()
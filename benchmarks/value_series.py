@@ -0,0 +1,98 @@
+"""Динамика стоимости портфеля: 50 тикеров за 5 лет - полный расчет и
+досчет из кэша после новой транзакции."""
+from datetime import datetime, timedelta
+import random
+from unittest.mock import patch
+
+from portfolio_tracker.portfolio.models import Portfolio, Ticker, Transaction
+from portfolio_tracker.portfolio.repository import PriceHistoryRepository
+from portfolio_tracker.portfolio.services import value_series
+from portfolio_tracker.user.models import User
+from benchmarks import app, db, measure, report
+
+TICKERS = 50
+DAYS = 5 * 365
+TRANSACTIONS = 5000
+
+
+class DictRedis(dict):
+    """Кэш в памяти вместо Redis"""
+
+    def set(self, key, value, ex=None):
+        self[key] = value
+
+    def delete(self, key):
+        self.pop(key, None)
+
+    def pipeline(self):
+        redis, calls = self, []
+
+        class Pipeline:
+            def get(self, key):
+                calls.append(redis.get(key))
+
+            def delete(self, key):
+                calls.append(redis.delete(key))
+
+            def execute(self):
+                return calls
+        return Pipeline()
+
+
+def fill() -> None:
+    db.drop_all()
+    db.create_all()
+    today = datetime.now().date()
+    start = today - timedelta(days=DAYS)
+
+    db.session.add(User(id=1, email='bench@example.com', password=''))
+    db.session.add(Portfolio(id=1, user_id=1, market='crypto', name='Portfolio'))
+    db.session.execute(db.insert(Ticker), [
+        {'id': f'coin-{n}', 'name': f'Coin {n}', 'symbol': f'c{n}',
+         'market': 'crypto', 'price': random.uniform(1, 100)}
+        for n in range(TICKERS)] + [
+        {'id': 'usdt', 'name': 'Tether', 'symbol': 'usdt', 'market': 'crypto',
+         'price': 1}])
+
+    PriceHistoryRepository.upsert(
+        (f'coin-{n}', start + timedelta(days=d), random.uniform(1, 100))
+        for n in range(TICKERS) for d in range(DAYS))
+
+    rows = []
+    for _ in range(TRANSACTIONS):
+        quantity = random.uniform(-1, 1)
+        price = random.uniform(1, 100)
+        rows.append({
+            'type': 'Buy' if quantity > 0 else 'Sell',
+            'date': datetime.combine(start, datetime.min.time())
+            + timedelta(days=random.randrange(DAYS)),
+            'portfolio_id': 1, 'wallet_id': 1,
+            'ticker_id': f'coin-{random.randrange(TICKERS)}', 'ticker2_id': 'usdt',
+            'quantity': quantity, 'quantity2': -quantity * price,
+            'price': price, 'price_usd': price, 'order': False})
+    db.session.execute(db.insert(Transaction), rows)
+    db.session.commit()
+
+
+def main() -> None:
+    with app.app_context(), \
+            patch.object(value_series, 'redis', DictRedis()):
+        fill()
+
+        with measure() as result:
+            value_series.get_value_series(1)
+        report(f'{TICKERS} тикеров, {DAYS} дней. Полный расчет', result)
+
+        db.session.add(Transaction(
+            type='Buy', date=datetime.now() - timedelta(days=3),
+            portfolio_id=1, wallet_id=1, ticker_id='coin-0', ticker2_id='usdt',
+            quantity=1, quantity2=-10, price=10, price_usd=10, order=False))
+        db.session.commit()
+
+        with measure() as result:
+            value_series.get_value_series(1)
+        report('Досчет после новой транзакции', result)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""price_history ticker_id, date index, id primary key
+
+Revision ID: 5f2a9c1d7e43
+Revises: 3cc4948b5fbe
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5f2a9c1d7e43'
+down_revision = '3cc4948b5fbe'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    mysql = op.get_bind().dialect.name == 'mysql'
+
+    # Повторы (ticker_id, date) - остается запись с большим id
+    if mysql:
+        op.execute('DELETE p1 FROM price_history p1 JOIN price_history p2 '
+                   'ON p1.ticker_id = p2.ticker_id AND p1.date = p2.date '
+                   'AND p1.id < p2.id')
+    else:
+        op.execute('DELETE FROM price_history WHERE EXISTS ('
+                   'SELECT 1 FROM price_history p2 '
+                   'WHERE p2.ticker_id = price_history.ticker_id '
+                   'AND p2.date = price_history.date '
+                   'AND p2.id > price_history.id)')
+
+    # Повторы id (составной ключ их допускал) - новая нумерация
+    duplicates = op.get_bind().execute(sa.text(
+        'SELECT COUNT(*) - COUNT(DISTINCT id) FROM price_history')).scalar()
+    if duplicates:
+        if mysql:
+            op.execute('SET @n := 0')
+            op.execute('UPDATE price_history SET id = (@n := @n + 1) '
+                       'ORDER BY id, ticker_id, date')
+        else:
+            op.execute('UPDATE price_history SET id = ('
+                       'SELECT r.n FROM (SELECT ticker_id, date, ROW_NUMBER() '
+                       'OVER (ORDER BY id, ticker_id, date) AS n '
+                       'FROM price_history) AS r '
+                       'WHERE r.ticker_id = price_history.ticker_id '
+                       'AND r.date = price_history.date)')
+
+    # Первичный ключ - только id (автоинкремент)
+    if mysql:
+        op.execute('ALTER TABLE price_history DROP PRIMARY KEY, '
+                   'MODIFY id INTEGER NOT NULL AUTO_INCREMENT, '
+                   'ADD PRIMARY KEY (id)')
+        with op.batch_alter_table('price_history', schema=None) as batch_op:
+            batch_op.create_index('ix_price_history_ticker_date',
+                                  ['ticker_id', 'date'], unique=True)
+    else:
+        with op.batch_alter_table('price_history', schema=None,
+                                  recreate='always') as batch_op:
+            batch_op.create_primary_key('pk_price_history', ['id'])
+            batch_op.create_index('ix_price_history_ticker_date',
+                                  ['ticker_id', 'date'], unique=True)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'mysql':
+        with op.batch_alter_table('price_history', schema=None) as batch_op:
+            batch_op.drop_index('ix_price_history_ticker_date')
+        op.execute('ALTER TABLE price_history '
+                   'MODIFY id INTEGER NOT NULL, DROP PRIMARY KEY, '
+                   'ADD PRIMARY KEY (id, date, ticker_id)')
+    else:
+        with op.batch_alter_table('price_history', schema=None,
+                                  recreate='always') as batch_op:
+            batch_op.drop_index('ix_price_history_ticker_date')
+            batch_op.create_primary_key('pk_price_history',
+                                        ['id', 'date', 'ticker_id'])
@@ -0,0 +1,28 @@
+"""ticker symbol, name indexes
+
+Revision ID: 8b3e1f0a6c21
+Revises: 5f2a9c1d7e43
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b3e1f0a6c21'
+down_revision = '5f2a9c1d7e43'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('ticker', schema=None) as batch_op:
+        batch_op.create_index('ix_ticker_symbol', ['symbol'])
+        batch_op.create_index('ix_ticker_name', ['name'], mysql_length=191)
+
+
+def downgrade():
+    with op.batch_alter_table('ticker', schema=None) as batch_op:
+        batch_op.drop_index('ix_ticker_name')
+        batch_op.drop_index('ix_ticker_symbol')
@@ -0,0 +1,31 @@
+"""price_history updated_at
+
+Revision ID: a4c7e2d9b150
+Revises: 8b3e1f0a6c21
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4c7e2d9b150'
+down_revision = '8b3e1f0a6c21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('price_history', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(),
+                                      server_default=sa.func.now(),
+                                      nullable=False))
+        batch_op.create_index('ix_price_history_ticker_updated',
+                              ['ticker_id', 'updated_at'])
+
+
+def downgrade():
+    with op.batch_alter_table('price_history', schema=None) as batch_op:
+        batch_op.drop_index('ix_price_history_ticker_updated')
+        batch_op.drop_column('updated_at')
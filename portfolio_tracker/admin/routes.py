@@ -1,8 +1,9 @@
 import re
 import time
+from urllib.parse import quote
+
 from flask import abort, flash, redirect, render_template, url_for, request
 from portfolio_tracker.admin.repository import KeyRepository, StreamRepository
-from portfolio_tracker.user.models import User
 from portfolio_tracker.user.repository import UserRepository
 
 
@@ -16,7 +17,10 @@ from portfolio_tracker.admin.services.integrations import Log, get_api_task, tas
 from portfolio_tracker.admin.services.integrations_api import API_NAMES, ApiIntegration
 from portfolio_tracker.admin.services.integrations_other import MODULE_NAMES
 from portfolio_tracker.admin.services.other_services import get_module, get_tasks, \
-    get_tickers, get_tickers_count, task_action
+    get_tickers_count, task_action
+from portfolio_tracker.admin.services.tables import table_result, \
+    tickers_page, users_page
+from portfolio_tracker.services.ticker_search import reset_index
 from . import bp
 
 
@@ -49,28 +53,23 @@ def users_page():
 @bp.route('/users_detail', methods=['GET'])
 @admin_only
 def users_detail():
-    users = tuple(db.session.execute(db.select(User)).scalars())
-
-    result = {"total": len(users),
-              "totalNotFiltered": len(users),
-              "rows": []}
-    for user in users:
-        if user.is_demo:
-            continue
+    page = users_page(request.args)
 
-        result['rows'].append({
+    rows = []
+    for user in page.rows:
+        rows.append({
             "id": (f'<input class="form-check-input to-check" type="checkbox" '
                    f'value="{user.id}">'),
             "email": user.email,
             "type": user.type,
-            "portfolios": len(user.portfolios),
-            "first_visit": user_datetime(user.info.first_visit),
-            "last_visit": user_datetime(user.info.last_visit),
-            "country": user.info.country if user.info else '',
-            "city": user.info.city if user.info else ''
+            "portfolios": user.portfolios,
+            "first_visit": user_datetime(user.first_visit) if user.first_visit else '',
+            "last_visit": user_datetime(user.last_visit) if user.last_visit else '',
+            "country": user.country or '',
+            "city": user.city or ''
         })
 
-    return result
+    return table_result(page, rows)
 
 
 @bp.route('/users/action', methods=['POST'])
@@ -90,6 +89,7 @@ def imports():
 @admin_only
 def tickers_action():
     actions_on_objects(request.data, Ticker.get)
+    reset_index()
     return ''
 
 
@@ -103,16 +103,13 @@ def tickers_page():
 @bp.route('/tickers_detail', methods=['GET'])
 @admin_only
 def tickers_detail():
-    tickers = get_tickers(request.args.get('market'))
+    page = tickers_page(request.args.get('market'), request.args)
+    settings_url = url_for('.ticker_settings')
 
-    result = {"total": len(tickers),
-              "totalNotFiltered": len(tickers),
-              "rows": []}
-
-    for ticker in tickers:
-        url = url_for('.ticker_settings', ticker_id=ticker.id)
-
-        result['rows'].append({
+    rows = []
+    for ticker in page.rows:
+        url = f'{settings_url}?ticker_id={quote(ticker.id)}'
+        rows.append({
             "checkbox": (f'<input class="form-check-input to-check"'
                          f'type="checkbox" value="{ticker.id}">'),
             "id": (f'<span class="open-modal" data-modal-id='
@@ -123,7 +120,7 @@ def tickers_detail():
             "market_cap_rank": ticker.market_cap_rank or ''
         })
 
-    return result
+    return table_result(page, rows)
 
 
 @bp.route('/tickers/settings', methods=['GET', 'POST'])
@@ -132,6 +129,7 @@ def ticker_settings():
     ticker = Ticker.get(request.args.get('ticker_id')) or abort(404)
     if request.method == 'POST':
         ticker.edit(request.form)
+        reset_index(ticker.market)
         return ''
     return render_template('admin/ticker_settings.html', ticker=ticker)
 
@@ -230,7 +228,7 @@ def module_page_detail():
 @bp.route('/module/logs', methods=['GET'])
 @admin_only
 def json_module_logs():
-    timestamp = request.args.get('timestamp', 0.0, type=float)
+    timestamp = request.args.get('timestamp', '0')
     module_name = request.args.get('module_name')
     logs = []
 
@@ -241,7 +239,7 @@ def json_module_logs():
         logs += module_logs.get(timestamp)
 
     if logs:
-        logs = sorted(logs, key=lambda log: log.get('timestamp'))
+        logs = sorted(logs, key=Log.sort_key)
     return logs
 
 
@@ -257,7 +255,7 @@ def module_logs_delete():
         if not module:
             continue
 
-        redis.delete(module.logs.key)
+        module.logs.delete()
 
     return redirect(url_for('.module_page', module_name=module_name))
 
@@ -325,6 +323,7 @@ def api_stream_action():
 def api_event_action():
     actions_on_objects(request.data, Ticker.get)
     db.session.commit()
+    reset_index()
     return ''
 
 
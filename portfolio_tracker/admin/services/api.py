@@ -44,10 +44,17 @@ class StreamService:
         self.stream = stream
 
     def edit(self, form: ImmutableMultiDict) -> None:
+        from portfolio_tracker.admin.services.integrations_api import \
+            StreamLimiter
+
         self.stream.next_call = form['next_call']
         self.stream.active = form.get('active', False, type=bool)
         StreamRepository.save(self.stream)
 
+        # Следующий вызов задан вручную
+        StreamLimiter(self.stream.api.name).set_next_call(
+            self.stream.id, self.stream.next_call.timestamp())
+
     def delete(self) -> None:
         StreamRepository.delete(self.stream)
 
@@ -1,16 +1,27 @@
 from __future__ import annotations
-from datetime import datetime, timezone
+from collections import deque
+from datetime import datetime, timedelta, timezone
 from typing import TYPE_CHECKING
 
 from flask import current_app
 
 from portfolio_tracker.app import db, celery
 from portfolio_tracker.general_functions import Market, remove_prefix
-from portfolio_tracker.admin.services.integrations import task_logging
+from portfolio_tracker.portfolio.repository import PriceHistoryRepository, \
+    TickerRepository
+from portfolio_tracker.services.price_cache import publish_prices
+from portfolio_tracker.services.sprites import build_sprite
+from portfolio_tracker.services.summary import refresh_summaries
+from portfolio_tracker.services.ticker_search import reset_index
+from portfolio_tracker.watchlist.services.alert_index import get_alert_index
+from portfolio_tracker.admin.services.integrations import Checkpoint, task_logging
 from portfolio_tracker.admin.services.integrations_api import ApiName
+from portfolio_tracker.admin.services.images import load_images
 from portfolio_tracker.admin.services.integrations_market import MarketIntegration
-from portfolio_tracker.admin.services.other_services import alerts_update, create_ticker, get_tickers, \
-    load_image, find_ticker_in_list
+from portfolio_tracker.admin.services.pipeline import Pipeline, StopPipeline
+from portfolio_tracker.admin.services.other_services import HistoryWriter, \
+    alerts_update, get_tickers, get_tickers_ids, history_period, \
+    TickersIndex
 
 if TYPE_CHECKING:
     import requests
@@ -19,6 +30,8 @@ if TYPE_CHECKING:
 API_NAME: ApiName = 'crypto'
 MARKET: Market = 'crypto'
 BASE_URL: str = 'https://api.coingecko.com/api/v3/'
+# Частей запросов в одной записи цен
+WRITE_BATCH: int = 4
 
 
 class Api(MarketIntegration):
@@ -59,45 +72,71 @@ class Api(MarketIntegration):
 def crypto_load_prices(self) -> None:
 
     api = Api(API_NAME)
-    tickers = get_tickers(MARKET)
+    ids = deque(get_tickers_ids(MARKET))
     url = f'{BASE_URL}simple/price?vs_currencies=usd&ids='
     not_updated_ids = []
 
-    while tickers:
-
-        # Разбиение запроса до допустимой длины
-        tickers_to_do = []
-        ids = ''
-        while (tickers and
-               len(f'{url}{ids},{remove_prefix(tickers[0].id, MARKET)}') < 2048):
-            ids += ',' + remove_prefix(tickers[0].id, MARKET)
-            tickers_to_do.append(tickers.pop(0))
-
-        # Получение данных
-        response = api.request(lambda key: f'{url}/{ids}&{key}')
+    # Индекс порогов - уведомления срабатывают по мере сохранения цен
+    alerts = get_alert_index(MARKET)
+
+    # Разбиение запросов до допустимой длины
+    chunks = []
+    while ids:
+        ids_to_do = []
+        external_ids = ''
+        while (ids and
+               len(f'{url}{external_ids},{remove_prefix(ids[0], MARKET)}') < 2048):
+            external_ids += ',' + remove_prefix(ids[0], MARKET)
+            ids_to_do.append(ids.popleft())
+        chunks.append((ids_to_do, external_ids))
+
+    # Получение данных (параллельно по потокам)
+    make_urls = [lambda key, e=external_ids: f'{url}/{e}&{key}'
+                 for _, external_ids in chunks]
+    left = len(chunks)
+
+    def parse(item) -> dict:
+        nonlocal left
+        i, response = item
         data = api.response_processing(response, self.name)
         if not data:
             api.logs.set('error', 'Нет данных', self.name)
-            print(f'response: {response}')
-            if response:
-                print(f'response: {response.json()}')
-            return
+            raise StopPipeline
 
-        # Сохранение данных
-        for ticker in tickers_to_do:
-            external_id = remove_prefix(ticker.id, MARKET)
-            ticker_in_data = data.get(external_id)
+        prices = {}
+        for ticker_id in chunks[i][0]:
+            ticker_in_data = data.get(remove_prefix(ticker_id, MARKET))
             if ticker_in_data:
-                price = ticker_in_data.get('usd', 0)
-                ticker.price = price
+                prices[ticker_id] = ticker_in_data.get('usd', 0)
             else:
-                # Добавление в словарь необновленных
-                not_updated_ids.append(ticker.id)
+                # Добавление в список необновленных
+                not_updated_ids.append(ticker_id)
 
-        db.session.commit()
-        api.logs.set('info', f'Осталось: {len(tickers)}', self.name)
+        left -= 1
+        api.logs.set('info', f'Осталось запросов: {left}', self.name)
+        return prices
 
-    # Обновить уведомления
+    def write(batch: list) -> None:
+        # Сохранение данных
+        prices = {ticker_id: price for chunk in batch
+                  for ticker_id, price in chunk.items()}
+        TickerRepository.update_prices(prices)
+        alerts_update(MARKET, alerts.crossed(prices))
+
+    # Запросы следующих частей идут во время разбора и записи предыдущих
+    pipeline = Pipeline(parse, write, batch_size=WRITE_BATCH)
+    completed = pipeline.run(api.request_many(make_urls))
+    pipeline.log(api.logs, self.name)
+    if not completed:
+        return
+
+    # Кэш цен
+    publish_prices()
+
+    # Снимки итогов пользователей
+    refresh_summaries(MARKET)
+
+    # Итоговая проверка (если индекс был недоступен или расходится с базой)
     alerts_update(MARKET)
 
     # События
@@ -112,11 +151,10 @@ def crypto_load_prices(self) -> None:
 def crypto_load_tickers(self) -> None:
 
     api = Api(API_NAME)
-    tickers = get_tickers(MARKET)
-    new_ids = []
-    not_found_ids = [ticker.id for ticker in tickers]
+    tickers = TickersIndex(get_tickers(MARKET), MARKET)
     page = 1
     url = f'{BASE_URL}coins/markets?vs_currency=usd&per_page=250&page='
+    icons = []
 
     while True:
         api.logs.set('info', f'Страница: {page}', self.name)
@@ -135,22 +173,13 @@ def crypto_load_tickers(self) -> None:
             if not external_id:
                 continue
 
-            # Поиск тикера
-            ticker = find_ticker_in_list(external_id, tickers, MARKET)
-            # Или добавление нового тикера
-            if not ticker:
-                ticker = create_ticker(external_id, MARKET)
-                tickers.append(ticker)
-                new_ids.append(ticker.id)
-
-            # Исключение из списка ненайденных
-            if ticker.id in not_found_ids:
-                not_found_ids.remove(ticker.id)
+            # Поиск тикера или добавление нового
+            ticker = tickers.get_or_create(external_id)
 
-            # Добавление иконки
+            # Иконка (загружаются после всех страниц, параллельно)
             image_url = coin.get('image')
             if not ticker.image and image_url:
-                ticker.image = load_image(image_url, MARKET, ticker.id, api)
+                icons.append((ticker, image_url))
 
             # Обновление информации
             ticker.market_cap_rank = coin.get('market_cap_rank')
@@ -162,9 +191,72 @@ def crypto_load_tickers(self) -> None:
         # Следующая страница
         page += 1
 
+    # Иконки и спрайт иконок рынка
+    if load_images(icons, MARKET, api):
+        build_sprite(MARKET)
+
+    # Индекс поиска тикеров
+    reset_index(MARKET)
+
     # События
-    api.events.update(new_ids, 'new_tickers', False)
-    api.events.update(not_found_ids, 'not_found_tickers')
+    api.events.update(tickers.new_ids, 'new_tickers', False)
+    api.events.update(tickers.not_found_ids, 'not_found_tickers')
 
     # Инфо
     api.info.set('Тикеры обновлены', datetime.now())
+
+
+@celery.task(bind=True, name='crypto_load_history', max_retries=None)
+@task_logging
+def crypto_load_history(self) -> None:
+
+    api = Api(API_NAME)
+    start, end = history_period()
+    today = end + timedelta(days=1)
+    url = f'{BASE_URL}coins/'
+
+    # Первый пропуск истории по тикерам, кроме обработанных до прерывания
+    checkpoint = Checkpoint(API_NAME, self.name, str(end))
+    done = checkpoint.get()
+    gaps = {ticker_id: day for ticker_id, day
+            in PriceHistoryRepository.get_first_missing_dates(MARKET, start, end).items()
+            if ticker_id not in done}
+    if not gaps:
+        api.info.set('История загружена', datetime.now())
+        return
+
+    # Дневные цены за период от первого пропуска (параллельно по потокам)
+    ticker_ids = list(gaps)
+    make_urls = [lambda key, t=ticker_id:
+                 f'{url}{remove_prefix(t, MARKET)}/market_chart?vs_currency=usd'
+                 f'&interval=daily&days={(today - gaps[t]).days}&{key}'
+                 for ticker_id in ticker_ids]
+
+    # Сохраненные цены не перезаписываются
+    writer = HistoryWriter(checkpoint, only_missing=True)
+    left = len(ticker_ids)
+    for i, response in api.request_many(make_urls):
+        left -= 1
+        data = api.response_processing(response, self.name)
+        if data is None:
+            continue
+
+        # Первая цена за день (00:00 UTC) с первого пропуска
+        ticker_id = ticker_ids[i]
+        first_gap = gaps[ticker_id]
+        prices = {}
+        for timestamp, price in data.get('prices', []):
+            day = datetime.fromtimestamp(timestamp / 1000, timezone.utc).date()
+            if first_gap <= day <= end and price:
+                prices.setdefault(day, price)
+
+        writer.add(ticker_id, [(ticker_id, day, price)
+                               for day, price in prices.items()])
+        if not left % 100:
+            api.logs.set('info', f'Осталось запросов: {left}', self.name)
+
+    writer.flush()
+    api.logs.set('info', f'Сохранено цен: {writer.count}', self.name)
+
+    # Инфо
+    api.info.set('История загружена', datetime.now())
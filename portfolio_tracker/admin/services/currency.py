@@ -6,10 +6,16 @@ from flask import current_app
 from portfolio_tracker.app import db, celery
 from portfolio_tracker.general_functions import Market, add_prefix, remove_prefix
 from portfolio_tracker.portfolio.models import PriceHistory
+from portfolio_tracker.portfolio.repository import PriceHistoryRepository, \
+    TickerRepository
+from portfolio_tracker.services.price_cache import publish_prices
+from portfolio_tracker.services.summary import refresh_summaries
+from portfolio_tracker.services.ticker_search import reset_index
 from portfolio_tracker.admin.services.integrations import task_logging
 from portfolio_tracker.admin.services.integrations_api import ApiName
 from portfolio_tracker.admin.services.integrations_market import MarketIntegration
-from portfolio_tracker.admin.services.other_services import create_ticker, get_tickers, find_ticker_in_list
+from portfolio_tracker.admin.services.other_services import get_tickers, \
+    get_tickers_ids, TickersIndex
 
 if TYPE_CHECKING:
     import requests
@@ -58,7 +64,7 @@ class Api(MarketIntegration):
 @task_logging
 def currency_load_prices(self) -> None:
     api = Api(API_NAME)
-    tickers = get_tickers(MARKET, without_ids=[add_prefix('usd', MARKET)])
+    ids = get_tickers_ids(MARKET, without_ids=[add_prefix('usd', MARKET)])
     not_updated_ids = []
 
     # Получение данных
@@ -68,20 +74,28 @@ def currency_load_prices(self) -> None:
         return
 
     # Сохранение данных
-    for ticker in tickers:
-        external_id = f'USD{remove_prefix(ticker.id, MARKET)}'.upper()
+    prices = {}
+    for ticker_id in ids:
+        external_id = f'USD{remove_prefix(ticker_id, MARKET)}'.upper()
         price = data.get(external_id)
         if price:
-            # Обновление цены к USD
-            ticker.price = 1 / price
+            # Цена к USD
+            prices[ticker_id] = 1 / price
         else:
             # Добавление в список необновленных
-            not_updated_ids.append(ticker.id)
-    db.session.commit()
+            not_updated_ids.append(ticker_id)
+
+    TickerRepository.update_prices(prices)
 
     # События
     api.events.update(not_updated_ids, 'not_updated_prices')
 
+    # Кэш цен
+    publish_prices()
+
+    # Снимки итогов пользователей
+    refresh_summaries(MARKET)
+
     # Инфо
     api.info.set('Цены обновлены', datetime.now())
 
@@ -90,9 +104,7 @@ def currency_load_prices(self) -> None:
 @task_logging
 def currency_load_tickers(self) -> None:
     api = Api(API_NAME)
-    tickers = get_tickers(MARKET)
-    new_ids = []
-    not_found_ids = [ticker.id for ticker in tickers]
+    tickers = TickersIndex(get_tickers(MARKET), MARKET)
 
     # Получение данных
     response = api.request(lambda key: f'{BASE_URL}list?{key}')
@@ -107,17 +119,8 @@ def currency_load_tickers(self) -> None:
         if not external_id:
             continue
 
-        # Поиск тикера
-        ticker = find_ticker_in_list(external_id, tickers, MARKET)
-        # Или добавление нового тикера
-        if not ticker:
-            ticker = create_ticker(external_id, MARKET)
-            tickers.append(ticker)
-            new_ids.append(ticker.id)
-
-        # Исключение из списка ненайденных
-        if ticker.id in not_found_ids:
-            not_found_ids.remove(ticker.id)
+        # Поиск тикера или добавление нового
+        ticker = tickers.get_or_create(external_id)
 
         # Обновление информации
         ticker.name = data[external_id]
@@ -125,9 +128,12 @@ def currency_load_tickers(self) -> None:
 
     db.session.commit()
 
+    # Индекс поиска тикеров
+    reset_index(MARKET)
+
     # События
-    api.events.update(new_ids, 'new_tickers', exclude_missing=False)
-    api.events.update(not_found_ids, 'not_found_tickers')
+    api.events.update(tickers.new_ids, 'new_tickers', exclude_missing=False)
+    api.events.update(tickers.not_found_ids, 'not_found_tickers')
 
     # Инфо
     api.info.set('Тикеры обновлены', datetime.now())
@@ -138,7 +144,8 @@ def currency_load_tickers(self) -> None:
 def currency_load_history(self) -> None:
 
     api = Api(API_NAME)
-    tickers = get_tickers(MARKET, without_ids=[add_prefix('usd', MARKET)])
+    tickers = TickersIndex(
+        get_tickers(MARKET, without_ids=[add_prefix('usd', MARKET)]), MARKET)
     date = datetime.now().date()
     attempts: int = 5  # Количество запросов
     url = f'{BASE_URL}historical?date='
@@ -161,15 +168,16 @@ def currency_load_history(self) -> None:
             return
 
         # Сохранение данных
+        prices = []
         for currency in data:
 
             # Поиск тикера
             external_id = currency[len('USD'):]
-            ticker = find_ticker_in_list(external_id, tickers, MARKET)
+            ticker = tickers.get(external_id)
 
             price = data[currency]
             if ticker and price:
-                ticker.service.set_price(date, 1 / price)
+                prices.append((ticker.id, date, 1 / price))
 
-        db.session.commit()
+        PriceHistoryRepository.upsert(prices)
         api.logs.set('info', f'Получены цены на {date}', self.name)
@@ -0,0 +1,211 @@
+"""Загрузка иконок тикеров.
+
+Иконки скачиваются пулом потоков, декодируются и уменьшаются в пуле
+процессов (в процессах-демонах Celery, где дочерние процессы запрещены, -
+в пуле потоков). Изображение декодируется один раз (JPEG - сразу в
+уменьшенном размере, draft), размеры получаются через thumbnail от
+большего к меньшему и дополняются до квадрата. Запросы идут по потокам API
+(учет вызовов в лимитах потока, сессия с прокси потока). Имя файла - хэш
+содержимого, поэтому одинаковые иконки (например, заглушки) хранятся один
+раз.
+"""
+from __future__ import annotations
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, \
+    ThreadPoolExecutor, as_completed
+import hashlib
+from io import BytesIO
+import multiprocessing
+import os
+import time
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Tuple
+
+from flask import current_app
+from PIL import Image
+
+from portfolio_tracker.app import db
+from portfolio_tracker.general_functions import Market
+from portfolio_tracker.portfolio.models import Ticker
+from portfolio_tracker.admin.services.integrations_api import ApiIntegration, \
+    get_session, send_request
+
+if TYPE_CHECKING:
+    import requests
+
+SIZES = (40, 24)
+DOWNLOAD_WORKERS = 8
+# Сохранение тикеров с загруженными иконками каждые N штук
+COMMIT_EVERY = 50
+
+
+def resize_icon(content: bytes) -> Tuple[str, Dict[int, bytes]]:
+    """Формат и уменьшенные копии изображения {размер: байты}.
+
+    Выполняется в пуле процессов, поэтому работает только с байтами.
+    """
+    img = Image.open(BytesIO(content))
+    img_format = img.format
+    # JPEG декодируется сразу с уменьшением (кратно 1/2 - 1/8)
+    if img_format == 'JPEG':
+        img.draft(img.mode, (SIZES[0], SIZES[0]))
+
+    icons = {}
+    for px in sorted(SIZES, reverse=True):
+        img.thumbnail((px, px))
+        output = BytesIO()
+        _square(img, px, img_format).save(output, format=img_format)
+        icons[px] = output.getvalue()
+    return img_format, icons
+
+
+def _square(img: Image.Image, px: int, img_format: str) -> Image.Image:
+    """Иконка по центру квадрата px x px (фон прозрачный, у JPEG - белый)"""
+    if img.size == (px, px):
+        return img
+
+    if img_format == 'JPEG':
+        canvas = Image.new('RGB', (px, px), 'white')
+        img = img.convert('RGB')
+    else:
+        canvas = Image.new('RGBA', (px, px), (0, 0, 0, 0))
+        img = img.convert('RGBA')
+    canvas.paste(img, ((px - img.width) // 2, (px - img.height) // 2))
+    return canvas
+
+
+def icon_filename(content: bytes, img_format: str) -> str:
+    digest = hashlib.sha256(content).hexdigest()[:24]
+    return f'{digest}.{img_format}'.lower()
+
+
+def save_icon(path: str, filename: str, icons: Dict[int, bytes]) -> None:
+    """Запись копий, если такой иконки еще нет (запись через временный файл -
+    одинаковые иконки могут сохраняться одновременно)"""
+    for px, data in icons.items():
+        folder = os.path.join(path, str(px))
+        target = os.path.join(folder, filename)
+        if os.path.exists(target):
+            continue
+
+        os.makedirs(folder, exist_ok=True)
+        tmp = f'{target}.{os.getpid()}.{id(data)}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, target)
+
+
+def icons_path(market: Market) -> str:
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    return f'{upload_folder}/images/tickers/{market}'
+
+
+def _resize_executor(workers: int | None = None) -> Executor:
+    # Процессы Celery (prefork) - демоны и не могут запускать дочерние
+    if multiprocessing.current_process().daemon:
+        return ThreadPoolExecutor(max_workers=workers)
+    return ProcessPoolExecutor(max_workers=workers)
+
+
+class IconLoader:
+    """Параллельная загрузка иконок.
+
+    add() ставит иконку в очередь и сразу возвращается, ready() и wait()
+    возвращают (ключ, имя файла или None) по мере готовности. Поток API
+    выбирается и вызов учитывается в add() (как в request_many), в пуле -
+    только ожидание задержки, запрос и уменьшение.
+    """
+
+    def __init__(self, market: Market, api: ApiIntegration,
+                 workers: int = DOWNLOAD_WORKERS) -> None:
+        self.market = market
+        self.api = api
+        self.path = icons_path(market)
+        self.app = current_app._get_current_object()
+        self.downloads = ThreadPoolExecutor(max_workers=workers)
+        self.resizes = _resize_executor()
+        self.running: Dict[Future, str] = {}
+
+    def __enter__(self) -> IconLoader:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.downloads.shutdown(cancel_futures=True)
+        self.resizes.shutdown(cancel_futures=True)
+
+    def add(self, key: str, url: str) -> None:
+        if not url.startswith('http'):
+            return
+
+        stream = self.api.nearest_stream()
+        if not stream:
+            self.api.logs.set('warning', 'Нет потоков для запросов')
+            return
+
+        future = self.downloads.submit(self._load, url, get_session(stream),
+                                       stream.name,
+                                       self.api.reserve_call(stream))
+        self.running[future] = key
+
+    def ready(self) -> Iterator[Tuple[str, str | None]]:
+        for future in [f for f in self.running if f.done()]:
+            yield self._result(future)
+
+    def wait(self) -> Iterator[Tuple[str, str | None]]:
+        for future in as_completed(list(self.running)):
+            yield self._result(future)
+
+    def _result(self, future: Future) -> Tuple[str, str | None]:
+        key = self.running.pop(future)
+        try:
+            return key, future.result()
+        except Exception as e:
+            self.api.logs.set('error', f'Ошибка загрузки иконки {key}: {type(e)}')
+            with self.app.app_context():
+                current_app.logger.error('Ошибка', exc_info=True)
+            return key, None
+
+    def _load(self, url: str, session: requests.Session, stream_name: str,
+              delay: float) -> str | None:
+        """Скачивание (в потоке), уменьшение (в пуле) и сохранение"""
+        with self.app.app_context():
+            time.sleep(delay)
+            response = send_request(self.api, url, session, stream_name)
+            if not response or response.status_code != 200:
+                return None
+
+            content = response.content
+            img_format, icons = self.resizes.submit(resize_icon, content).result()
+            filename = icon_filename(content, img_format)
+            save_icon(self.path, filename, icons)
+            return filename
+
+
+def load_images(items: Iterable[Tuple[Ticker, str]], market: Market,
+                api: ApiIntegration) -> List[str]:
+    """Загрузка иконок тикеров [(тикер, url)]. Возвращает ID обновленных"""
+    tickers = {}
+    with IconLoader(market, api) as loader:
+        for ticker, url in items:
+            tickers[ticker.id] = ticker
+            loader.add(ticker.id, url)
+
+        return save_images(loader.wait(), tickers, api)
+
+
+def save_images(results: Iterable[Tuple[str, str | None]],
+                tickers: Dict[str, Ticker], api: ApiIntegration) -> List[str]:
+    """Запись имен иконок в тикеры (с периодическим сохранением)"""
+    loaded_ids = []
+    for ticker_id, filename in results:
+        if not filename:
+            continue
+
+        tickers[ticker_id].image = filename
+        loaded_ids.append(ticker_id)
+        if not len(loaded_ids) % COMMIT_EVERY:
+            db.session.commit()
+            api.logs.set('info', f'Загружено иконок: {len(loaded_ids)}')
+
+    if loaded_ids:
+        db.session.commit()
+    return loaded_ids
+
@@ -3,7 +3,7 @@ import json
 from functools import wraps
 from datetime import datetime, timedelta, timezone
 import time
-from typing import TYPE_CHECKING, Dict, Literal, TypeAlias
+from typing import TYPE_CHECKING, Dict, Iterable, Literal, TypeAlias
 
 from flask import current_app
 
@@ -24,31 +24,56 @@ class Integration:
 
 
 class Log:
+    """ Логи модуля в Redis Streams: отдельный ограниченный поток на
+    категорию, чтение - XRANGE от последнего ID, очистка - XTRIM MINID """
     Category: TypeAlias = Literal['info', 'debug', 'warning', 'error']
     CATEGORIES: tuple[Category, ...] = ('info', 'debug', 'warning', 'error')
+    MAX_LEN = 10000
 
     def __init__(self, module_name: str) -> None:
         self.key = f'api.{module_name}.logs'
 
-    def get(self, timestamp: float = 0.0) -> list:
+    def category_key(self, category: Category) -> str:
+        return f'{self.key}.{category}'
+
+    def get(self, timestamp: str | float = 0) -> list:
+        """ Логи после timestamp (ID записи потока или время в секундах) """
+        timestamp = str(timestamp or 0)
+        if '-' in timestamp:
+            min_id = f'({timestamp}'
+        else:
+            min_id = f'({int(float(timestamp) * 1000)}-{2 ** 64 - 1}'
+
+        pipe = redis.pipeline()
+        for category in self.CATEGORIES:
+            pipe.xrange(self.category_key(category), min=min_id)
+
         logs = []
-        for key in redis.hkeys(self.key):
-            key_timestamp = key.decode()
-            if float(key_timestamp) > timestamp:
-                log = redis.hget(self.key, key).decode()
-                log = json.loads(log)
-                log['timestamp'] = key.decode()
-                logs.append(log)
+        for n, entries in enumerate(pipe.execute()):
+            for entry_id, fields in entries:
+                entry_id = entry_id.decode()
+                logs.append({'text': fields[b'text'].decode(),
+                             'category': n,
+                             'time': fields[b'time'].decode(),
+                             'timestamp': entry_id})
 
         return logs
 
     def set(self, category: Category, text: str, task_name='') -> None:
         now = datetime.now(timezone.utc)
-        timestamp = str(now.timestamp())
         text = f'{tasks_trans(task_name) + " - " if task_name else ""}{text}'
-        log = {'text': text, 'category': self.CATEGORIES.index(category),
-               'timestamp': timestamp, 'time': str(now)}
-        redis.hset(self.key, timestamp, json.dumps(log))
+        redis.xadd(self.category_key(category),
+                   {'text': text, 'time': str(now)},
+                   maxlen=self.MAX_LEN, approximate=True)
+
+    def delete(self) -> None:
+        redis.delete(self.key,
+                     *[self.category_key(c) for c in self.CATEGORIES])
+
+    @staticmethod
+    def sort_key(log: dict) -> tuple[int, int]:
+        ms, seq = log['timestamp'].split('-')
+        return int(ms), int(seq)
 
     @classmethod
     def clear(cls, settings: Dict[Category, int]) -> None:
@@ -57,21 +82,16 @@ class Log:
         # settings: dict[Category, int] = {'info': 7, 'debug': 0, 'warning': 60}
 
         now = datetime.now()
-        timestamp = []
+        pipe = redis.pipeline()
         for category in cls.CATEGORIES:
             days = settings.get(category)
-            timestamp.append((now - timedelta(days=days)).timestamp()
-                             if days is not None else 0)
-
-        for log_key in redis.keys('api.*.logs'):
-            log_key = log_key.decode()
-            for log_item in redis.hkeys(log_key):
-                key_timestamp = log_item.decode()
-                log = redis.hget(log_key, log_item).decode()
-                log = json.loads(log)
+            if days is None:
+                continue
 
-                if float(key_timestamp) <= timestamp[log['category']]:
-                    redis.hdel(log_key, log_item)
+            min_id = int((now - timedelta(days=days)).timestamp() * 1000)
+            for key in redis.scan_iter(f'api.*.logs.{category}'):
+                pipe.xtrim(key, minid=min_id, approximate=False)
+        pipe.execute()
 
 
 class Info:
@@ -118,6 +138,28 @@ class Event:
         redis.hdel(self.key, key)
 
 
+class Checkpoint:
+    """ Обработанные части задачи (множество в Redis), чтобы прерванный
+    запуск продолжился с места остановки """
+    TTL = 2 * 24 * 60 * 60
+
+    def __init__(self, module_name: str, task_name: str, run: str) -> None:
+        self.key = f'api.{module_name}.checkpoint.{task_name}.{run}'
+
+    def get(self) -> set[str]:
+        return {item.decode() for item in redis.smembers(self.key)}
+
+    def add(self, items: Iterable[str]) -> None:
+        items = list(items)
+        if not items:
+            return
+
+        pipe = redis.pipeline()
+        pipe.sadd(self.key, *items)
+        pipe.expire(self.key, self.TTL)
+        pipe.execute()
+
+
 def task_logging(function):
     @wraps(function)
     def decorated_function(task):
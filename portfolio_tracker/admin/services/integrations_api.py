@@ -1,8 +1,14 @@
 from __future__ import annotations
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
+import threading
 import time
-from typing import TYPE_CHECKING, Callable, Literal, TypeAlias
+from typing import TYPE_CHECKING, Callable, Iterator, List, Literal, \
+    Sequence, TypeAlias
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from flask import current_app
 
@@ -18,12 +24,183 @@ if TYPE_CHECKING:
 ApiName: TypeAlias = Literal['crypto', 'stocks', 'currency', 'proxy']
 API_NAMES: tuple[ApiName, ...] = ('crypto', 'stocks', 'currency', 'proxy')
 
+# HTTP сессии потоков на время жизни процесса: {(ID потока, прокси): сессия}
+_sessions: dict[tuple[int | None, str | None], requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+# Учет вызова потока (атомарно): задержка до запроса, минутное окно от
+# первого вызова окна, месячный счетчик по месяцу запуска и перенос
+# следующего вызова при исчерпании лимитов.
+# KEYS: следующий вызов, вызовы окна, начало окна, счетчики текущего и
+# следующего месяцев.
+# ARGV: сейчас, лимит в минуту, лимит в месяц, начало следующего месяца,
+# окончание хранения счетчиков месяцев, следующий вызов после исчерпания
+# месячного лимита (для каждого из месяцев).
+RESERVE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local minute_limit = tonumber(ARGV[2])
+local month_limit = tonumber(ARGV[3])
+local next_call = tonumber(redis.call('GET', KEYS[1]) or 0)
+local run = math.max(next_call, now)
+
+local start = tonumber(redis.call('GET', KEYS[3]) or 0)
+local minute_calls = 1
+if run < start + 60 then
+    minute_calls = redis.call('INCR', KEYS[2])
+else
+    start = run
+    local expire_at = math.ceil(start + 60)
+    redis.call('SET', KEYS[2], 1, 'EXAT', expire_at)
+    redis.call('SET', KEYS[3], tostring(start), 'EXAT', expire_at)
+end
+
+local m = 0
+if run >= tonumber(ARGV[4]) then
+    m = 1
+end
+local month_calls = redis.call('INCR', KEYS[4 + m])
+if month_calls == 1 then
+    redis.call('EXPIREAT', KEYS[4 + m], ARGV[5 + m])
+end
+
+local new_call = next_call
+if minute_limit > 0 and minute_calls >= minute_limit then
+    new_call = math.max(new_call, start + 60)
+end
+if month_limit > 0 and month_calls >= month_limit then
+    new_call = math.max(new_call, tonumber(ARGV[7 + m]))
+end
+if new_call > next_call then
+    redis.call('SET', KEYS[1], tostring(new_call))
+end
+return tostring(run - now)
+"""
+
+# Перенос следующего вызова только на более позднее время
+NEXT_CALL_SCRIPT = """
+if tonumber(ARGV[1]) > tonumber(redis.call('GET', KEYS[1]) or 0) then
+    redis.call('SET', KEYS[1], ARGV[1])
+    return 1
+end
+return 0
+"""
+
+
+class StreamLimiter:
+    """ Учет вызовов потоков API в Redis.
+
+    Минутное окно - счетчик на 60 сек. от первого вызова окна (с учетом
+    задержки), месячное - счетчик на календарный месяц, следующий
+    разрешенный вызов - timestamp. Учет вызова и перенос следующего вызова -
+    Lua скриптами, без гонок между задачами одного потока.
+    В таблицу api_stream данные сбрасываются периодически (flush).
+    """
+    FLUSH_INTERVAL = 60
+
+    def __init__(self, api_name: str) -> None:
+        self.key = f'api.{api_name}.streams'
+        self.last_flush = time.monotonic()
+        self._reserve = redis.register_script(RESERVE_SCRIPT)
+        self._change_next_call = redis.register_script(NEXT_CALL_SCRIPT)
+
+    def _key(self, stream_id: int, name: str) -> str:
+        return f'{self.key}.{stream_id}.{name}'
+
+    def _month_key(self, stream_id: int, date: datetime) -> str:
+        return self._key(stream_id, f'month.{date:%Y-%m}')
+
+    def sync(self, streams: List[Stream]) -> None:
+        """ Начальные значения из БД (если в Redis их еще нет) """
+        now = datetime.now()
+        expire_at = next_month(now) + timedelta(days=1)
+        pipe = redis.pipeline()
+        for stream in streams:
+            if stream.next_call:
+                pipe.set(self._key(stream.id, 'next_call'),
+                         stream.next_call.timestamp(), nx=True)
+
+            first_call = stream.first_call_month
+            if (stream.month_calls and first_call
+                    and (first_call.year, first_call.month) == (now.year, now.month)):
+                pipe.set(self._month_key(stream.id, now), stream.month_calls,
+                         nx=True, exat=expire_at)
+        pipe.execute()
+
+    def next_calls(self, stream_ids: List[int]) -> dict[int, float]:
+        if not stream_ids:
+            return {}
+
+        values = redis.mget([self._key(i, 'next_call') for i in stream_ids])
+        return {i: float(v) if v else 0.0 for i, v in zip(stream_ids, values)}
+
+    def minute_calls(self, stream_id: int) -> int:
+        return int(redis.get(self._key(stream_id, 'minute')) or 0)
+
+    def reserve(self, stream_id: int, minute_limit: int | None,
+                month_limit: int | None) -> float:
+        """ Учет вызова. Возвращает задержку до запроса """
+        now = datetime.now()
+        # Запуск после задержки может прийтись на следующий месяц
+        months = (now, next_month(now).replace(hour=0))
+        keys = [self._key(stream_id, 'next_call'),
+                self._key(stream_id, 'minute'),
+                self._key(stream_id, 'minute_start'),
+                *(self._month_key(stream_id, d) for d in months)]
+        args = [now.timestamp(), minute_limit or 0, month_limit or 0,
+                months[1].timestamp(),
+                *(int((next_month(d) + timedelta(days=1)).timestamp())
+                  for d in months),
+                *(next_month(d).timestamp() for d in months)]
+        return float(self._reserve(keys=keys, args=args))
+
+    def change_next_call(self, stream_id: int, timestamp: float) -> None:
+        self._change_next_call(keys=[self._key(stream_id, 'next_call')],
+                               args=[timestamp])
+
+    def set_next_call(self, stream_id: int, timestamp: float) -> None:
+        redis.set(self._key(stream_id, 'next_call'), timestamp)
+
+    def flush(self, streams: List[Stream]) -> None:
+        """ Сброс счетчиков в таблицу api_stream """
+        self.last_flush = time.monotonic()
+        if not streams:
+            return
+
+        now = datetime.now()
+        pipe = redis.pipeline()
+        for stream in streams:
+            pipe.get(self._key(stream.id, 'minute'))
+            pipe.get(self._month_key(stream.id, now))
+            pipe.get(self._key(stream.id, 'next_call'))
+        values = pipe.execute()
+
+        rows = []
+        for n, stream in enumerate(streams):
+            minute_calls, month_calls, next_call = values[n * 3:n * 3 + 3]
+            row = {'id': stream.id, 'minute_calls': int(minute_calls or 0),
+                   'month_calls': int(month_calls or 0),
+                   'first_call_month': now.replace(day=1, hour=0, minute=0,
+                                                   second=0, microsecond=0)}
+            if next_call:
+                row['next_call'] = datetime.fromtimestamp(float(next_call))
+            rows.append(row)
+
+        db.session.execute(db.update(Stream), rows)
+        db.session.commit()
+
+    def maybe_flush(self, streams: List[Stream]) -> None:
+        if time.monotonic() - self.last_flush > self.FLUSH_INTERVAL:
+            self.flush(streams)
+
 
 class ApiIntegration(integrations.Integration):
     def __init__(self, name: str | None):
         if name in API_NAMES:
             super().__init__(name)
             self.api = ApiRepository.get_by_name(name) or Api(name=name)
+            self.limiter = StreamLimiter(name)
+            self._streams: List[Stream] | None = None
 
     def minute_limit_trigger(self, response: requests.models.Response) -> int | bool:
         return False
@@ -79,6 +256,9 @@ class ApiIntegration(integrations.Integration):
 
             # Обновляем проки у потока
             if stream:
+                # У нового потока id еще нет - сессия None общая для всех
+                if stream.id is not None:
+                    close_session(stream.id)
                 stream.proxy_id = p['id']
                 stream.proxy = (f"{p['type']}://{p['user']}:{p['pass']}@"
                                 f"{p['host']}:{p['port']}")
@@ -90,6 +270,7 @@ class ApiIntegration(integrations.Integration):
             stream.active = False
 
         ApiRepository.save(self.api)
+        self._streams = None
 
     def start_work(self) -> None:
         redis.set(f'api.{self.api.name}.working', str(datetime.now()))
@@ -104,86 +285,112 @@ class ApiIntegration(integrations.Integration):
         return datetime.now() < time_start + timedelta(hours=2)
 
     def end_work(self) -> None:
+        self.limiter.flush(self.active_streams())
         redis.delete(f'api.{self.api.name}.working')
 
+    def active_streams(self) -> List[Stream]:
+        """ Активные потоки (загружаются один раз) """
+        if self._streams is None:
+            stmt = db.select(Stream).filter(Stream.api_id == self.api.id,
+                                            Stream.active)
+            self._streams = list(db.session.execute(stmt).scalars())
+            self.limiter.sync(self._streams)
+        return self._streams
+
+    def available_streams(self) -> List[Stream]:
+        """ Потоки, готовые к запросам в ближайшие 10 минут """
+        streams = self.active_streams()
+        next_calls = self.limiter.next_calls([s.id for s in streams])
+        max_time = time.time() + 600
+        return sorted((s for s in streams if next_calls[s.id] < max_time),
+                      key=lambda s: next_calls[s.id])
+
     def nearest_stream(self) -> Stream | None:
         """ Поиск ближайшего потока """
-        max_time = datetime.now() + timedelta(minutes=10)
-        stmt = (db.select(Stream)
-                .filter(Stream.api_id == self.api.id,
-                        Stream.active,
-                        Stream.next_call < max_time)
-                .order_by(Stream.next_call.asc()))
-        return db.session.execute(stmt).scalar()
+        streams = self.available_streams()
+        return streams[0] if streams else None
 
-    def new_call(self, stream) -> None:
-        api = self.api
-        now = datetime.now()
-        next_call = stream.next_call
-        delay = (next_call - now).total_seconds()
-        delay = delay if delay > 0 else 0
-
-        # Время запуска после задержки
-        run_time = now + timedelta(seconds=delay)
-
-        # Если после запуска будет больше минуты с первого запроса - обнуляем
-        if run_time >= stream.first_call_minute + timedelta(seconds=60):
-            stream.first_call_minute = run_time
-            stream.minute_calls = 0
-
-        # Настал следующий месяц после первого запроса - обнуляем
-        if (run_time.month > stream.first_call_month.month
-                or run_time.year > stream.first_call_month.year):
-            stream.first_call_month = run_time
-            stream.month_calls = 0
-
-        # Счетчики
-        stream.minute_calls += 1
-        stream.month_calls += 1
-
-        # Записываем следующий вызов в зависимости от лимита в минуту
-        if api.minute_limit and stream.minute_calls >= api.minute_limit:
-            next_call = stream.first_call_minute + timedelta(seconds=60 + delay)
-            self.change_next_call(next_call, stream)
-
-        # Перезаписываем следующий вызов в зависимости от лимита в месяц
-        if api.month_limit and stream.month_calls >= api.month_limit:
-            self.next_month_call(stream)
+    def is_available(self, stream: Stream) -> bool:
+        next_call = self.limiter.next_calls([stream.id])[stream.id]
+        return next_call < time.time() + 600
 
+    def disable_stream(self, stream: Stream) -> None:
+        stream.active = False
         db.session.commit()
+        if self._streams and stream in self._streams:
+            self._streams.remove(stream)
 
-        print(
-            f'Поток: {stream.name}, first_call: {stream.first_call_minute}, '
-            f'next_call: {stream.next_call}, '
-            f'calls: {stream.minute_calls}, delay: {delay}'
-        )
-
+    def new_call(self, stream) -> None:
         # Задержка до запроса (если есть)
-        time.sleep(delay)
+        time.sleep(self.reserve_call(stream))
+
+    def reserve_call(self, stream) -> float:
+        """ Учет вызова в счетчиках потока. Возвращает задержку до запроса """
+        api = self.api
+        delay = self.limiter.reserve(stream.id, api.minute_limit,
+                                     api.month_limit)
+        self.limiter.maybe_flush(self.active_streams())
+
+        current_app.logger.debug(f'Поток: {stream.name}, delay: {delay}')
+        return delay
 
     def update_minute_limit(self, retry_after, stream) -> None:
-        # Если нет минутного лимита - задаем
+        # Если нет минутного лимита - задаем по вызовам текущего окна
+        # (0 - окно истекло, лимит не известен)
         if not self.api.minute_limit:
-            self.api.minute_limit = stream.minute_calls
+            minute_calls = self.limiter.minute_calls(stream.id)
+            if minute_calls > 0:
+                self.api.minute_limit = minute_calls
+                db.session.commit()
 
         self.change_next_call(datetime.now() + timedelta(seconds=retry_after),
                               stream)
 
-        db.session.commit()
-
     def change_next_call(self, next_datetime, stream):
-        stream.next_call = max(stream.next_call, next_datetime)
+        self.limiter.change_next_call(stream.id, next_datetime.timestamp())
 
     def next_month_call(self, stream):
         # Следующий вызов 1 числа следующего месяца
-        now = datetime.now()
-        month = now.month + 1 if now.month != 12 else 1
-        year = now.year + 1 if month == 1 else now.year
-        next_month_call = datetime(year=year, month=month, day=1, hour=12)
-        self.change_next_call(next_month_call, stream)
-        db.session.commit()
+        self.change_next_call(next_month(datetime.now()), stream)
+
+    def limits_exceeded(self, response: requests.models.Response,
+                        stream: Stream) -> bool:
+        """ Проверка ответа на превышение лимитов (с переносом вызова) """
+        # Проверка на превышение минутного лимита
+        minute_limit = self.minute_limit_trigger(response)
+        if minute_limit is not False:
+            retry_after = minute_limit
+            # Логи
+            m = (f'Превышен лимит запросов в минуту'
+                 f'(retry_after={retry_after}). {stream.name}')
+            current_app.logger.warning(m, exc_info=True)
+            self.logs.set('warning', m)
+
+            # Уменьшить лимит
+            self.update_minute_limit(retry_after, stream)
+            return True
+
+        # Проверка на превышение месячного лимита
+        monthly_limit = self.monthly_limit_trigger(response)
+        if monthly_limit is not False:
+            # Логи
+            m = f'Превышен лимит запросов в месяц. {stream.name}'
+            current_app.logger.warning(m, exc_info=True)
+            self.logs.set('warning', m)
+
+            # Отодвинуть следующий вызов
+            self.next_month_call(stream)
+            return True
 
-    def request(self, make_url: Callable) -> requests.models.Response | None:
+        return False
+
+    def request(self, make_url: Callable, stream_body: bool = False
+                ) -> requests.models.Response | None:
+        """ Запрос по ближайшему потоку.
+
+        stream_body - тело ответа не загружается сразу (для потокового
+        разбора, JsonStream).
+        """
         api = self.api
         while True:
             # Поиск потока
@@ -197,42 +404,154 @@ class ApiIntegration(integrations.Integration):
             url = make_url(key)
 
             # Запрос
-            response = request_data(self, url, stream)
+            response = request_data(self, url, stream, stream_body)
             if response is None:
-                stream.active = False
-                db.session.commit()
+                self.disable_stream(stream)
                 return
 
-            # Проверка на превышение минутного лимита
-            minute_limit = self.minute_limit_trigger(response)
-            if minute_limit is not False:
-                retry_after = minute_limit
-                # Логи
-                m = (f'Превышен лимит запросов в минуту'
-                     f'(retry_after={retry_after}). {stream.name}')
-                current_app.logger.warning(m, exc_info=True)
-                self.logs.set('warning', m)
-
-                # Уменьшить лимит
-                self.update_minute_limit(retry_after, stream)
+            # Проверка лимитов
+            if self.limits_exceeded(response, stream):
                 continue
 
-            # Проверка на превышение месячного лимита
-            monthly_limit = self.monthly_limit_trigger(response)
-            if monthly_limit is not False:
-                # Логи
-                m = f'Превышен лимит запросов в месяц. {stream.name}'
-                current_app.logger.warning(m, exc_info=True)
-                self.logs.set('warning', m)
+            return response
 
-                # Отодвинуть следующий вызов
-                self.next_month_call(stream)
-                continue
+    def request_many(self, make_urls: Sequence[Callable]
+                     ) -> Iterator[tuple[int, requests.models.Response | None]]:
+        """ Параллельные запросы по всем доступным потокам.
 
-            return response
+        В работе не больше одного запроса на поток. Счетчики и лимиты потоков
+        ведутся здесь же (reserve_call, limits_exceeded), в пуле выполняются
+        только ожидание задержки и сам запрос. Ответы возвращаются по мере
+        готовности: (индекс make_url, ответ).
+        """
+        api = self.api
+        app = current_app._get_current_object()
+        queue = deque(enumerate(make_urls))
+        streams = self.available_streams()
+        if not streams or not queue:
+            for i, make_url in queue:
+                yield i, self.request(make_url)
+            return
 
+        running = {}
+        with ThreadPoolExecutor(max_workers=len(streams)) as executor:
+            while queue or running:
+                # Запросы для свободных потоков
+                while queue and streams:
+                    stream = streams.pop(0)
+                    i, make_url = queue.popleft()
+                    key = (f'{api.key_prefix}{stream.key.api_key}'
+                           if stream.key else '')
+                    url = make_url(key)
+                    if not url.startswith('http'):
+                        streams.append(stream)
+                        yield i, None
+                        continue
+
+                    future = executor.submit(
+                        fetch_data, app, self, url, get_session(stream),
+                        stream.name, self.reserve_call(stream))
+                    running[future] = (i, make_url, stream)
+
+                # Все потоки выбыли
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    i, make_url, stream = running.pop(future)
+                    response = future.result()
+
+                    # Поток недоступен - запрос уходит другому потоку
+                    if response is None:
+                        self.disable_stream(stream)
+                        queue.appendleft((i, make_url))
+                        continue
+
+                    # Превышен лимит - повтор запроса
+                    retry = self.limits_exceeded(response, stream)
+                    if retry:
+                        queue.appendleft((i, make_url))
+
+                    # Поток возвращается, если не ушел на долгую паузу
+                    if self.is_available(stream):
+                        streams.append(stream)
+
+                    if not retry:
+                        yield i, response
+
+        self.limiter.flush(self.active_streams())
+
+        # Оставшиеся запросы - последовательно (или без ответа)
+        for i, make_url in queue:
+            yield i, self.request(make_url)
+
+
+def next_month(date: datetime) -> datetime:
+    """ 1 число следующего месяца, 12:00 """
+    month = date.month + 1 if date.month != 12 else 1
+    year = date.year + 1 if month == 1 else date.year
+    return datetime(year=year, month=month, day=1, hour=12)
+
+
+def stream_proxies(stream: Stream | None) -> dict:
+    if not (stream and stream.proxy):
+        return {}
+
+    proxy = stream.proxy.replace('https://', 'http://')
+    return {'http': proxy, 'https': proxy}
+
+
+def get_session(stream: Stream | None = None) -> requests.Session:
+    """ HTTP сессия потока: keep-alive пул соединений через прокси потока и
+    повторы с нарастающей задержкой. Смена прокси потока - новая сессия """
+    key = (stream.id, stream.proxy) if stream else (None, None)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session:
+            return session
+
+        # Сессии потока со старым прокси
+        if stream:
+            for old_key in [k for k in _sessions if k[0] == stream.id]:
+                _sessions.pop(old_key).close()
+
+        config = current_app.config
+        retry = Retry(total=config['API_MAX_RETRIES'],
+                      backoff_factor=config['API_BACKOFF_FACTOR'],
+                      status_forcelist=(500, 502, 503, 504),
+                      allowed_methods=('GET',),
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=config['API_POOL_SIZE'],
+                              pool_maxsize=config['API_POOL_SIZE'],
+                              max_retries=retry)
+
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.proxies.update(stream_proxies(stream))
+        _sessions[key] = session
+        return session
+
+
+def close_session(stream_id: int | None) -> None:
+    """ Закрытие сессий потока (при смене прокси) """
+    with _sessions_lock:
+        for key in [k for k in _sessions if k[0] == stream_id]:
+            _sessions.pop(key).close()
+
+
+def fetch_data(app, api, url: str, session: requests.Session,
+               stream_name: str = '', delay: float = 0
+               ) -> requests.models.Response | None:
+    """ Запрос из пула потоков (со своим контекстом приложения) """
+    with app.app_context():
+        time.sleep(delay)
+        return send_request(api, url, session, stream_name)
 
-def request_data(api, url: str, stream: Stream | None = None
+
+def request_data(api, url: str, stream: Stream | None = None,
+                 stream_body: bool = False
                  ) -> requests.models.Response | None:
     # Неверная ссылка
     if not url.startswith('http'):
@@ -240,30 +559,27 @@ def request_data(api, url: str, stream: Stream | None = None
 
     time.sleep(0.1)
 
-    proxies = {}
     if stream:
         api.new_call(stream)
 
-        # Прокси
-        if stream.proxy:
-            proxy = stream.proxy.replace('https://', 'http://')
-            proxies = {'http': proxy, 'https': proxy}
-
-    max_attempts = 3
-    while max_attempts > 0:
-        max_attempts -= 1
-
-        try:
-            return requests.get(url, proxies=proxies)
-
-        except requests.exceptions.ConnectionError as e:
-            m = f'{stream.name + ". " if stream else ""}Ошибка. {url}. {e}'
-            current_app.logger.error(m, exc_info=True)
-            api.logs.set('error', m)
-            time.sleep(60)
-
-        except Exception as e:
-            m = f'{stream.name + ". " if stream else ""}Ошибка. {url}. {e}'
-            current_app.logger.error(m, exc_info=True)
-            api.logs.set('error', m)
-            raise
+    return send_request(api, url, get_session(stream),
+                        stream.name if stream else '', stream_body)
+
+
+def send_request(api, url: str, session: requests.Session,
+                 stream_name: str = '', stream_body: bool = False
+                 ) -> requests.models.Response | None:
+    try:
+        # Повторы при ошибках соединения - в адаптере сессии
+        return session.get(url, stream=stream_body)
+
+    except requests.exceptions.ConnectionError as e:
+        m = f'{stream_name + ". " if stream_name else ""}Ошибка. {url}. {e}'
+        current_app.logger.error(m, exc_info=True)
+        api.logs.set('error', m)
+
+    except Exception as e:
+        m = f'{stream_name + ". " if stream_name else ""}Ошибка. {url}. {e}'
+        current_app.logger.error(m, exc_info=True)
+        api.logs.set('error', m)
+        raise
@@ -1,6 +1,6 @@
 from __future__ import annotations
 from datetime import datetime
-from typing import TYPE_CHECKING, Literal, TypeAlias
+from typing import TYPE_CHECKING, Collection, Literal, TypeAlias
 
 from portfolio_tracker.admin.services.integrations_api import ApiIntegration
 from portfolio_tracker.general_functions import MARKETS
@@ -26,7 +26,7 @@ class MarketEvent(integrations.Event):
             'updated_images': 'Обновлены картинки'
         }
 
-    def update(self, ids_in_event: list[str], event_name: Events,
+    def update(self, ids_in_event: Collection[str], event_name: Events,
                exclude_missing: bool = True) -> None:
         today_str = str(datetime.now().date())
 
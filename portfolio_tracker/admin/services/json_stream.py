@@ -0,0 +1,119 @@
+"""Потоковый разбор больших JSON-ответов API.
+
+Ответ читается частями (response.iter_content) и элементы массива
+возвращаются по мере получения, без загрузки всего тела в память. Массив
+может быть всем ответом ({key} = None) или полем объекта верхнего уровня
+({"results": [...], "next_url": ...}), остальные поля объекта доступны
+в fields после перебора элементов.
+"""
+from __future__ import annotations
+import codecs
+import json
+from typing import Any, Dict, Iterable, Iterator
+
+CHUNK_SIZE = 64 * 1024
+_WHITESPACE = ' \t\n\r'
+_NUMBER_START = '-0123456789'
+# Символы, которыми может продолжаться число
+_NUMBER_CHARS = '.eE+-0123456789'
+
+
+class JsonStream:
+    def __init__(self, chunks: Iterable[bytes], key: str | None = None
+                 ) -> None:
+        self.key = key
+        self.fields: Dict[str, Any] = {}
+        self._chunks = iter(chunks)
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder('utf-8')()
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+
+    @classmethod
+    def from_response(cls, response, key: str | None = None) -> JsonStream:
+        return cls(response.iter_content(CHUNK_SIZE), key)
+
+    def __iter__(self) -> Iterator[Any]:
+        if self.key is None:
+            yield from self._array()
+            return
+
+        self._expect('{')
+        if self._peek() == '}':
+            self._pos += 1
+            return
+
+        while True:
+            field = self._value()
+            self._expect(':')
+            if field == self.key and self._peek() == '[':
+                yield from self._array()
+            else:
+                self.fields[field] = self._value()
+
+            if self._expect(',}') == '}':
+                return
+
+    def _fill(self) -> bool:
+        """Следующая часть ответа в буфер"""
+        if self._eof:
+            return False
+
+        for chunk in self._chunks:
+            if chunk:
+                self._buf = self._buf[self._pos:] + self._text.decode(chunk)
+                self._pos = 0
+                return True
+
+        self._buf = self._buf[self._pos:] + self._text.decode(b'', final=True)
+        self._pos = 0
+        self._eof = True
+        return False
+
+    def _peek(self) -> str:
+        """Следующий значимый символ (пустая строка - конец ответа)"""
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ''
+
+    def _expect(self, chars: str) -> str:
+        char = self._peek()
+        if not char or char not in chars:
+            raise json.JSONDecodeError(f'Expecting {chars!r}', self._buf,
+                                       self._pos)
+        self._pos += 1
+        return char
+
+    def _value(self) -> Any:
+        """Значение целиком (элемент массива или поле объекта)"""
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+                # Число в конце буфера ('1', '1.', '1e') может продолжаться
+                # в следующей части
+                if (self._eof or self._buf[self._pos] not in _NUMBER_START
+                        or (end < len(self._buf)
+                            and self._buf[end] not in _NUMBER_CHARS)):
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._fill()
+
+    def _array(self) -> Iterator[Any]:
+        self._expect('[')
+        if self._peek() == ']':
+            self._pos += 1
+            return
+
+        while True:
+            yield self._value()
+            if self._expect(',]') == ']':
+                return
@@ -1,18 +1,19 @@
 from __future__ import annotations
-import os
-from typing import TYPE_CHECKING, List
-from io import BytesIO
+from datetime import date, datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Iterable, List, Tuple
 
 from flask import current_app
-from sqlalchemy import func
-from PIL import Image
+from sqlalchemy import and_, exists, func, or_
 
 from portfolio_tracker.app import db, celery
-from portfolio_tracker.general_functions import MARKETS, Market, add_prefix, remove_prefix
+from portfolio_tracker.general_functions import MARKETS, Market, add_prefix, \
+    get_prefix
 from portfolio_tracker.portfolio.models import Ticker
-from portfolio_tracker.watchlist.models import WatchlistAsset
+from portfolio_tracker.portfolio.repository import PriceHistoryRepository
+from portfolio_tracker.watchlist.models import Alert, WatchlistAsset
 from portfolio_tracker.user.models import User
-from portfolio_tracker.admin.services.integrations_api import API_NAMES, ApiIntegration, request_data
+from portfolio_tracker.admin.services.integrations import Checkpoint
+from portfolio_tracker.admin.services.integrations_api import API_NAMES, ApiIntegration
 from portfolio_tracker.admin.services.integrations_market import MarketIntegration
 from portfolio_tracker.admin.services.integrations_other import MODULE_NAMES, OtherIntegration
 
@@ -20,17 +21,32 @@ if TYPE_CHECKING:
     pass
 
 
-def get_tickers(market: Market | None = None, without_image: bool = False,
-                without_ids: List[str] | None = None) -> List[Ticker]:
-    select = db.select(Ticker).order_by(Ticker.market_cap_rank.is_(None),
-                                        Ticker.market_cap_rank.asc())
+def _tickers_select(select, market: Market | None = None,
+                    without_image: bool = False,
+                    without_ids: List[str] | None = None):
+    select = select.order_by(Ticker.market_cap_rank.is_(None),
+                             Ticker.market_cap_rank.asc())
     if market:
         select = select.filter_by(market=market)
     if without_image:
         select = select.filter_by(image=None)
     if without_ids:
         select = select.filter(Ticker.id.notin_(without_ids))
+    return select
+
+
+def get_tickers(market: Market | None = None, without_image: bool = False,
+                without_ids: List[str] | None = None) -> List[Ticker]:
+    select = _tickers_select(db.select(Ticker), market, without_image,
+                             without_ids)
+    return list(db.session.execute(select).scalars())
+
 
+def get_tickers_ids(market: Market | None = None,
+                    without_ids: List[str] | None = None) -> List[str]:
+    """ID тикеров без загрузки объектов (для массового обновления цен)."""
+    select = _tickers_select(db.select(Ticker.id), market,
+                             without_ids=without_ids)
     return list(db.session.execute(select).scalars())
 
 
@@ -46,13 +62,71 @@ def get_users_count(user_type: str | None = None) -> int:
     return db.session.execute(select).scalar() or 0
 
 
-def find_ticker_in_list(external_id: str, tickers: list[Ticker],
-                        market: Market) -> Ticker | None:
-    ticker_id = add_prefix(external_id, market)
+class TickersIndex:
+    """Индекс тикеров рынка для загрузчиков.
 
-    for ticker in tickers:
-        if ticker.id == ticker_id:
-            return ticker
+    Поиск тикера по внешнему ID за O(1) (словарь по ID с префиксом), учет
+    ненайденных тикеров во множестве и новых тикеров в списке.
+    """
+
+    def __init__(self, tickers: Iterable[Ticker], market: Market) -> None:
+        self.market = market
+        self.prefix = get_prefix(market)
+        self.tickers = {ticker.id: ticker for ticker in tickers}
+        self.not_found_ids = set(self.tickers)
+        self.new_ids = []
+
+    def __len__(self) -> int:
+        return len(self.tickers)
+
+    def get(self, external_id: str) -> Ticker | None:
+        return self.tickers.get((self.prefix + external_id).lower())
+
+    def get_or_create(self, external_id: str) -> Ticker:
+        """Возвращает тикер (или создает новый) и отмечает его найденным."""
+        ticker = self.get(external_id)
+        if not ticker:
+            ticker = create_ticker(external_id, self.market)
+            self.tickers[ticker.id] = ticker
+            self.new_ids.append(ticker.id)
+
+        # Исключение из ненайденных
+        self.not_found_ids.discard(ticker.id)
+        return ticker
+
+
+def history_period() -> Tuple[date, date]:
+    """Период загрузки истории цен: HISTORY_DAYS дней по вчерашний (UTC)"""
+    end = datetime.now(timezone.utc).date() - timedelta(days=1)
+    return end - timedelta(days=current_app.config['HISTORY_DAYS'] - 1), end
+
+
+class HistoryWriter:
+    """Пакетная запись истории цен: строки копятся и сохраняются одним
+    upsert, после чего обработанные части отмечаются в checkpoint.
+    only_missing - записываются только даты без цены."""
+
+    def __init__(self, checkpoint: Checkpoint, batch_size: int = 5000,
+                 only_missing: bool = False) -> None:
+        self.checkpoint = checkpoint
+        self.batch_size = batch_size
+        self.only_missing = only_missing
+        self.rows: List[Tuple[str, date, float]] = []
+        self.done: List[str] = []
+        self.count = 0
+
+    def add(self, done: str, rows: Iterable[Tuple[str, date, float]]) -> None:
+        self.rows.extend(rows)
+        self.done.append(done)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        PriceHistoryRepository.upsert(self.rows,
+                                      only_missing=self.only_missing)
+        self.checkpoint.add(self.done)
+        self.count += len(self.rows)
+        self.rows, self.done = [], []
 
 
 def create_ticker(external_id: str, market: Market) -> Ticker:
@@ -65,42 +139,6 @@ def create_ticker(external_id: str, market: Market) -> Ticker:
     return ticker
 
 
-def load_image(url: str, market: Market, ticker_id: str, api: ApiIntegration
-               ) -> str | None:
-
-    # Папка хранения изображений
-    upload_folder = current_app.config['UPLOAD_FOLDER']
-    path = f'{upload_folder}/images/tickers/{market}'
-    os.makedirs(path, exist_ok=True)
-
-    ticker_id = remove_prefix(ticker_id, market)
-
-    response = request_data(api, url)
-    if not response:
-        return
-
-    try:
-        original_img = Image.open(BytesIO(response.content))
-        filename = f'{ticker_id}.{original_img.format}'.lower()
-        api.logs.set('info', f'Загружена иконка ## {ticker_id}')
-    except Exception as e:
-        api.logs.set('error', f'Ошибка загрузки иконки: {type(e)}')
-        current_app.logger.error('Ошибка', exc_info=True)
-        raise
-
-    def resize_image(px):
-        size = (px, px)
-        path_local = os.path.join(path, str(px))
-        os.makedirs(path_local, exist_ok=True)
-        path_saved = os.path.join(path_local, filename)
-        original_img.resize(size).save(path_saved)
-
-    resize_image(24)
-    resize_image(40)
-
-    return filename
-
-
 def get_tasks() -> list:
     i = celery.control.inspect()
     active = i.active()
@@ -141,27 +179,39 @@ def task_action(active_ids: list, action: str, task_id: str | None = None,
         task.delay()
 
 
-def alerts_update(market):
-    # Отслеживаемые тикеры
-    tracked_tickers = db.session.execute(
-        db.select(WatchlistAsset)
-        .join(WatchlistAsset.ticker).filter_by(market=market)).scalars()
-
-    for ticker in tracked_tickers:
-        price = ticker.ticker.price
-        # ToDo Перенести в запрос
-        if not ticker.alerts or not price:
-            continue
-
-        for alert in ticker.alerts:
-            if alert.status != 'on':
-                continue
-
-            if ((alert.type == 'down' and price <= alert.price)
-                    or (alert.type == 'up' and price >= alert.price)):
-                alert.status = 'worked'
+def alerts_update(market: Market, ids: Iterable[int] | None = None
+                  ) -> List[int]:
+    """Срабатывание уведомлений по текущим ценам тикеров одним запросом.
+    Если переданы ids - проверяются только они (кандидаты из индекса).
+    Возвращает ID сработавших уведомлений."""
+    triggered = exists(
+        db.select(WatchlistAsset.id)
+        .join(WatchlistAsset.ticker)
+        .where(WatchlistAsset.id == Alert.watchlist_asset_id,
+               Ticker.market == market, Ticker.price > 0,
+               or_(and_(Alert.type == 'down', Ticker.price <= Alert.price_usd),
+                   and_(Alert.type == 'up', Ticker.price >= Alert.price_usd))))
+    where = (Alert.status == 'on', triggered)
+    if ids is not None:
+        ids = list(ids)
+        if not ids:
+            return []
+        where += (Alert.id.in_(ids),)
+
+    if db.session.get_bind().dialect.update_returning:
+        ids = list(db.session.execute(
+            db.update(Alert).where(*where).values(status='worked')
+            .returning(Alert.id),
+            execution_options={'synchronize_session': False}).scalars())
+    else:
+        ids = list(db.session.execute(db.select(Alert.id).where(*where)).scalars())
+        if ids:
+            db.session.execute(
+                db.update(Alert).where(Alert.id.in_(ids)).values(status='worked'),
+                execution_options={'synchronize_session': False})
 
     db.session.commit()
+    return ids
 
 
 def get_module(module_name: str | None
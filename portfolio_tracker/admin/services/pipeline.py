@@ -0,0 +1,201 @@
+"""Конвейер загрузки: получение -> разбор -> пакетная запись.
+
+Стадии связаны очередями ограниченного размера, поэтому сетевые запросы
+следующих частей идут, пока предыдущие разбираются и сохраняются, а память
+не растет, если запись отстает. Получение выполняется в вызывающем потоке
+(request_many сам распределяет запросы по потокам API и работает с сессией
+базы задачи), разбор - в отдельном потоке, запись - в отдельном потоке со
+своим контекстом приложения (и своей сессией базы).
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+import queue
+import threading
+import time
+from typing import Any, Callable, Iterable, List
+
+from flask import current_app
+
+from portfolio_tracker.app import db
+
+# Конец данных в очереди
+_DONE = object()
+
+
+class StopPipeline(Exception):
+    """Остановка конвейера из стадии (уже разобранные данные сохраняются)"""
+
+
+@dataclass
+class StageMetrics:
+    name: str
+    items: int = 0
+    # Время работы стадии и ожидания места в следующей очереди, сек.
+    busy: float = 0
+    blocked: float = 0
+
+    def __str__(self) -> str:
+        return (f'{self.name}: {self.items} шт., {self.busy:.2f} с'
+                f' (ожидание {self.blocked:.2f} с)')
+
+
+class Pipeline:
+    """Конвейер из источника, функции разбора и функции пакетной записи.
+
+    parse получает элемент источника и возвращает данные для записи (None -
+    нечего записывать), write получает список данных не длиннее batch_size.
+    """
+
+    def __init__(self, parse: Callable[[Any], Any],
+                 write: Callable[[List[Any]], None],
+                 batch_size: int = 1, maxsize: int = 4) -> None:
+        self.parse = parse
+        self.write = write
+        self.batch_size = batch_size
+        self.maxsize = maxsize
+        self.metrics = [StageMetrics('получение'), StageMetrics('разбор'),
+                        StageMetrics('запись')]
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._errors: List[BaseException] = []
+
+    def run(self, source: Iterable) -> bool:
+        """Прогон источника через конвейер.
+
+        Возвращает False, если конвейер остановлен стадией (StopPipeline).
+        Ошибки стадий пробрасываются в вызывающий поток.
+        """
+        start = time.perf_counter()
+        self._stop.clear()
+        self._errors = []
+        parsed: queue.Queue = queue.Queue(self.maxsize)
+        fetched: queue.Queue = queue.Queue(self.maxsize)
+        app = current_app._get_current_object()
+
+        threads = [
+            threading.Thread(target=self._parse_stage, args=(fetched, parsed),
+                             daemon=True),
+            threading.Thread(target=self._write_stage, args=(app, parsed),
+                             daemon=True)]
+        for thread in threads:
+            thread.start()
+
+        metrics = self.metrics[0]
+        try:
+            items = iter(source)
+            while not self._stop.is_set():
+                t = time.perf_counter()
+                try:
+                    item = next(items)
+                except StopIteration:
+                    break
+                finally:
+                    metrics.busy += time.perf_counter() - t
+                metrics.items += 1
+                self._put(fetched, item, metrics)
+        except StopPipeline:
+            self._stop.set()
+        except BaseException:
+            self._stop.set()
+            raise
+        finally:
+            self._put(fetched, _DONE, metrics, force=True)
+            for thread in threads:
+                thread.join()
+            # Новая транзакция сессии задачи - видны записанные конвейером данные
+            db.session.commit()
+            self.elapsed = time.perf_counter() - start
+
+        if self._failed():
+            raise next(e for e in self._errors
+                       if not isinstance(e, StopPipeline))
+        return not self._stop.is_set()
+
+    def log(self, logs, task_name: str = '') -> None:
+        """Время стадий в журнал интеграции"""
+        stages = ', '.join(str(m) for m in self.metrics)
+        logs.set('info', f'Конвейер {self.elapsed:.2f} с: {stages}', task_name)
+
+    def _put(self, q: queue.Queue, item, metrics: StageMetrics,
+             force: bool = False) -> None:
+        """Запись в очередь с ожиданием места (пока конвейер не остановлен).
+
+        force - ждать и после остановки: следующая стадия разбирает очередь
+        до конца.
+        """
+        t = time.perf_counter()
+        while True:
+            try:
+                q.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                if self._stop.is_set() and not force:
+                    break
+        metrics.blocked += time.perf_counter() - t
+
+    def _fail(self, error: BaseException) -> None:
+        self._errors.append(error)
+        self._stop.set()
+
+    def _failed(self) -> bool:
+        return any(not isinstance(e, StopPipeline) for e in self._errors)
+
+    def _parse_stage(self, fetched: queue.Queue, parsed: queue.Queue) -> None:
+        metrics = self.metrics[1]
+        while True:
+            item = fetched.get()
+            if item is _DONE:
+                break
+            # После остановки очередь только разбирается
+            if self._stop.is_set():
+                continue
+
+            t = time.perf_counter()
+            try:
+                data = self.parse(item)
+            except BaseException as e:
+                self._fail(e)
+                continue
+            finally:
+                metrics.busy += time.perf_counter() - t
+            if data is not None:
+                metrics.items += 1
+                self._put(parsed, data, metrics, force=True)
+        self._put(parsed, _DONE, metrics, force=True)
+
+    def _write_stage(self, app, parsed: queue.Queue) -> None:
+        metrics = self.metrics[2]
+        batch: List[Any] = []
+
+        def flush() -> None:
+            t = time.perf_counter()
+            try:
+                self.write(list(batch))
+            finally:
+                metrics.busy += time.perf_counter() - t
+            metrics.items += len(batch)
+            batch.clear()
+
+        with app.app_context():
+            while True:
+                data = parsed.get()
+                if data is _DONE:
+                    break
+                # Ошибка в другой стадии - дальше не записывается
+                if self._failed():
+                    continue
+
+                batch.append(data)
+                if len(batch) >= self.batch_size:
+                    try:
+                        flush()
+                    except BaseException as e:
+                        self._fail(e)
+                        batch.clear()
+
+            # Остаток (в том числе при остановке из стадии)
+            if batch and not self._failed():
+                try:
+                    flush()
+                except BaseException as e:
+                    self._fail(e)
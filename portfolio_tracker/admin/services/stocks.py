@@ -1,16 +1,28 @@
 from __future__ import annotations
 from datetime import datetime, timedelta, timezone
+from itertools import islice
 from typing import TYPE_CHECKING
 
 from flask import current_app
 
 from portfolio_tracker.app import db, celery
-from portfolio_tracker.general_functions import Market, remove_prefix
-from portfolio_tracker.admin.services.integrations import task_logging
+from portfolio_tracker.general_functions import Market, add_prefix, remove_prefix
+from portfolio_tracker.portfolio.repository import PriceHistoryRepository, \
+    TickerRepository
+from portfolio_tracker.services.price_cache import publish_prices
+from portfolio_tracker.services.sprites import build_sprite
+from portfolio_tracker.services.summary import refresh_summaries
+from portfolio_tracker.services.ticker_search import reset_index
+from portfolio_tracker.watchlist.services.alert_index import get_alert_index
+from portfolio_tracker.admin.services.integrations import Checkpoint, task_logging
 from portfolio_tracker.admin.services.integrations_api import ApiName
+from portfolio_tracker.admin.services.images import IconLoader, save_images
 from portfolio_tracker.admin.services.integrations_market import MarketIntegration
-from portfolio_tracker.admin.services.other_services import alerts_update, create_ticker, get_tickers, \
-    load_image, find_ticker_in_list
+from portfolio_tracker.admin.services.json_stream import JsonStream
+from portfolio_tracker.admin.services.pipeline import Pipeline, StopPipeline
+from portfolio_tracker.admin.services.other_services import HistoryWriter, \
+    alerts_update, get_tickers, get_tickers_ids, history_period, \
+    TickersIndex
 
 if TYPE_CHECKING:
     import requests
@@ -19,6 +31,8 @@ if TYPE_CHECKING:
 API_NAME: ApiName = 'stocks'
 MARKET: Market = 'stocks'
 BASE_URL: str = 'https://api.polygon.io/'
+# Цен в одной части разбора и записи
+PARSE_CHUNK: int = 5000
 
 
 class Api(MarketIntegration):
@@ -34,54 +48,92 @@ class Api(MarketIntegration):
             self.logs.set('warning', m)
             current_app.logger.warning(m, exc_info=True)
 
+    def response_stream(self, response: requests.models.Response | None,
+                        key: str = 'results') -> JsonStream | None:
+        """Потоковый разбор ответа (запрос с stream_body=True): элементы
+        массива key по мере загрузки тела"""
+        if response:
+            if response.status_code == 200:
+                return JsonStream.from_response(response, key)
+
+            self.response_processing(response)
+
 
 @celery.task(bind=True, name='stocks_load_prices', max_retries=None)
 @task_logging
 def stocks_load_prices(self) -> None:
 
     api = Api(API_NAME)
-    tickers = get_tickers(MARKET)
-    not_updated_ids = [ticker.id for ticker in tickers]
+    ids = set(get_tickers_ids(MARKET))
     max_attempts = 5
     url = f'{BASE_URL}v2/aggs/grouped/locale/us/market/stocks/'
-    data = None
+    # Индекс порогов - уведомления срабатывают по мере сохранения цен
+    alerts = get_alert_index(MARKET)
 
     # Если меньше полудня - запрос на предыдущий день
     date = datetime.now().date()
     if datetime.now(timezone.utc).hour < 12:
         date -= timedelta(days=1)
 
-    # Получение данных
-    while not data and max_attempts > 0:
-        max_attempts -= 1
-
+    def fetch():
+        nonlocal date
         # Вчерашняя цена закрытия (т.к. бесплатно) или более поздняя
-        date -= timedelta(days=1)
+        for _ in range(max_attempts):
+            date -= timedelta(days=1)
+
+            api.logs.set('info', f'Попытка запроса на {date}', self.name)
+            response = api.request(lambda key: f'{url}{date}?{key}',
+                                   stream_body=True)
+            results = api.response_stream(response)
+            # Ошибка
+            if results is None:
+                raise StopPipeline
+
+            # Разбор и запись частями по мере загрузки ответа
+            results = iter(results)
+            chunk = list(islice(results, PARSE_CHUNK))
+            if chunk:
+                while chunk:
+                    yield chunk
+                    chunk = list(islice(results, PARSE_CHUNK))
+                return
 
-        api.logs.set('info', f'Попытка запроса на {date}', self.name)
-        response = api.request(lambda key: f'{url}{date}?{key}')
-        data = api.response_processing(response)
-        # Ошибка
-        if not data:
-            return
-        data = data.get('results')
-
-    if not data:
         api.logs.set('error', 'Нет данных', self.name)
+        raise StopPipeline
+
+    def parse(results: list) -> dict:
+        prices = {}
+        for item in results:
+            ticker_id = add_prefix(item['T'], MARKET)
+            if ticker_id in ids:
+                prices[ticker_id] = item['c']
+        return prices
+
+    updated = set()
+
+    def write(batch: list) -> None:
+        # Сохранение данных
+        for prices in batch:
+            TickerRepository.update_prices(prices)
+            alerts_update(MARKET, alerts.crossed(prices))
+            updated.update(prices)
+
+    pipeline = Pipeline(parse, write)
+    completed = pipeline.run(fetch())
+    pipeline.log(api.logs, self.name)
+    if not completed:
         return
 
-    # Сохранение данных
-    for item in data:
-        ticker = find_ticker_in_list(item['T'], tickers, MARKET)
-        if ticker:
-            ticker.price = item['c']
-            # Исключение из списка необновленных
-            if ticker.id in not_updated_ids:
-                not_updated_ids.remove(ticker.id)
+    # Необновленные
+    not_updated_ids = list(ids.difference(updated))
 
-    db.session.commit()
+    # Кэш цен
+    publish_prices()
 
-    # Обновить уведомления
+    # Снимки итогов пользователей
+    refresh_summaries(MARKET)
+
+    # Итоговая проверка (если индекс был недоступен или расходится с базой)
     alerts_update(MARKET)
 
     # События
@@ -96,59 +148,52 @@ def stocks_load_prices(self) -> None:
 def stocks_load_tickers(self) -> None:
 
     api = Api(API_NAME)
-    tickers = get_tickers(MARKET)
-    new_ids = []
-    not_found_ids = [ticker.id for ticker in tickers]
+    tickers = TickersIndex(get_tickers(MARKET), MARKET)
     url = f'{BASE_URL}v3/reference/tickers?market=stocks&limit=1000'
 
     # Пакетная загрузка
     while url:
         # Получение данных
-        response = api.request(lambda key: f'{url}&{key}')
-        data = api.response_processing(response)
+        response = api.request(lambda key: f'{url}&{key}', stream_body=True)
+        stocks = api.response_stream(response)
         # Ошибка
-        if not data:
+        if stocks is None:
             return
 
-        stocks = data.get('results')
-        if not stocks:
-            api.logs.set('error', 'Нет данных', self.name)
-            break
-
-        # Сохранение данных
+        # Сохранение данных по мере загрузки ответа
+        count = 0
         for stock in stocks:
+            count += 1
 
             # Внешний ID
             external_id = stock['ticker']
             if not external_id:
                 continue
 
-            # Поиск тикера
-            ticker = find_ticker_in_list(external_id, tickers, MARKET)
-            # Или добавление нового тикера
-            if not ticker:
-                ticker = create_ticker(external_id, MARKET)
-                tickers.append(ticker)
-                new_ids.append(ticker.id)
-
-            # Исключение из списка ненайденных
-            if ticker.id in not_found_ids:
-                not_found_ids.remove(ticker.id)
+            # Поиск тикера или добавление нового
+            ticker = tickers.get_or_create(external_id)
 
             # Обновление информации
             ticker.name = stock['name']
             ticker.symbol = stock['ticker']
 
+        if not count:
+            api.logs.set('error', 'Нет данных', self.name)
+            break
+
         db.session.commit()
 
-        # Следующий URL
-        url = data.get('next_url')
+        # Следующий URL (поле после results - известно после разбора)
+        url = stocks.fields.get('next_url')
         if url:
             api.logs.set('info', 'Получен следующий url', self.name)
 
+    # Индекс поиска тикеров
+    reset_index(MARKET)
+
     # События
-    api.events.update(new_ids, 'new_tickers', False)
-    api.events.update(not_found_ids, 'not_found_tickers')
+    api.events.update(tickers.new_ids, 'new_tickers', False)
+    api.events.update(tickers.not_found_ids, 'not_found_tickers')
 
     # Инфо
     api.info.set('Тикеры обновлены', datetime.now())
@@ -163,25 +208,76 @@ def stocks_load_images(self) -> None:
     url = f'{BASE_URL}v3/reference/tickers/'
     loaded_ids = []
 
-    while tickers:
-        ticker = tickers.pop(0)
-        ticker_id = remove_prefix(ticker.id, MARKET)
+    # Получение данных (параллельно по потокам), иконки скачиваются
+    # и уменьшаются в пулах по мере получения ссылок
+    make_urls = [lambda key, t_id=remove_prefix(ticker.id, MARKET).upper():
+                 f'{url}{t_id}?{key}' for ticker in tickers]
+    by_id = {ticker.id: ticker for ticker in tickers}
+    left = len(tickers)
+    with IconLoader(MARKET, api) as icons:
+        for i, response in api.request_many(make_urls):
+            left -= 1
+            data = api.response_processing(response)
+            data = data.get('results', {}) if data else {}
+            if data.get('branding') and data['branding'].get('icon_url'):
+                icons.add(tickers[i].id, f"{data['branding']['icon_url']}")
+
+            # Сохранение готовых
+            loaded_ids += save_images(icons.ready(), by_id, api)
+            if not left % 100:
+                api.logs.set('info', f'Осталось {left}', API_NAME)
+
+        loaded_ids += save_images(icons.wait(), by_id, api)
+
+    # Спрайт иконок рынка и индекс поиска (с именами иконок)
+    if loaded_ids:
+        build_sprite(MARKET)
+        reset_index(MARKET)
 
-        # Получение данных
-        t_id = ticker_id.upper()
-        response = api.request(lambda key: f'{url}{t_id}?{key}')
+    # События
+    api.events.update(loaded_ids, 'updated_images', False)
+
+
+@celery.task(bind=True, name='stocks_load_history', max_retries=None)
+@task_logging
+def stocks_load_history(self) -> None:
+
+    api = Api(API_NAME)
+    start, end = history_period()
+    url = f'{BASE_URL}v2/aggs/grouped/locale/us/market/stocks/'
+
+    # Дни торгов (будни) с пропусками хотя бы у одного тикера. Один запрос
+    # за день возвращает цены всех акций, выполненные дни отмечаются в
+    # пределах периода
+    checkpoint = Checkpoint(API_NAME, self.name, str(end))
+    done = checkpoint.get()
+    dates = [day for day
+             in reversed(PriceHistoryRepository.get_missing_days(MARKET, start, end))
+             if day.weekday() < 5 and str(day) not in done]
+    if not dates:
+        api.info.set('История загружена', datetime.now())
+        return
+
+    # Цены закрытия за каждый день (параллельно по потокам)
+    make_urls = [lambda key, d=day: f'{url}{d}?{key}' for day in dates]
+    # Цены известных тикеров, сохраненные не перезаписываются
+    ticker_ids = set(get_tickers_ids(MARKET))
+    writer = HistoryWriter(checkpoint, only_missing=True)
+    for i, response in api.request_many(make_urls):
         data = api.response_processing(response)
-        data = data.get('results', {}) if data else {}
-        if not (data.get('branding') and data['branding'].get('icon_url')):
+        if data is None:
             continue
 
-        # Загрузка иконки
-        image_url = f"{data['branding']['icon_url']}"
-        ticker.image = load_image(image_url, MARKET, ticker_id, api)
-        db.session.commit()
-        api.logs.set('info', f'Осталось {len(tickers)}', API_NAME)
-        # Добавление в список обновленных
-        loaded_ids.append(ticker.id)
+        day = dates[i]
+        rows = []
+        for item in data.get('results') or []:
+            ticker_id = add_prefix(item['T'], MARKET)
+            if ticker_id in ticker_ids and item.get('c'):
+                rows.append((ticker_id, day, item['c']))
+        writer.add(str(day), rows)
 
-    # События
-    api.events.update(loaded_ids, 'updated_images', False)
+    writer.flush()
+    api.logs.set('info', f'Сохранено цен: {writer.count}', self.name)
+
+    # Инфо
+    api.info.set('История загружена', datetime.now())
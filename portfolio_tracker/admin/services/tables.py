@@ -0,0 +1,144 @@
+"""Серверная выдача таблиц админки (bootstrap-table, side-pagination=server).
+
+Параметры запроса таблицы: search, sort, order, offset, limit и after - ключ
+последней строки предыдущей страницы. Следующая страница после after
+выбирается по ключу (значение сортировки, ID) без OFFSET, переход на
+произвольную страницу - через OFFSET. Количество строк всего и после фильтра
+считается одним запросом.
+"""
+from __future__ import annotations
+from typing import Any, Dict, List, NamedTuple, Sequence
+
+from sqlalchemy import ColumnElement, Row, Select, and_, case, func, or_
+
+from portfolio_tracker.app import db
+from portfolio_tracker.general_functions import Market
+from portfolio_tracker.portfolio.models import Portfolio, Ticker
+from portfolio_tracker.user.models import User, UserInfo
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 500
+
+
+class TablePage(NamedTuple):
+    rows: List[Row]
+    total: int
+    total_not_filtered: int
+    offset: int
+    # Ключ последней строки (для запроса следующей страницы)
+    after: Any = None
+
+
+def table_page(select: Select, key: ColumnElement,
+               columns: Dict[str, ColumnElement],
+               search_columns: Sequence[ColumnElement], args: Dict[str, Any],
+               default_sort: str) -> TablePage:
+    """Страница строк select по параметрам bootstrap-table.
+
+    columns - выражения сортировки по полям таблицы, key - уникальный ключ
+    строки (последний в сортировке). Пустые значения сортируются в конце.
+    """
+    search = str(args.get('search') or '').strip()
+    sort = columns.get(args.get('sort') or '', columns[default_sort])
+    desc = args.get('order') == 'desc'
+    offset = max(_int(args.get('offset'), 0), 0)
+    limit = min(max(_int(args.get('limit'), DEFAULT_LIMIT), 1), MAX_LIMIT)
+
+    condition = None
+    if search:
+        condition = or_(*(column.contains(search, autoescape=True)
+                          for column in search_columns))
+
+    # Всего и после фильтра - одним запросом
+    filtered = (func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+                if condition is not None else func.count())
+    counts = select.with_only_columns(func.count(), filtered,
+                                      maintain_column_froms=True)
+    total_not_filtered, total = db.session.execute(counts).one()
+
+    if condition is not None:
+        select = select.where(condition)
+
+    # Следующая страница - по ключу последней строки предыдущей
+    last = None
+    if args.get('after') not in (None, '') and offset:
+        last = db.session.execute(
+            select.with_only_columns(sort, key, maintain_column_froms=True)
+            .where(key == args['after'])).first()
+    if last:
+        select = select.where(_after(sort, key, last[0], last[1], desc))
+    else:
+        select = select.offset(offset)
+
+    select = (select.order_by(sort.is_(None), sort.desc() if desc else sort,
+                              key)
+              .limit(limit))
+    rows = list(db.session.execute(select))
+    return TablePage(rows, total or 0, total_not_filtered or 0, offset,
+                     rows[-1]._mapping[key] if rows else None)
+
+
+def _after(sort: ColumnElement, key: ColumnElement, value: Any, key_value: Any,
+           desc: bool) -> ColumnElement:
+    """Строки после (value, key_value) в порядке сортировки"""
+    if value is None:
+        return and_(sort.is_(None), key > key_value)
+    return or_(sort.is_(None), sort < value if desc else sort > value,
+               and_(sort == value, key > key_value))
+
+
+def _int(value: Any, default: int) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def table_result(page: TablePage, rows: List[dict]) -> dict:
+    """Ответ в формате bootstrap-table"""
+    result = {'total': page.total,
+              'totalNotFiltered': page.total_not_filtered,
+              'rows': rows}
+    if page.after is not None:
+        result['next'] = {'offset': page.offset + len(rows),
+                          'after': page.after}
+    return result
+
+
+def users_page(args: Dict[str, Any]) -> TablePage:
+    """Пользователи (кроме демо) с количеством портфелей"""
+    portfolios = (db.select(Portfolio.user_id,
+                            func.count().label('portfolios'))
+                  .group_by(Portfolio.user_id).subquery())
+    portfolios_count = func.coalesce(portfolios.c.portfolios, 0)
+
+    select = (db.select(User.id, User.email, User.type,
+                        portfolios_count.label('portfolios'),
+                        UserInfo.first_visit, UserInfo.last_visit,
+                        UserInfo.country, UserInfo.city)
+              .outerjoin(UserInfo, UserInfo.user_id == User.id)
+              .outerjoin(portfolios, portfolios.c.user_id == User.id)
+              .where(or_(User.type.is_(None), User.type != 'demo')))
+
+    columns = {'email': User.email, 'type': User.type,
+               'portfolios': portfolios_count,
+               'first_visit': UserInfo.first_visit,
+               'last_visit': UserInfo.last_visit,
+               'country': UserInfo.country, 'city': UserInfo.city}
+    return table_page(select, User.id, columns,
+                      (User.email, UserInfo.country, UserInfo.city), args,
+                      'email')
+
+
+def tickers_page(market: Market, args: Dict[str, Any]) -> TablePage:
+    """Тикеры рынка"""
+    select = (db.select(Ticker.id, Ticker.symbol, Ticker.name, Ticker.price,
+                        Ticker.market_cap_rank)
+              .where(Ticker.market == market))
+    columns = {'id': Ticker.id, 'symbol': Ticker.symbol, 'name': Ticker.name,
+               'price': Ticker.price,
+               'market_cap_rank': Ticker.market_cap_rank}
+    return table_page(select, Ticker.id, columns,
+                      (Ticker.id, Ticker.symbol, Ticker.name), args,
+                      'market_cap_rank')
+
@@ -1,5 +1,5 @@
 import json
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 
 from flask import request
 from flask_babel import gettext
@@ -7,19 +7,31 @@ from flask_login import current_user, login_required
 
 from portfolio_tracker.portfolio.repository import TickerRepository
 
-from ..services import user_object_search_engine as ose
+from ..services import ticker_search, user_object_search_engine as ose
+from ..services.price_cache import get_prices
 from ..app import db
 from ..jinja_filters import currency_price, currency_quantity, smart_round
 from ..general_functions import remove_prefix
-from ..portfolio.models import Ticker
 from . import bp
 
 
+# Время последнего визита сохраняется не чаще раза в минуту
+LAST_VISIT_INTERVAL = timedelta(minutes=1)
+
+
 @bp.before_request
 def before_request():
     if current_user.is_authenticated and current_user.info:
-        current_user.info.last_visit = datetime.now(timezone.utc)
-        db.session.commit()
+        info = current_user.info
+        now = datetime.now(timezone.utc)
+        last_visit = info.last_visit
+        if last_visit and last_visit.tzinfo is None:
+            last_visit = last_visit.replace(tzinfo=timezone.utc)
+
+        # Обработчик выполняется вне unit of work - отдельный commit
+        if not last_visit or now - last_visit >= LAST_VISIT_INTERVAL:
+            info.last_visit = now
+            db.session.commit()
 
 
 @bp.route('/worked_alerts_count', methods=['GET'])
@@ -144,49 +156,39 @@ def wallets_to_transfer_out():
 @bp.route('/wallet_assets', methods=['GET'])
 @login_required
 def wallet_assets():
-    result = []
-    in_wallet = []
-    # wallet = WalletRepository.get(request.args.get('wallet_id'))
+    """Тикеры для выбора котируемого актива: свободные активы кошелька
+    первыми, дальше постранично все тикеры (с поиском)."""
     wallet = ose.get_wallet(**request.args)
     if not wallet:
         return json.dumps({'message': gettext('Выберите кошелек')})
 
-    wallet.service.update_price()
-    assets = wallet.assets
-    assets = sorted(assets, key=lambda asset: asset.free, reverse=True)
-    for asset in assets:
-        if asset.free:
-            result.append({'value': asset.ticker.id,
-                           'text': asset.ticker.symbol.upper(),
-                           'subtext': f'({asset.free})',
-                           'free': asset.free,
-                           'info': asset.ticker.price})
-            in_wallet.append(asset.ticker.id)
-
-    tickers = db.select(Ticker)
-    tickers = tickers.where(Ticker.id.not_in(in_wallet))
-    tickers = tickers.order_by(Ticker.market_cap_rank.is_(None),
-                               Ticker.market_cap_rank.asc())
-    # search = request.args.get('search')
-    # page = request.args.get('page', 1, type=int)
-    #
-    # if search:
-    #     tickers = tickers.filter(Ticker.name.contains(search) |
-    #                              Ticker.symbol.contains(search))
-
-    # tickers = db.paginate(tickers, page=page, per_page=20, error_out=False)
-    tickers = db.session.execute(tickers).scalars()
-    for t in tickers:
-        # result.append({'value': t.id,
-        #                'text': t.symbol.upper(),
-        #                'subtext': t.name})
-        result.append({'value': t.id,
-                       'text': t.symbol.upper(),
-                       'subtext': t.name,
-                       'info': t.price})
-
-    # if not result:
-    #     return json.dumps({'message': gettext('Нет активов в кошельке')})
+    search = request.args.get('search', '')
+    page = request.args.get('page', 1, type=int)
+    result = []
 
-    return json.dumps(result)
+    # Свободные активы кошелька - на первой странице
+    assets = sorted((asset for asset in wallet.assets if asset.free),
+                    key=lambda asset: asset.free, reverse=True)
+    in_wallet = {asset.ticker_id for asset in assets}
+    tickers, more = ticker_search.get_page(search, page)
+    prices = get_prices([t[0] for t in tickers]
+                        + ([a.ticker_id for a in assets] if page == 1 else []))
+
+    if page == 1:
+        for asset in assets:
+            ticker = asset.ticker
+            if ticker_search.matches(search, ticker.symbol, ticker.name):
+                result.append({'value': ticker.id,
+                               'text': ticker.symbol.upper(),
+                               'subtext': f'({asset.free})',
+                               'free': asset.free,
+                               'info': prices[ticker.id]})
+
+    for ticker_id, symbol, name in tickers:
+        if ticker_id not in in_wallet:
+            result.append({'value': ticker_id,
+                           'text': symbol.upper(),
+                           'subtext': name,
+                           'info': prices[ticker_id]})
 
+    return json.dumps({'results': result, 'more': more})
@@ -45,6 +45,9 @@ def create_app(config_class=Config):
 
     register_blueprints(app)
 
+    from .repository import init_unit_of_work
+    init_unit_of_work(app)
+
     configure_logging(app)
     init_request_errors(app)
 
@@ -90,19 +90,44 @@ def _json_to_dict(data_str: bytes) -> Dict[str, Any]:
 
 
 def actions_on_objects(data_str: bytes,
-                       get_by_id: Callable[[List[int]], List[Any]]) -> None:
+                       get_by_id: Callable[[Any], Any],
+                       get_many: Callable[[List[Any]], Iterable[Any]] | None = None
+                       ) -> None:
+    """Действие из запроса над объектами по списку ID.
+
+    get_many - получение всех объектов одним запросом (иначе get_by_id для
+    каждого ID). Если у сервиса объектов есть пакетный метод {action}_many,
+    ему передаются все объекты сразу. Изменения сохраняются одним commit,
+    при ошибке - откатываются.
+    """
+    from .repository import commit
+
     data = _json_to_dict(data_str)
     ids = data.get('ids', [])
     action = data.get('action', '')
 
-    if ids and action and get_by_id:
-        for item_id in ids:
-            item = get_by_id(item_id)
-            method = getattr(item.service, action, None)
-            if callable(method):
-                method()
+    if not (ids and action and get_by_id):
+        return
+
+    items = get_many(ids) if get_many else (get_by_id(i) for i in ids)
+    items = [item for item in items if item is not None]
+    if not items:
+        return
 
-        db.session.commit()
+    try:
+        batch = getattr(type(items[0].service), f'{action}_many', None)
+        if callable(batch):
+            batch(items)
+        else:
+            for item in items:
+                method = getattr(item.service, action, None)
+                if callable(method):
+                    method()
+
+        commit()
+    except Exception:
+        db.session.rollback()
+        raise
 
 
 def get_prefix(market: Market) -> str:
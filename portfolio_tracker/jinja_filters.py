@@ -8,6 +8,7 @@ from flask_login import current_user
 
 from .general_functions import add_prefix
 from .portfolio.repository import TickerRepository
+from .services.sprites import sprite_style
 from .user.services.ui import get_currency, get_locale
 
 
@@ -168,6 +169,11 @@ def profit(obj):
     return f'{profit}{percent_str}' if profit else '-'
 
 
+def ticker_sprite(ticker) -> str:
+    """ Стиль иконки тикера из спрайта рынка (пусто - иконки в спрайте нет) """
+    return sprite_style(ticker.market, ticker.image)
+
+
 def color(obj):
     round_profit = round(obj.profit)
     if round_profit > 0:
@@ -185,5 +191,6 @@ bp.add_app_template_filter(percent)
 bp.add_app_template_filter(share_of)
 bp.add_app_template_filter(profit)
 bp.add_app_template_filter(color)
+bp.add_app_template_filter(ticker_sprite)
 bp.add_app_template_filter(get_locale)
 bp.add_app_template_filter(get_currency)
@@ -1,3 +1,6 @@
+from flask import has_request_context
+
+
 class DetailsMixin:
     def __init__(self):
         self.cost_now = 0
@@ -18,7 +21,12 @@ class AssetMixin:
 
     @property
     def price(self) -> float:
-        return self.ticker.price
+        from portfolio_tracker.services.price_cache import get_price
+
+        # Тикер уже загружен или вне запроса - цена из тикера
+        if 'ticker' in self.__dict__ or not has_request_context():
+            return self.ticker.price
+        return get_price(self.ticker_id) or 0
 
     @property
     def cost_now(self) -> float:
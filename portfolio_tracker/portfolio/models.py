@@ -3,6 +3,8 @@ from datetime import datetime, date, timezone
 from typing import List
 
 from sqlalchemy import ForeignKey
+from sqlalchemy import func
+from sqlalchemy import Index
 from sqlalchemy import String
 from sqlalchemy.orm import Mapped, backref
 from sqlalchemy.orm import mapped_column
@@ -156,6 +158,11 @@ class OtherBody(Base):
 
 class Ticker(Base):
     __tablename__ = "ticker"
+    __table_args__ = (
+        # Поиск по началу символа и названия
+        Index('ix_ticker_symbol', 'symbol'),
+        Index('ix_ticker_name', 'name', mysql_length=191),
+    )
 
     id: Mapped[str] = mapped_column(String(256), primary_key=True)
     name: Mapped[str] = mapped_column(String(1024))
@@ -203,11 +210,18 @@ class Portfolio(Base, DetailsMixin):
 
 class PriceHistory(Base):
     __tablename__ = "price_history"
+    __table_args__ = (
+        Index('ix_price_history_ticker_date', 'ticker_id', 'date', unique=True),
+        Index('ix_price_history_ticker_updated', 'ticker_id', 'updated_at'),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    date: Mapped[date] = mapped_column(primary_key=True)
-    ticker_id: Mapped[str] = mapped_column(String(32), ForeignKey("ticker.id"), primary_key=True)
+    date: Mapped[date] = mapped_column()
+    ticker_id: Mapped[str] = mapped_column(String(32), ForeignKey("ticker.id"))
     price_usd: Mapped[float] = mapped_column()
+    # Время записи или изменения цены (время базы)
+    updated_at: Mapped[datetime] = mapped_column(server_default=func.now(),
+                                                 onupdate=func.now())
 
     # Relationships
     ticker: Mapped['Ticker'] = relationship(back_populates="history", lazy=True)
@@ -1,4 +1,14 @@
 from __future__ import annotations
+from array import array
+from datetime import date, datetime, timedelta
+from typing import TYPE_CHECKING, Dict, Iterable, List, Literal, NamedTuple, \
+    Set, Tuple
+
+from sqlalchemy import Date, Row, and_, case, func, literal, or_, true, \
+    union_all
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 
 from portfolio_tracker.repository import DefaultRepository
 
@@ -6,27 +16,125 @@ from ..app import db
 from .models import Asset, OtherAsset, OtherTransaction, Portfolio, \
     PriceHistory, Ticker, Transaction, OtherBody
 
+if TYPE_CHECKING:
+    from portfolio_tracker.general_functions import Market
+    from portfolio_tracker.user.models import User
+
 
 class TickerRepository(DefaultRepository):
     model = Ticker
 
     @staticmethod
-    def get_with_market_paginate(market, search: str = '', page: int = 1):
-        """Выдает частями тикеры определенного рынка"""
-        select = db.select(Ticker).where(Ticker.market == market)
-        select = select.order_by(Ticker.market_cap_rank.is_(None),
-                                 Ticker.market_cap_rank.asc())
+    def search_page(search: str = '', page: int = 1, per_page: int = 20
+                    ) -> Tuple[List[Row], bool]:
+        """Страница тикеров всех рынков для выбора в списке.
 
+        Поиск по началу символа или названия (использует индексы
+        ix_ticker_symbol и ix_ticker_name), точное совпадение символа -
+        первым, дальше по капитализации. Возвращает строки (id, symbol,
+        name) и признак следующей страницы.
+        """
+        select = db.select(Ticker.id, Ticker.symbol, Ticker.name)
+        order = [Ticker.market_cap_rank.is_(None),
+                 Ticker.market_cap_rank.asc(), Ticker.id]
+
+        search = search.strip().lower()
         if search:
-            select = select.filter(Ticker.name.contains(search) |
-                                   Ticker.symbol.contains(search))
+            pattern = search.replace('\\', '\\\\').replace('%', '\\%') \
+                .replace('_', '\\_') + '%'
+            select = select.where(or_(Ticker.symbol.like(pattern, escape='\\'),
+                                      Ticker.name.like(pattern, escape='\\')))
+            order.insert(0, func.lower(Ticker.symbol) != search)
 
-        return db.paginate(select, page=page, per_page=20, error_out=False)
+        select = (select.order_by(*order)
+                  .limit(per_page + 1).offset((max(page, 1) - 1) * per_page))
+        rows = db.session.execute(select).all()
+        return rows[:per_page], len(rows) > per_page
+
+    @staticmethod
+    def update_prices(prices: Dict[str, float]) -> None:
+        """Массовое обновление цен по ID тикеров (один executemany)."""
+        if not prices:
+            return
+
+        db.session.execute(db.update(Ticker),
+                           [{'id': ticker_id, 'price': price}
+                            for ticker_id, price in prices.items()])
+        db.session.commit()
 
 
 class PortfolioRepository(DefaultRepository):
     model = Portfolio
 
+    @staticmethod
+    def get_all_with_assets(user: User) -> List[Portfolio]:
+        """Портфели пользователя с активами и тикерами.
+
+        Загружает все за фиксированное число запросов (портфели, активы
+        вместе с тикерами, прочие активы) независимо от размера портфелей
+        и заполняет ими user.portfolios, чтобы шаблоны не делали ленивых
+        запросов.
+        """
+        select = (db.select(Portfolio)
+                  .filter_by(user_id=user.id)
+                  .order_by(Portfolio.id)
+                  .options(selectinload(Portfolio.assets)
+                           .joinedload(Asset.ticker),
+                           selectinload(Portfolio.other_assets)))
+        portfolios = list(db.session.execute(select).scalars())
+
+        set_committed_value(user, 'portfolios', portfolios)
+        return portfolios
+
+    @staticmethod
+    def get_totals(user_id: int | None = None, portfolio_id: int | None = None,
+                   user_ids: Iterable[int] | None = None) -> Dict[int, Row]:
+        """Итоги по портфелям, посчитанные в базе одним запросом.
+
+        Возвращает словарь portfolio_id -> строка с полями user_id, cost_now,
+        amount, invested (сумма положительных вложений) и buy_orders.
+        """
+        def invested(amount):
+            return func.sum(case((amount > 0, amount), else_=0))
+
+        market_assets = (
+            db.select(Asset.portfolio_id.label('portfolio_id'),
+                      Portfolio.user_id.label('user_id'),
+                      func.sum(Asset.quantity * func.coalesce(Ticker.price, 0))
+                      .label('cost_now'),
+                      func.sum(Asset.amount).label('amount'),
+                      invested(Asset.amount).label('invested'),
+                      func.sum(Asset.buy_orders).label('buy_orders'))
+            .join(Portfolio, Portfolio.id == Asset.portfolio_id)
+            .outerjoin(Ticker, Ticker.id == Asset.ticker_id)
+            .where(Portfolio.market != 'other')
+            .group_by(Asset.portfolio_id, Portfolio.user_id))
+
+        other_assets = (
+            db.select(OtherAsset.portfolio_id.label('portfolio_id'),
+                      Portfolio.user_id.label('user_id'),
+                      func.sum(OtherAsset.cost_now).label('cost_now'),
+                      func.sum(OtherAsset.amount).label('amount'),
+                      invested(OtherAsset.amount).label('invested'),
+                      literal(0).label('buy_orders'))
+            .join(Portfolio, Portfolio.id == OtherAsset.portfolio_id)
+            .where(Portfolio.market == 'other')
+            .group_by(OtherAsset.portfolio_id, Portfolio.user_id))
+
+        if user_id:
+            market_assets = market_assets.where(Portfolio.user_id == user_id)
+            other_assets = other_assets.where(Portfolio.user_id == user_id)
+        if user_ids is not None:
+            user_ids = list(user_ids)
+            market_assets = market_assets.where(Portfolio.user_id.in_(user_ids))
+            other_assets = other_assets.where(Portfolio.user_id.in_(user_ids))
+        if portfolio_id:
+            market_assets = market_assets.where(Portfolio.id == portfolio_id)
+            other_assets = other_assets.where(Portfolio.id == portfolio_id)
+
+        select = union_all(market_assets, other_assets)
+        return {row.portfolio_id: row for row in db.session.execute(select)}
+
 
 class AssetRepository(DefaultRepository):
     model = Asset
@@ -39,6 +147,160 @@ class OtherAssetRepository(DefaultRepository):
 class TransactionRepository(DefaultRepository):
     model = Transaction
 
+    @staticmethod
+    def _position_legs(owner: Literal['portfolio', 'wallet'],
+                       owner_ids: Iterable[int],
+                       ticker_ids: Iterable[str] | None = None,
+                       since: datetime | None = None,
+                       before: datetime | None = None):
+        """Изменения позиций по транзакциям: базовый и котируемый актив
+        сделки (колонки owner_id, ticker_id, date, quantity, amount,
+        buy_orders, sell_orders)."""
+        t = Transaction
+        owner_id = t.portfolio_id if owner == 'portfolio' else t.wallet_id
+        owner_ids = list(owner_ids)
+
+        trade = t.type.in_(('Buy', 'Sell'))
+        is_order = t.order.is_(True)
+        buy_order = and_(t.type == 'Buy', is_order)
+        # Сделка учитывается, если есть портфель, кошелек и котируемый актив
+        valid_trade = and_(trade, t.portfolio_id.isnot(None),
+                           t.wallet_id.isnot(None), t.ticker2_id.isnot(None))
+        valid_earning = and_(t.type == 'Earning', t.portfolio_id.isnot(None),
+                             t.wallet_id.isnot(None))
+        valid_other = and_(t.type.notin_(('Buy', 'Sell', 'Earning')),
+                           owner_id.isnot(None))
+
+        # Базовый актив
+        base = (
+            db.select(
+                owner_id.label('owner_id'),
+                t.ticker_id.label('ticker_id'),
+                t.date.label('date'),
+                case((and_(trade, is_order), 0),
+                     else_=t.quantity).label('quantity'),
+                case((and_(trade, is_order), 0),
+                     (trade, t.quantity * t.price_usd),
+                     (t.type == 'Earning', 0),
+                     else_=t.quantity).label('amount'),
+                case((buy_order, t.quantity * t.price_usd),
+                     else_=0).label('buy_orders'),
+                case((and_(t.type == 'Sell', is_order), -t.quantity),
+                     else_=0).label('sell_orders'))
+            .where(owner_id.in_(owner_ids),
+                   or_(valid_trade, valid_earning, valid_other)))
+
+        # Котируемый актив сделки
+        quote = (
+            db.select(
+                owner_id.label('owner_id'),
+                t.ticker2_id.label('ticker_id'),
+                t.date.label('date'),
+                case((is_order, 0), else_=t.quantity2).label('quantity'),
+                case((is_order, 0),
+                     else_=t.quantity2 * func.coalesce(Ticker.price, 0)
+                     ).label('amount'),
+                literal(0).label('buy_orders'),
+                case((buy_order, -t.quantity2),
+                     else_=0).label('sell_orders'))
+            .outerjoin(Ticker, Ticker.id == t.ticker2_id)
+            .where(owner_id.in_(owner_ids), valid_trade))
+
+        if ticker_ids is not None:
+            ticker_ids = list(ticker_ids)
+            base = base.where(t.ticker_id.in_(ticker_ids))
+            quote = quote.where(t.ticker2_id.in_(ticker_ids))
+        if since is not None:
+            base = base.where(t.date >= since)
+            quote = quote.where(t.date >= since)
+        if before is not None:
+            base = base.where(t.date < before)
+            quote = quote.where(t.date < before)
+
+        return union_all(base, quote).subquery()
+
+    @staticmethod
+    def get_positions(owner: Literal['portfolio', 'wallet'],
+                      owner_ids: Iterable[int],
+                      ticker_ids: Iterable[str] | None = None,
+                      before: datetime | None = None
+                      ) -> Dict[Tuple[int, str], Row]:
+        """Позиции активов по транзакциям, посчитанные в базе одним запросом.
+
+        Повторяет TransactionService.update_dependencies: базовый актив
+        сделки и котируемый актив (ticker2_id), ордера - в buy_orders и
+        sell_orders. Стоимость котируемого актива - по текущей цене тикера.
+        С before - позиции по транзакциям до этой даты.
+        Возвращает словарь (ID портфеля/кошелька, ID тикера) -> строка с
+        полями quantity, amount, buy_orders, sell_orders.
+        """
+        legs = TransactionRepository._position_legs(owner, owner_ids,
+                                                    ticker_ids, before=before)
+        select = (db.select(legs.c.owner_id, legs.c.ticker_id,
+                            func.sum(legs.c.quantity).label('quantity'),
+                            func.sum(legs.c.amount).label('amount'),
+                            func.sum(legs.c.buy_orders).label('buy_orders'),
+                            func.sum(legs.c.sell_orders).label('sell_orders'))
+                  .group_by(legs.c.owner_id, legs.c.ticker_id))
+        return {(row.owner_id, row.ticker_id): row
+                for row in db.session.execute(select)}
+
+    @staticmethod
+    def get_position_changes(portfolio_id: int, since: datetime | None = None
+                             ) -> List[Row]:
+        """Изменения позиций портфеля по транзакциям начиная с даты в порядке
+        дат (поля date, ticker_id, quantity, amount)."""
+        legs = TransactionRepository._position_legs('portfolio', [portfolio_id],
+                                                    since=since)
+        select = (db.select(legs.c.date, legs.c.ticker_id, legs.c.quantity,
+                            legs.c.amount)
+                  .where(or_(legs.c.quantity != 0, legs.c.amount != 0))
+                  .order_by(legs.c.date))
+        return list(db.session.execute(select))
+
+    @staticmethod
+    def get_changed_since(portfolio_id: int, transaction_id: int
+                          ) -> Tuple[int, datetime | None]:
+        """Последний ID транзакций портфеля и самая ранняя дата транзакций
+        с ID больше transaction_id."""
+        t = Transaction
+        last_id = func.max(t.id)
+        first_date = func.min(case((t.id > transaction_id, t.date)))
+        row = db.session.execute(db.select(last_id, first_date)
+                                 .where(t.portfolio_id == portfolio_id)).one()
+        return row[0] or 0, row[1]
+
+    @staticmethod
+    def get_touched_assets(portfolio_ids: Iterable[int],
+                           wallet_ids: Iterable[int],
+                           since_id: int | None = None,
+                           since_date: datetime | None = None
+                           ) -> Tuple[Set[Tuple[int, str]], Set[Tuple[int, str]]]:
+        """Активы портфелей и кошельков, затронутые транзакциями начиная с
+        since_id или since_date: (портфель, тикер) и (кошелек, тикер)."""
+        t = Transaction
+        portfolio_ids, wallet_ids = set(portfolio_ids), set(wallet_ids)
+        select = (db.select(t.portfolio_id, t.wallet_id, t.ticker_id,
+                            t.ticker2_id)
+                  .where(or_(t.portfolio_id.in_(portfolio_ids),
+                             t.wallet_id.in_(wallet_ids)))
+                  .distinct())
+        if since_id is not None:
+            select = select.where(t.id >= since_id)
+        if since_date is not None:
+            select = select.where(t.date >= since_date)
+
+        portfolio_assets, wallet_assets = set(), set()
+        for row in db.session.execute(select):
+            for ticker_id in (row.ticker_id, row.ticker2_id):
+                if not ticker_id:
+                    continue
+                if row.portfolio_id in portfolio_ids:
+                    portfolio_assets.add((row.portfolio_id, ticker_id))
+                if row.wallet_id in wallet_ids:
+                    wallet_assets.add((row.wallet_id, ticker_id))
+        return portfolio_assets, wallet_assets
+
 
 class OtherTransactionRepository(DefaultRepository):
     model = OtherTransaction
@@ -48,5 +310,145 @@ class BodyRepository(DefaultRepository):
     model = OtherBody
 
 
+class PriceSeries(NamedTuple):
+    """История цен тикера: даты (date.toordinal()) и цены в USD"""
+    dates: array
+    prices: array
+
+
 class PriceHistoryRepository(DefaultRepository):
     model = PriceHistory
+
+    @staticmethod
+    def upsert(prices: Iterable[Tuple[str, date, float]],
+               chunk_size: int = 5000, only_missing: bool = False) -> None:
+        """Массовая запись цен (ID тикера, дата, цена) с обновлением
+        существующих по (ticker_id, date). only_missing - существующие
+        цены не меняются (дозапись пропусков истории)."""
+        # id новых строк - автоинкремент базы
+        rows = [{'ticker_id': ticker_id, 'date': day, 'price_usd': price}
+                for ticker_id, day, price in prices]
+        if not rows:
+            return
+
+        # Время изменения обновляется, только если цена другая
+        def updated_at(price_usd):
+            return case((PriceHistory.price_usd.is_distinct_from(price_usd),
+                         func.now()), else_=PriceHistory.updated_at)
+
+        dialect = db.session.get_bind().dialect.name
+        table = PriceHistory.__table__
+        if dialect == 'mysql':
+            insert = mysql.insert(table)
+            if only_missing:
+                # Присваивание того же значения - строка не меняется
+                insert = insert.on_duplicate_key_update(
+                    price_usd=PriceHistory.price_usd)
+            else:
+                # Значения присваиваются по порядку: updated_at - до price_usd
+                insert = insert.on_duplicate_key_update([
+                    ('updated_at', updated_at(insert.inserted.price_usd)),
+                    ('price_usd', insert.inserted.price_usd)])
+        else:
+            insert = (postgresql if dialect == 'postgresql' else sqlite).insert(table)
+            if only_missing:
+                insert = insert.on_conflict_do_nothing(
+                    index_elements=['ticker_id', 'date'])
+            else:
+                insert = insert.on_conflict_do_update(
+                    index_elements=['ticker_id', 'date'],
+                    set_={'price_usd': insert.excluded.price_usd,
+                          'updated_at': updated_at(insert.excluded.price_usd)})
+
+        for n in range(0, len(rows), chunk_size):
+            db.session.execute(insert, rows[n:n + chunk_size])
+        db.session.commit()
+
+    @staticmethod
+    def get_last_prices(ticker_ids: Iterable[str], before: date
+                        ) -> Dict[str, float]:
+        """Последние цены тикеров до даты (для продолжения истории)"""
+        ticker_ids = list(ticker_ids)
+        last = (db.select(PriceHistory.ticker_id,
+                          func.max(PriceHistory.date).label('date'))
+                .where(PriceHistory.ticker_id.in_(ticker_ids),
+                       PriceHistory.date < before)
+                .group_by(PriceHistory.ticker_id).subquery())
+        select = (db.select(PriceHistory.ticker_id, PriceHistory.price_usd)
+                  .join(last, and_(PriceHistory.ticker_id == last.c.ticker_id,
+                                   PriceHistory.date == last.c.date)))
+        return {ticker_id: price or 0
+                for ticker_id, price in db.session.execute(select)}
+
+    @staticmethod
+    def get_changed_since(ticker_ids: Iterable[str], since: datetime | None
+                          ) -> Tuple[datetime, date | None]:
+        """Время базы и самая ранняя дата цен тикеров, записанных или
+        измененных после since."""
+        select = (db.select(func.now(), func.min(PriceHistory.date))
+                  .where(PriceHistory.ticker_id.in_(list(ticker_ids))))
+        if since is not None:
+            select = select.where(PriceHistory.updated_at > since)
+        now, first_date = db.session.execute(select).one()
+        return now, first_date
+
+    @staticmethod
+    def _missing(market: Market, start: date, end: date):
+        """Пары (тикер, дата) периода (включительно) без цены - подзапрос"""
+        days = [start + timedelta(days=n) for n in range((end - start).days + 1)]
+        period = union_all(*(db.select(literal(day, Date).label('date'))
+                             for day in days)).subquery()
+        saved = (db.select(PriceHistory.id)
+                 .where(PriceHistory.ticker_id == Ticker.id,
+                        PriceHistory.date == period.c.date).exists())
+        return (db.select(Ticker.id.label('ticker_id'), period.c.date)
+                .join(period, true())
+                .where(Ticker.market == market, ~saved)
+                .subquery())
+
+    @staticmethod
+    def get_first_missing_dates(market: Market, start: date, end: date
+                                ) -> Dict[str, date]:
+        """Первая дата периода без цены по тикерам рынка (пары тикер-дата
+        агрегируются в базе, в память - строка на тикер)."""
+        if start > end:
+            return {}
+
+        missing = PriceHistoryRepository._missing(market, start, end)
+        select = (db.select(missing.c.ticker_id, func.min(missing.c.date))
+                  .group_by(missing.c.ticker_id))
+        return {ticker_id: day for ticker_id, day in db.session.execute(select)}
+
+    @staticmethod
+    def get_missing_days(market: Market, start: date, end: date) -> List[date]:
+        """Даты периода, за которые цена есть не у всех тикеров рынка"""
+        if start > end:
+            return []
+
+        missing = PriceHistoryRepository._missing(market, start, end)
+        select = (db.select(missing.c.date).distinct()
+                  .order_by(missing.c.date))
+        return list(db.session.execute(select).scalars())
+
+    @staticmethod
+    def get_series(ticker_ids: Iterable[str], start: date | None = None,
+                   end: date | None = None) -> Dict[str, PriceSeries]:
+        """Истории цен тикеров за период (включительно) без создания
+        объектов ORM."""
+        select = (db.select(PriceHistory.ticker_id, PriceHistory.date,
+                            PriceHistory.price_usd)
+                  .where(PriceHistory.ticker_id.in_(list(ticker_ids)))
+                  .order_by(PriceHistory.ticker_id, PriceHistory.date))
+        if start:
+            select = select.where(PriceHistory.date >= start)
+        if end:
+            select = select.where(PriceHistory.date <= end)
+
+        series: Dict[str, PriceSeries] = {}
+        for ticker_id, day, price in db.session.execute(select):
+            s = series.get(ticker_id)
+            if s is None:
+                s = series[ticker_id] = PriceSeries(array('l'), array('d'))
+            s.dates.append(day.toordinal())
+            s.prices.append(price or 0)
+        return series
@@ -1,15 +1,24 @@
 from flask import abort, render_template, session, url_for, request
 from flask_login import current_user as user, login_required
 
-from ..services import user_object_search_engine as ose
+from ..services import ticker_search, user_object_search_engine as ose
+from ..services.summary import reset_summary
 from ..general_functions import actions_on_objects
 from ..wraps import closed_for_demo_user
 from .models import OtherAsset
-from .repository import TickerRepository
 from .services.portfolios import Portfolios
+from .services.value_series import get_value_series
 from . import bp
 
 
+@bp.after_request
+def reset_user_summary(response):
+    """Сбрасывает снимок итогов пользователя после изменений."""
+    if request.method == 'POST' and user.is_authenticated:
+        reset_summary(user.id)
+    return response
+
+
 @bp.route('/', methods=['GET', 'POST'])
 @login_required
 @closed_for_demo_user(['POST'])
@@ -58,6 +67,21 @@ def portfolio_info(portfolio_id):
                            portfolios=Portfolios(user))  # type: ignore
 
 
+@bp.route('/<int:portfolio_id>/value_series', methods=['GET'])
+@login_required
+def portfolio_value_series(portfolio_id):
+    """Portfolio value, invested and profit by days."""
+    portfolio = ose.get_portfolio(portfolio_id) or abort(404)
+    if portfolio.market == 'other':
+        abort(404)
+
+    series = get_value_series(portfolio.id)
+    return {'dates': [str(day) for day in series.dates()],
+            'value': series.value.tolist(),
+            'invested': series.invested.tolist(),
+            'profit': series.profit.tolist()}
+
+
 @bp.route('/asset_add', methods=['GET', 'POST'])
 @login_required
 @closed_for_demo_user(['POST'])
@@ -80,9 +104,9 @@ def asset_add():
 @login_required
 def asset_add_tickers(market):
     """Tickers to modal window to add asset."""
-    page = request.args.get('page', 1, type=int)
     search = request.args.get('search', '')
-    tickers = TickerRepository.get_with_market_paginate(market, search, page)
+    after = request.args.get('after')
+    tickers, _ = ticker_search.search_market(market, search, after)
 
     if not tickers:
         return 'end'
@@ -133,10 +157,12 @@ def asset_info():
     # Actions
     if request.method == 'POST':
         if request.args.get('bodies') and isinstance(asset, OtherAsset):
-            actions_on_objects(request.data, asset.service.get_body)
+            actions_on_objects(request.data, asset.service.get_body,
+                               asset.service.get_bodies)
             session['other_asset_page'] = 'bodies'
         else:
-            actions_on_objects(request.data, asset.service.get_transaction)
+            actions_on_objects(request.data, asset.service.get_transaction,
+                               asset.service.get_transactions)
         return ''
 
     asset.portfolio.service.update_info()
@@ -1,11 +1,12 @@
 from datetime import datetime, timezone
+from typing import List
 
 from flask import flash
 from flask_babel import gettext
 
 from portfolio_tracker.general_functions import find_by_attr
 from ..models import Asset, OtherTransaction, Transaction
-from ..repository import AssetRepository
+from ..repository import AssetRepository, TransactionRepository
 
 
 class AssetService:
@@ -27,6 +28,10 @@ class AssetService:
     def get_transaction(self, transaction_id: str | int | None):
         return find_by_attr(self.asset.transactions, 'id', transaction_id)
 
+    def get_transactions(self, ids: list) -> List[Transaction]:
+        return TransactionRepository.get_with_parent(
+            self.asset, Asset.transactions, ids)
+
     def create_transaction(self) -> Transaction:
         """Возвращает новую транзакцию."""
         transaction = Transaction()
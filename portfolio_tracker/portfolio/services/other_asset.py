@@ -1,11 +1,14 @@
 from datetime import datetime, timezone
+from typing import List
 
 from flask import flash
 from flask_babel import gettext
 
 from portfolio_tracker.general_functions import find_by_attr
-from portfolio_tracker.portfolio.models import OtherAsset, OtherBody, Transaction
-from portfolio_tracker.portfolio.repository import OtherAssetRepository
+from portfolio_tracker.portfolio.models import OtherAsset, OtherBody, \
+    OtherTransaction, Transaction
+from portfolio_tracker.portfolio.repository import BodyRepository, \
+    OtherAssetRepository, OtherTransactionRepository
 
 
 class OtherAssetService:
@@ -38,6 +41,10 @@ class OtherAssetService:
     def get_transaction(self, transaction_id: str | int | None):
         return find_by_attr(self.asset.transactions, 'id', transaction_id)
 
+    def get_transactions(self, ids: list) -> List[OtherTransaction]:
+        return OtherTransactionRepository.get_with_parent(
+            self.asset, OtherAsset.transactions, ids)
+
     def create_transaction(self):
         transaction = Transaction()
         transaction.type = 'Profit'
@@ -48,6 +55,9 @@ class OtherAssetService:
     def get_body(self, body_id: str | int | None):
         return find_by_attr(self.asset.bodies, 'id', body_id)
 
+    def get_bodies(self, ids: list) -> List[OtherBody]:
+        return BodyRepository.get_with_parent(self.asset, OtherAsset.bodies, ids)
+
     def create_body(self) -> OtherBody:
         """Возвращает новое тело актива."""
         body = OtherBody()
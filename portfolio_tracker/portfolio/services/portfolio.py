@@ -1,3 +1,6 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
+
 from flask import flash
 from flask_babel import gettext
 
@@ -6,6 +9,9 @@ from portfolio_tracker.general_functions import find_by_attr
 from ..models import Asset, OtherAsset, Portfolio
 from ..repository import AssetRepository, OtherAssetRepository, PortfolioRepository, TickerRepository
 
+if TYPE_CHECKING:
+    from sqlalchemy import Row
+
 
 class PortfolioService:
 
@@ -43,19 +49,19 @@ class PortfolioService:
         self.portfolio.comment = comment or ''
         PortfolioRepository.save(self.portfolio)
 
-    def update_info(self) -> None:
-        self.portfolio.cost_now = 0
-        self.portfolio.amount = 0
-        self.portfolio.buy_orders = 0
-        self.portfolio.invested = 0
+    def update_info(self, totals: Row | None = None) -> None:
+        """Обновляет итоги портфеля.
 
-        prefix = 'other_' if self.portfolio.market == 'other' else ''
-        for asset in getattr(self.portfolio, f'{prefix}assets'):
-            self.portfolio.cost_now += asset.cost_now
-            self.portfolio.amount += asset.amount
-            self.portfolio.invested += asset.amount if asset.amount > 0 else 0
-            if self.portfolio.market != 'other':
-                self.portfolio.buy_orders += asset.buy_orders
+        Итоги считаются в базе (PortfolioRepository.get_totals), поэтому
+        стоимость не зависит от количества активов. Можно передать уже
+        посчитанную строку итогов, чтобы не делать запрос.
+        """
+        if totals is None:
+            totals = PortfolioRepository.get_totals(
+                portfolio_id=self.portfolio.id).get(self.portfolio.id)
+
+        for attr in ('cost_now', 'amount', 'invested', 'buy_orders'):
+            setattr(self.portfolio, attr, getattr(totals, attr, 0) or 0)
 
     def get_asset(self, find_by: str | int | None, create=False):
         asset = None
@@ -1,7 +1,9 @@
 from __future__ import annotations
 from typing import TYPE_CHECKING
 
+from portfolio_tracker.services.summary import PortfolioTotals, get_summary
 from ..models import DetailsMixin
+from ..repository import PortfolioRepository
 
 if TYPE_CHECKING:
     from portfolio_tracker.user.models import User
@@ -12,8 +14,12 @@ class Portfolios(DetailsMixin):
     def __init__(self, user: User):
         super().__init__()
 
-        for portfolio in user.portfolios:
-            portfolio.service.update_info()
+        # Итоги из снимка, пересчитанного после загрузки цен
+        totals = get_summary(user.id).portfolios
+
+        for portfolio in PortfolioRepository.get_all_with_assets(user):
+            portfolio.service.update_info(
+                totals.get(portfolio.id, PortfolioTotals()))
 
             self.amount += portfolio.amount
             self.buy_orders += portfolio.buy_orders
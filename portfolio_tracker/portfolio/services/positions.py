@@ -0,0 +1,76 @@
+from __future__ import annotations
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, Iterable, Set, Tuple, Type
+
+from portfolio_tracker.app import db
+from portfolio_tracker.wallet.models import Wallet, WalletAsset
+from ..models import Asset, Portfolio
+from ..repository import TransactionRepository
+
+if TYPE_CHECKING:
+    from sqlalchemy import Row
+    from portfolio_tracker.user.models import User
+
+
+def recalculate_positions(user: User, since_id: int | None = None,
+                          since_date: datetime | None = None) -> None:
+    """Пересчитать активы пользователя.
+
+    Без since_id/since_date пересчитываются все активы, иначе - только
+    затронутые транзакциями начиная с этого ID/даты (по всем их транзакциям).
+    """
+    portfolio_ids = list(db.session.execute(
+        db.select(Portfolio.id).filter_by(user_id=user.id)).scalars())
+    wallet_ids = list(db.session.execute(
+        db.select(Wallet.id).filter_by(user_id=user.id)).scalars())
+
+    portfolio_touched = wallet_touched = None
+    if since_id is not None or since_date is not None:
+        portfolio_touched, wallet_touched = \
+            TransactionRepository.get_touched_assets(
+                portfolio_ids, wallet_ids, since_id, since_date)
+
+    _update_assets(Asset, 'portfolio_id', portfolio_ids, portfolio_touched,
+                   ('quantity', 'amount', 'buy_orders', 'sell_orders'))
+    _update_assets(WalletAsset, 'wallet_id', wallet_ids, wallet_touched,
+                   ('quantity', 'buy_orders', 'sell_orders'))
+
+
+def _update_assets(model: Type[Asset | WalletAsset], owner_attr: str,
+                   owner_ids: Iterable[int],
+                   touched: Set[Tuple[int, str]] | None,
+                   fields: Tuple[str, ...]) -> None:
+    owner = 'portfolio' if model is Asset else 'wallet'
+    owner_column = getattr(model, owner_attr)
+    ticker_ids = None
+
+    if touched is not None:
+        if not touched:
+            return
+        owner_ids = {owner_id for owner_id, _ in touched}
+        ticker_ids = {ticker_id for _, ticker_id in touched}
+
+    positions: Dict[Tuple[int, str], Row] = \
+        TransactionRepository.get_positions(owner, owner_ids, ticker_ids)
+
+    select = db.select(model).where(owner_column.in_(list(owner_ids)))
+    if ticker_ids is not None:
+        select = select.where(model.ticker_id.in_(list(ticker_ids)))
+    assets = {(getattr(asset, owner_attr), asset.ticker_id): asset
+              for asset in db.session.execute(select).scalars()}
+
+    keys = touched if touched is not None else set(assets) | set(positions)
+    for key in keys:
+        position = positions.get(key)
+        asset = assets.get(key)
+
+        # Актив без транзакций в базе еще не создан
+        if not asset:
+            if not position:
+                continue
+            asset = model(ticker_id=key[1])
+            setattr(asset, owner_attr, key[0])
+            db.session.add(asset)
+
+        for field in fields:
+            setattr(asset, field, getattr(position, field, 0) or 0)
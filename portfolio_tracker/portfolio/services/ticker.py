@@ -3,6 +3,7 @@ import os
 
 from flask import current_app
 
+from portfolio_tracker.app import db
 from portfolio_tracker.general_functions import remove_prefix
 from portfolio_tracker.portfolio.models import PriceHistory, Ticker
 
@@ -36,6 +37,13 @@ class TickerService:
             url = 'https://www.coingecko.com/ru/%D0%9A%D1%80%D0%B8%D0%BF%D1%82%D0%BE%D0%B2%D0%B0%D0%BB%D1%8E%D1%82%D1%8B/'
             return f'{url}{external_id}'
 
+    def image_shared(self) -> bool:
+        select = (db.select(Ticker.id)
+                  .where(Ticker.market == self.ticker.market,
+                         Ticker.image == self.ticker.image,
+                         Ticker.id != self.ticker.id).limit(1))
+        return db.session.execute(select).first() is not None
+
     def delete(self) -> None:
         # Цены
         history = getattr(self.ticker, 'history', None)
@@ -49,9 +57,10 @@ class TickerService:
             for asset in self.ticker.assets:
                 asset.service.delete()
 
-        # Иконки
+        # Иконки (одинаковые иконки хранятся один раз - файл удаляется,
+        # если им не пользуются другие тикеры)
         # Папка хранения изображений
-        if self.ticker.image:
+        if self.ticker.image and not self.image_shared():
             upload_folder = current_app.config['UPLOAD_FOLDER']
             path = f'{upload_folder}/images/tickers/{self.ticker.market}'
             try:
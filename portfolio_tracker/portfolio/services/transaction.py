@@ -1,9 +1,13 @@
-from datetime import datetime, timezone
+from datetime import date, datetime, timezone
+from typing import Dict, Iterable, List
 
 from portfolio_tracker.app import db
 from portfolio_tracker.general_functions import from_user_datetime
 from portfolio_tracker.portfolio.models import Asset, Transaction
-from portfolio_tracker.portfolio.repository import PortfolioRepository, TickerRepository, TransactionRepository
+from portfolio_tracker.portfolio.repository import PortfolioRepository, TransactionRepository
+from portfolio_tracker.services.price_cache import get_price
+from portfolio_tracker.services.summary import reset_summary
+from portfolio_tracker.portfolio.services.value_series import invalidate_value_series
 from portfolio_tracker.wallet.repository import WalletRepository
 from portfolio_tracker.watchlist.services.alert import update_alert
 
@@ -36,11 +40,11 @@ class TransactionService:
             self.transaction.ticker2_id = form.get(type.lower() + '_ticker2_id')
             self.transaction.price = float(form['price'])
 
-            quote_ticker = TickerRepository.get(self.transaction.ticker2_id)
-            if not quote_ticker:
+            quote_price = get_price(self.transaction.ticker2_id)
+            if quote_price is None:
                 return
 
-            self.transaction.price_usd = self.transaction.price * quote_ticker.price
+            self.transaction.price_usd = self.transaction.price * quote_price
             self.transaction.order = bool(form.get('order'))
             if form.get('quantity') is not None:
                 self.transaction.quantity = float(form['quantity']) * d
@@ -66,7 +70,13 @@ class TransactionService:
         TransactionRepository.save(self.transaction)
 
 
-    def update_dependencies(self, param: str = '') -> None:
+    def update_dependencies(self, param: str = '', invalidate: bool = True
+                            ) -> None:
+        """Изменение активов по транзакции (param='cancel' - отмена).
+
+        invalidate=False - без сброса кэшей (пакетные изменения сбрасывают
+        их один раз, invalidate_caches).
+        """
         t = self.transaction
 
         # Направление сделки (direction)
@@ -75,6 +85,9 @@ class TransactionService:
         wallet = WalletRepository.get(t.wallet_id)
         portfolio = PortfolioRepository.get(t.portfolio_id)
 
+        if invalidate:
+            invalidate_caches([t])
+
         # Базовый актив портфеля
         p_asset1 = get_or_create_asset(portfolio, t.ticker_id)
         # Котируемый актив портфеля
@@ -170,10 +183,54 @@ class TransactionService:
             t.alert.service.delete()
         self.update_dependencies()
 
+    @staticmethod
+    def convert_order_to_transaction_many(transactions: List[Transaction]
+                                          ) -> None:
+        """Исполнение ордеров (commit - у вызывающего)"""
+        invalidate_caches(transactions)
+        now = datetime.now(timezone.utc)
+        for t in transactions:
+            t.service.update_dependencies('cancel', invalidate=False)
+            t.order = False
+            t.date = now
+            if t.alert:
+                t.alert.transaction_id = None
+                t.alert.service.delete()
+            t.service.update_dependencies(invalidate=False)
+
     def delete(self) -> None:
         self.update_dependencies('cancel')
         TransactionRepository.delete(self.transaction)
 
+    @staticmethod
+    def delete_many(transactions: List[Transaction]) -> None:
+        """Удаление транзакций (commit - у вызывающего)"""
+        invalidate_caches(transactions)
+        for t in transactions:
+            t.service.update_dependencies('cancel', invalidate=False)
+            db.session.delete(t)
+
+
+def invalidate_caches(transactions: Iterable[Transaction]) -> None:
+    """Сброс динамики портфелей (с самой ранней даты) и снимков итогов
+    пользователей после изменения транзакций"""
+    since: Dict[int, date] = {}
+    owners = set()
+    for t in transactions:
+        portfolio = PortfolioRepository.get(t.portfolio_id)
+        wallet = WalletRepository.get(t.wallet_id)
+        owners.update(obj.user_id for obj in (portfolio, wallet) if obj)
+        if portfolio and t.date:
+            day = t.date.date() if isinstance(t.date, datetime) else t.date
+            since[portfolio.id] = min(since.get(portfolio.id, day), day)
+
+    # Динамика портфеля пересчитается с даты транзакции
+    for portfolio_id, day in since.items():
+        invalidate_value_series(portfolio_id, day)
+
+    # Снимок итогов пересчитается при следующем чтении
+    reset_summary(owners)
+
 
 def get_or_create_asset(parent, ticker_id) -> Asset | None:
     if parent and ticker_id:
@@ -0,0 +1,253 @@
+"""Динамика стоимости портфеля по дням.
+
+Позиции на начало периода считаются в базе (суммы транзакций до даты),
+дальше - накопленные суммы изменений по каждому тикеру, умноженные на
+дневные цены из истории (пропуски заполняются последней известной ценой).
+Ряд кэшируется в Redis и при новых ценах или транзакциях пересчитывается
+только с первой затронутой даты.
+"""
+from __future__ import annotations
+from array import array
+from datetime import date, datetime, time, timedelta
+from itertools import accumulate
+import operator
+import pickle
+from typing import Dict, Iterable, List, Set, Tuple
+
+from flask import current_app
+
+from portfolio_tracker.app import redis
+from portfolio_tracker.repository import after_commit
+from portfolio_tracker.services.price_cache import get_prices
+from ..repository import PriceHistoryRepository, PriceSeries, \
+    TransactionRepository
+
+CACHE_KEY = 'portfolio.{}.value_series'
+DIRTY_KEY = 'portfolio.{}.value_series.dirty'
+CACHE_TTL = 30 * 24 * 60 * 60
+# Цены, записанные транзакцией, которая еще не завершилась при прошлой
+# проверке, учитываются при следующей
+PRICE_LOOKBACK = timedelta(minutes=5)
+
+
+class ValueSeries:
+    """Стоимость (value), вложения (amount) и положительные вложения
+    (invested) портфеля по дням начиная с start"""
+
+    def __init__(self, start: date) -> None:
+        self.start = start
+        self.value = array('d')
+        self.amount = array('d')
+        self.invested = array('d')
+        # Учтенные транзакции и время проверки истории цен (время базы)
+        self.transaction_id = 0
+        self.price_checked: datetime | None = None
+        self.ticker_ids: Set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self.value)
+
+    @property
+    def end(self) -> date:
+        return self.start + timedelta(days=len(self) - 1)
+
+    @property
+    def profit(self) -> array:
+        return array('d', map(operator.sub, self.value, self.amount))
+
+    def dates(self) -> List[date]:
+        return [self.start + timedelta(days=n) for n in range(len(self))]
+
+    def truncate(self, day: date) -> None:
+        """Удаляет дни начиная с day"""
+        n = max((day - self.start).days, 0)
+        for values in (self.value, self.amount, self.invested):
+            del values[n:]
+
+
+def _zeros(days: int) -> array:
+    return array('d', bytes(8 * days))
+
+
+def _daily_prices(start: date, days: int, series: PriceSeries | None,
+                  last_price: float | None) -> array:
+    """Цена на каждый день: последняя известная на эту дату (до первой
+    известной - первая цена истории)"""
+    points = []
+    if series:
+        first = start.toordinal()
+        points = [(d - first, p) for d, p in zip(series.dates, series.prices)
+                  if 0 <= d - first < days]
+    if last_price is None:
+        last_price = points[0][1] if points else 0
+
+    prices = array('d', [last_price]) * days
+    for (n, price), (next_n, _) in zip(points, points[1:] + [(days, 0)]):
+        prices[n:next_n] = array('d', [price]) * (next_n - n)
+    return prices
+
+
+def calculate_series(start: date, end: date,
+                     positions: Dict[str, Tuple[float, float]],
+                     changes: Iterable[Tuple[date, str, float, float]],
+                     prices: Dict[str, PriceSeries],
+                     last_prices: Dict[str, float],
+                     end_prices: Dict[str, float] | None = None
+                     ) -> Tuple[array, array, array]:
+    """Ряды value, amount и invested за дни start..end.
+
+    positions - количество и вложения по тикерам на начало периода,
+    changes - изменения (дата, тикер, количество, вложения),
+    prices - история цен за период, last_prices - цены до периода,
+    end_prices - текущие цены для последнего дня (и для тикеров без
+    истории).
+    """
+    days = (end - start).days + 1
+    quantity_changes: Dict[str, array] = {}
+    amount_changes: Dict[str, array] = {}
+
+    def add(n: int, ticker_id: str, quantity: float, amount: float) -> None:
+        if ticker_id not in quantity_changes:
+            quantity_changes[ticker_id] = _zeros(days)
+            amount_changes[ticker_id] = _zeros(days)
+        quantity_changes[ticker_id][n] += quantity
+        amount_changes[ticker_id][n] += amount
+
+    for ticker_id, (quantity, amount) in positions.items():
+        add(0, ticker_id, quantity, amount)
+    for day, ticker_id, quantity, amount in changes:
+        n = (day - start).days
+        if 0 <= n < days:
+            add(n, ticker_id, quantity, amount)
+
+    value, amount, invested = _zeros(days), _zeros(days), _zeros(days)
+    for ticker_id, ticker_changes in quantity_changes.items():
+        last_price = last_prices.get(ticker_id)
+        if last_price is None and ticker_id not in prices and end_prices:
+            last_price = end_prices.get(ticker_id)
+        ticker_prices = _daily_prices(start, days, prices.get(ticker_id),
+                                      last_price)
+        if end_prices and end_prices.get(ticker_id):
+            ticker_prices[-1] = end_prices[ticker_id]
+
+        quantities = accumulate(ticker_changes)
+        amounts = array('d', accumulate(amount_changes[ticker_id]))
+        value = array('d', map(operator.add, value,
+                               map(operator.mul, quantities, ticker_prices)))
+        amount = array('d', map(operator.add, amount, amounts))
+        invested = array('d', map(operator.add, invested,
+                                  (a if a > 0 else 0 for a in amounts)))
+
+    return value, amount, invested
+
+
+def _extend(portfolio_id: int, series: ValueSeries, since: date, end: date
+            ) -> None:
+    """Пересчет ряда с даты since по end"""
+    series.truncate(since)
+    since = series.start + timedelta(days=len(series))
+    if since > end:
+        return
+
+    before = datetime.combine(since, time())
+    positions = {
+        ticker_id: (row.quantity or 0, row.amount or 0)
+        for (_, ticker_id), row in TransactionRepository.get_positions(
+            'portfolio', [portfolio_id], before=before).items()}
+    changes = [(row.date.date(), row.ticker_id, row.quantity or 0,
+                row.amount or 0)
+               for row in TransactionRepository.get_position_changes(
+                   portfolio_id, since=before)]
+
+    ticker_ids = set(positions) | {ticker_id for _, ticker_id, _, _ in changes}
+    prices = PriceHistoryRepository.get_series(ticker_ids, since, end)
+    last_prices = PriceHistoryRepository.get_last_prices(ticker_ids, since)
+    end_prices = get_prices(ticker_ids)
+
+    value, amount, invested = calculate_series(
+        since, end, positions, changes, prices, last_prices, end_prices)
+    series.value.extend(value)
+    series.amount.extend(amount)
+    series.invested.extend(invested)
+    series.ticker_ids |= ticker_ids
+
+
+def get_value_series(portfolio_id: int) -> ValueSeries:
+    """Ряд портфеля по сегодняшний день (из кэша с досчетом изменений)"""
+    today = datetime.now().date()
+    series = _cache_get(portfolio_id)
+
+    # Новые транзакции и цены, измененные транзакции
+    transaction_id, changed = TransactionRepository.get_changed_since(
+        portfolio_id, series.transaction_id if series else 0)
+    checked = series and series.price_checked
+    price_checked, price_changed = PriceHistoryRepository.get_changed_since(
+        series.ticker_ids if series else (),
+        checked - PRICE_LOOKBACK if checked else None)
+    dirty = _pop_dirty(portfolio_id)
+
+    if series:
+        # Последний день пересчитывается всегда (текущие цены)
+        since = min(d for d in (series.end, changed and changed.date(),
+                                price_changed, dirty) if d)
+    if series is None or since < series.start:
+        first = TransactionRepository.get_changed_since(portfolio_id, 0)[1]
+        if not first:
+            return ValueSeries(today)
+        series = ValueSeries(first.date())
+        since = series.start
+
+    _extend(portfolio_id, series, since, today)
+    series.transaction_id = transaction_id
+    series.price_checked = price_checked
+    _cache_set(portfolio_id, series)
+    return series
+
+
+def invalidate_value_series(portfolio_id: int, since: datetime | date) -> None:
+    """Отметка о пересчете ряда портфеля с даты (изменение транзакций,
+    после commit)"""
+    if isinstance(since, datetime):
+        since = since.date()
+    after_commit(_mark_dirty, portfolio_id, since)
+
+
+def _mark_dirty(portfolio_id: int, since: date) -> None:
+    try:
+        key = DIRTY_KEY.format(portfolio_id)
+        dirty = redis.get(key)
+        if not dirty or pickle.loads(dirty) > since:
+            redis.set(key, pickle.dumps(since), ex=CACHE_TTL)
+    except Exception:
+        current_app.logger.debug('Кэш динамики портфеля недоступен',
+                                 exc_info=True)
+
+
+def _pop_dirty(portfolio_id: int) -> date | None:
+    try:
+        pipe = redis.pipeline()
+        pipe.get(DIRTY_KEY.format(portfolio_id))
+        pipe.delete(DIRTY_KEY.format(portfolio_id))
+        dirty = pipe.execute()[0]
+        return pickle.loads(dirty) if dirty else None
+    except Exception:
+        return None
+
+
+def _cache_get(portfolio_id: int) -> ValueSeries | None:
+    try:
+        data = redis.get(CACHE_KEY.format(portfolio_id))
+        return pickle.loads(data) if data else None
+    except Exception:
+        current_app.logger.debug('Кэш динамики портфеля недоступен',
+                                 exc_info=True)
+        return None
+
+
+def _cache_set(portfolio_id: int, series: ValueSeries) -> None:
+    try:
+        redis.set(CACHE_KEY.format(portfolio_id), pickle.dumps(series),
+                  ex=CACHE_TTL)
+    except Exception:
+        current_app.logger.debug('Кэш динамики портфеля недоступен',
+                                 exc_info=True)
@@ -1,6 +1,23 @@
+"""Репозитории моделей и единица работы (unit of work).
+
+Внутри unit_of_work() репозитории не завершают транзакцию: изменения
+записываются в базу (flush - с ID новых объектов, загруженные объекты
+сессии не сбрасываются), а commit выполняется один раз в конце блока, при
+ошибке изменения откатываются. Сброс кэшей (after_commit) откладывается до
+конца блока, чтобы кэш не собрали заново по данным до commit, и
+отменяется при откате, чтобы в кэш не попали откаченные данные. Каждый
+обработчик запроса выполняется в unit_of_work (init_unit_of_work),
+количество commit за запрос пишется в журнал.
+"""
 from __future__ import annotations
-from typing import Iterable, Type, TypeVar
-from sqlalchemy.orm import DeclarativeBase
+from contextlib import contextmanager
+from functools import partial, wraps
+from typing import Any, Callable, Iterable, Iterator, List, Type, TypeVar
+
+from flask import current_app, g, has_app_context, has_request_context, \
+    request
+from sqlalchemy import event
+from sqlalchemy.orm import DeclarativeBase, Session, with_parent
 
 from portfolio_tracker.app import db
 
@@ -8,6 +25,105 @@ from portfolio_tracker.app import db
 ModelType = TypeVar('ModelType', bound=DeclarativeBase)
 
 
+def _depth() -> int:
+    return g.get('uow_depth', 0) if has_app_context() else 0
+
+
+@contextmanager
+def unit_of_work() -> Iterator[None]:
+    """Изменения внутри блока сохраняются одним commit в конце (при ошибке
+    откатываются). Вложенный блок - часть внешнего."""
+    depth = _depth()
+    g.uow_depth = depth + 1
+    if not depth:
+        g.uow_callbacks = []
+    try:
+        yield
+        if not depth and (g.get('uow_pending') or db.session.new
+                          or db.session.dirty or db.session.deleted):
+            db.session.commit()
+    except BaseException:
+        if not depth:
+            db.session.rollback()
+            g.uow_callbacks = []
+        raise
+    finally:
+        g.uow_depth = depth
+        if not depth:
+            g.uow_pending = False
+
+    if not depth:
+        _run_callbacks()
+
+
+def in_unit_of_work() -> bool:
+    return bool(_depth())
+
+
+def commit() -> None:
+    """Commit сессии (внутри unit_of_work - отложенный)"""
+    if _depth():
+        db.session.flush()
+        g.uow_pending = True
+    else:
+        db.session.commit()
+
+
+def after_commit(callback: Callable[..., Any], *args: Any) -> None:
+    """Вызов после успешного завершения unit_of_work (при откате - не
+    вызывается, вне блока - сразу)"""
+    if _depth():
+        g.uow_callbacks.append(partial(callback, *args))
+    else:
+        callback(*args)
+
+
+def _run_callbacks() -> None:
+    callbacks, g.uow_callbacks = g.get('uow_callbacks', []), []
+    for callback in callbacks:
+        try:
+            callback()
+        except Exception:
+            current_app.logger.warning('Ошибка после commit', exc_info=True)
+
+
+def commits_count() -> int:
+    """Количество commit в текущем запросе"""
+    return g.get('db_commits', 0) if has_request_context() else 0
+
+
+@event.listens_for(Session, 'after_commit')
+def _count_commit(session: Session) -> None:
+    if has_request_context():
+        g.db_commits = g.get('db_commits', 0) + 1
+
+
+def init_unit_of_work(app) -> None:
+    """Обработчики запросов - в unit_of_work (после регистрации blueprints)"""
+    for endpoint, view in app.view_functions.items():
+        if endpoint != 'static':
+            app.view_functions[endpoint] = _view_in_unit_of_work(view)
+
+    @app.before_request
+    def reset_commits():
+        g.db_commits = 0
+
+    @app.after_request
+    def log_commits(response):
+        count = commits_count()
+        if count:
+            current_app.logger.debug(f'{request.endpoint}: commit - {count}')
+        return response
+
+
+def _view_in_unit_of_work(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        with unit_of_work():
+            return view(*args, **kwargs)
+    return wrapper
+
+
 class DefaultRepository:
     """Базовый репозиторий для работы с моделями."""
     model: Type[ModelType] = None
@@ -25,13 +141,26 @@ class DefaultRepository:
         select = db.select(cls.model).filter(cls.model.id.in_(ids))
         return db.session.execute(select).scalars()
 
+    @classmethod
+    def get_with_parent(cls, parent, relationship, ids: list | None = None
+                        ) -> List[ModelType]:
+        """Объекты связи relationship родителя с указанными ID (одним
+        запросом, без загрузки всей связи)."""
+        if not ids:
+            return []
+
+        select = (db.select(cls.model)
+                  .where(with_parent(parent, relationship),
+                         cls.model.id.in_(ids)))
+        return list(db.session.execute(select).scalars())
+
     @staticmethod
     def save(obj: ModelType) -> None:
         if obj not in db.session:
             db.session.add(obj)
-        db.session.commit()
+        commit()
 
     @staticmethod
     def delete(obj: ModelType) -> None:
         db.session.delete(obj)
-        db.session.commit()
+        commit()
@@ -0,0 +1,103 @@
+"""Кэш цен тикеров в Redis.
+
+Загрузчики цен публикуют хэш ticker_id -> упакованная цена под новой
+версией и атомарно переключают версию. Обработчики
+запросов читают цены пачкой (один HMGET) и запоминают их в flask.g на время
+запроса. Если Redis недоступен или цены нет в кэше - цена берется из базы.
+"""
+from __future__ import annotations
+import struct
+import time
+from typing import Dict, Iterable
+
+from flask import current_app, g, has_request_context
+
+from portfolio_tracker.app import db, redis
+from portfolio_tracker.portfolio.models import Ticker
+
+VERSION_KEY = 'prices.version'
+PRICE_FORMAT = '<d'  # Цена
+CHUNK_SIZE = 5000
+# Сколько живет прошлая версия (для запросов, начатых до переключения)
+OLD_VERSION_TTL = 60
+# Пауза в обращениях к Redis после ошибки, сек.
+RETRY_AFTER = 30
+
+_unavailable_until = 0.0
+
+
+def _available() -> bool:
+    return time.monotonic() >= _unavailable_until
+
+
+def _set_unavailable(message: str) -> None:
+    global _unavailable_until
+    _unavailable_until = time.monotonic() + RETRY_AFTER
+    current_app.logger.warning(message, exc_info=True)
+
+
+def _key(version: int | bytes) -> str:
+    if isinstance(version, bytes):
+        version = version.decode()
+    return f'prices.{version}'
+
+
+def _pack(price: float | None) -> bytes:
+    return struct.pack(PRICE_FORMAT, price or 0)
+
+
+def publish_prices() -> None:
+    """Публикация цен всех тикеров из базы под новой версией."""
+    try:
+        version = redis.incr(f'{VERSION_KEY}.counter')
+        key = _key(version)
+
+        select = db.select(Ticker.id, Ticker.price)
+        prices = db.session.execute(select).all()
+        pipe = redis.pipeline(transaction=False)
+        for n in range(0, len(prices), CHUNK_SIZE):
+            pipe.hset(key, mapping={ticker_id: _pack(price) for ticker_id, price
+                                    in prices[n:n + CHUNK_SIZE]})
+        pipe.execute()
+
+        # Переключение версии
+        old_version = redis.getset(VERSION_KEY, version)
+        if old_version:
+            redis.expire(_key(old_version), OLD_VERSION_TTL)
+    except Exception:
+        _set_unavailable('Кэш цен не обновлен')
+
+
+def get_prices(ticker_ids: Iterable[str]) -> Dict[str, float | None]:
+    """Цены тикеров: память запроса, затем Redis, затем база."""
+    ticker_ids = list(ticker_ids)
+    memo: Dict[str, float | None] = {}
+    if has_request_context():
+        memo = g.setdefault('prices', {})
+
+    missing = list({t for t in ticker_ids if t and t not in memo})
+    if missing and _available():
+        try:
+            version = redis.get(VERSION_KEY)
+            values = redis.hmget(_key(version), missing) if version else []
+            for ticker_id, value in zip(missing, values):
+                if value:
+                    # unpack_from - и для значений прошлого формата
+                    # (цена, время публикации) до следующей публикации
+                    memo[ticker_id] = struct.unpack_from(PRICE_FORMAT,
+                                                         value)[0]
+        except Exception:
+            # Redis недоступен - цены из базы
+            _set_unavailable('Кэш цен недоступен')
+
+    missing = [t for t in missing if t not in memo]
+    if missing:
+        select = (db.select(Ticker.id, Ticker.price)
+                  .where(Ticker.id.in_(missing)))
+        memo.update({row.id: row.price for row in db.session.execute(select)})
+
+    return {t: memo.get(t) for t in ticker_ids}
+
+
+def get_price(ticker_id: str) -> float | None:
+    return get_prices([ticker_id])[ticker_id]
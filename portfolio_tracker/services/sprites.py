@@ -0,0 +1,199 @@
+"""Спрайты иконок тикеров.
+
+Иконки рынка (24px) собираются в WebP по сетке COLUMNS x N (листы не
+больше SHEET_ROWS строк - ограничение размера WebP), рядом лежит карта
+{имя файла иконки: [номер листа, номер ячейки]}. Страницы с таблицами
+активов загружают несколько картинок вместо отдельной на каждую строку.
+После загрузки иконок спрайт дополняется новыми ячейками (пересобираются
+только листы с новыми ячейками), полностью - только при большом числе
+неиспользуемых ячеек. Имя листа содержит хэш содержимого, поэтому кэш
+браузера сбрасывается сам.
+"""
+from __future__ import annotations
+import hashlib
+from io import BytesIO
+import json
+import os
+from typing import Dict, List, Tuple
+
+from flask import current_app, url_for
+from PIL import Image
+
+from portfolio_tracker.app import db
+from portfolio_tracker.general_functions import Market
+from portfolio_tracker.portfolio.models import Ticker
+
+SIZE = 24
+COLUMNS = 32
+# Строк в листе спрайта: сторона WebP - не больше 16383 px
+SHEET_ROWS = 16383 // SIZE
+# Доля неиспользуемых ячеек, после которой спрайт пересобирается
+MAX_STALE = 0.25
+
+# Карты, прочитанные процессом: рынок -> (время изменения файла карты, карта)
+_maps: Dict[str, Tuple[int, dict]] = {}
+
+
+def _folder(market: Market) -> str:
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    return f'{upload_folder}/images/tickers/{market}'
+
+
+def _map_path(market: Market) -> str:
+    return f'{_folder(market)}/sprite/{SIZE}.json'
+
+
+def load_map(market: Market) -> dict:
+    """Карта спрайта рынка (перечитывается после пересборки)"""
+    path = _map_path(market)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return {}
+
+    cached = _maps.get(market)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    try:
+        with open(path) as f:
+            sprite_map = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    _maps[market] = (mtime, sprite_map)
+    return sprite_map
+
+
+def sprite_style(market: Market, image: str | None) -> str:
+    """CSS фона для иконки из спрайта (пустая строка - иконки в спрайте нет)"""
+    if not image:
+        return ''
+
+    sprite_map = load_map(market)
+    cell = sprite_map.get('icons', {}).get(image)
+    # Карта прошлого формата (один лист) - до пересборки иконки отдельно
+    if cell is None or 'files' not in sprite_map:
+        return ''
+
+    sheet, cell = cell
+    url = url_for('static', filename=f"images/tickers/{market}/sprite/"
+                                     f"{sprite_map['files'][sheet]}")
+    x, y = cell % COLUMNS * SIZE, cell // COLUMNS * SIZE
+    return f'background-image:url({url});background-position:-{x}px -{y}px'
+
+
+def _icon(path: str) -> Image.Image | None:
+    try:
+        with Image.open(path) as img:
+            img = img.convert('RGBA')
+    except (OSError, ValueError):
+        return None
+
+    img.thumbnail((SIZE, SIZE))
+    return img
+
+
+def build_sprite(market: Market, full: bool = False) -> int:
+    """Сборка спрайта рынка по иконкам тикеров. Возвращает число
+    добавленных иконок"""
+    folder = _folder(market)
+    select = (db.select(Ticker.image).distinct()
+              .where(Ticker.market == market, Ticker.image.isnot(None)))
+    images = set(db.session.execute(select).scalars())
+    per_sheet = COLUMNS * SHEET_ROWS
+
+    old_map = load_map(market)
+    old_files: List[str] = list(old_map.get('files', []))
+    # Иконка -> (лист, ячейка листа)
+    icons: Dict[str, List[int]] = dict(old_map.get('icons', {}))
+    stale = len(set(icons) - images)
+    update = (not full and icons and old_files
+              and old_map.get('columns') == COLUMNS
+              and old_map.get('rows') == SHEET_ROWS
+              and stale <= len(icons) * MAX_STALE)
+    files: List[str | None] = list(old_files) if update else []
+    if not update:
+        icons = {}
+
+    new = sorted(images - set(icons))
+    if not new and update:
+        return 0
+
+    # Иконки новых ячеек по листам
+    cells: Dict[int, List[Tuple[int, Image.Image]]] = {}
+    next_cell = max((sheet * per_sheet + cell for sheet, cell
+                     in icons.values()), default=-1) + 1
+    added = 0
+    for image in new:
+        icon = _icon(f'{folder}/{SIZE}/{image}')
+        if icon is None:
+            continue
+        sheet, cell = divmod(next_cell, per_sheet)
+        icons[image] = [sheet, cell]
+        cells.setdefault(sheet, []).append((cell, icon))
+        next_cell += 1
+        added += 1
+
+    # Пересобираются только листы с новыми ячейками
+    sheets = max((next_cell + per_sheet - 1) // per_sheet, 1)
+    files += [None] * (sheets - len(files))
+    for sheet in range(sheets):
+        if files[sheet] and sheet not in cells:
+            continue
+
+        count = min(next_cell - sheet * per_sheet, per_sheet)
+        rows = max((count + COLUMNS - 1) // COLUMNS, 1)
+        canvas = Image.new('RGBA', (COLUMNS * SIZE, rows * SIZE))
+        if files[sheet]:
+            try:
+                with Image.open(f'{folder}/sprite/{files[sheet]}') as old:
+                    canvas.paste(old.crop((0, 0, COLUMNS * SIZE,
+                                           min(old.height, rows * SIZE))),
+                                 (0, 0))
+            except OSError:
+                # Лист недоступен - сборка заново
+                return build_sprite(market, full=True)
+
+        for cell, icon in cells.get(sheet, []):
+            # Неквадратные иконки - по центру ячейки
+            x = cell % COLUMNS * SIZE + (SIZE - icon.width) // 2
+            y = cell // COLUMNS * SIZE + (SIZE - icon.height) // 2
+            canvas.paste(icon, (x, y))
+        files[sheet] = _save_sheet(market, canvas)
+
+    _save_map(market, files, icons, old_files)
+    return added
+
+
+def _save_sheet(market: Market, canvas: Image.Image) -> str:
+    """Запись листа спрайта под именем с хэшем содержимого"""
+    folder = f'{_folder(market)}/sprite'
+    os.makedirs(folder, exist_ok=True)
+
+    output = BytesIO()
+    canvas.save(output, format='WEBP', lossless=True)
+    data = output.getvalue()
+    filename = f'{SIZE}.{hashlib.sha256(data).hexdigest()[:12]}.webp'
+    with open(f'{folder}/{filename}', 'wb') as f:
+        f.write(data)
+    return filename
+
+
+def _save_map(market: Market, files: List[str], icons: Dict[str, List[int]],
+              old_files: List[str]) -> None:
+    """Запись карты (через временный файл) и удаление старых листов"""
+    folder = f'{_folder(market)}/sprite'
+    os.makedirs(folder, exist_ok=True)
+
+    tmp = f'{_map_path(market)}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'files': files, 'columns': COLUMNS, 'rows': SHEET_ROWS,
+                   'size': SIZE, 'icons': icons}, f)
+    os.replace(tmp, _map_path(market))
+
+    # Прошлые листы еще могут запрашиваться уже открытыми страницами,
+    # более старые удаляются
+    keep = set(files) | set(old_files)
+    for name in os.listdir(folder):
+        if name not in keep and name.endswith('.webp'):
+            os.remove(f'{folder}/{name}')
@@ -0,0 +1,155 @@
+"""Снимки итогов пользователя в Redis.
+
+Итоги портфелей и кошельков пользователя хранятся в хэше user.{id}.summary:
+поле portfolio.{id} - упакованные (cost_now, amount, invested, buy_orders),
+поле wallet.{id} - (cost_now, buy_orders). Загрузчики цен после публикации
+новых цен пересчитывают снимки затронутых пользователей пачками, страницы
+портфелей и кошельков читают снимок одним HGETALL. Изменения пользователя
+сбрасывают его снимок, он пересчитывается при следующем чтении. Если Redis
+недоступен - итоги считаются в базе.
+"""
+from __future__ import annotations
+import struct
+from typing import Dict, Iterable, List, NamedTuple
+
+from flask import current_app
+from sqlalchemy import union
+
+from portfolio_tracker.app import db, redis
+from portfolio_tracker.repository import after_commit
+from portfolio_tracker.general_functions import Market
+from portfolio_tracker.portfolio.models import Asset, Portfolio, Ticker
+from portfolio_tracker.portfolio.repository import PortfolioRepository
+from portfolio_tracker.wallet.models import Wallet, WalletAsset
+from portfolio_tracker.wallet.repository import WalletRepository
+
+KEY = 'user.{}.summary'
+PORTFOLIO_FORMAT = '<dddd'  # cost_now, amount, invested, buy_orders
+WALLET_FORMAT = '<dd'  # cost_now, buy_orders
+# Снимок живет до следующей загрузки цен, TTL - на случай остановки загрузчиков
+SUMMARY_TTL = 24 * 60 * 60
+CHUNK_SIZE = 500
+
+
+class PortfolioTotals(NamedTuple):
+    cost_now: float = 0
+    amount: float = 0
+    invested: float = 0
+    buy_orders: float = 0
+
+
+class WalletTotals(NamedTuple):
+    cost_now: float = 0
+    buy_orders: float = 0
+
+
+class Summary(NamedTuple):
+    portfolios: Dict[int, PortfolioTotals]
+    wallets: Dict[int, WalletTotals]
+
+
+def _calculate(user_ids: List[int]) -> Dict[int, Summary]:
+    """Итоги пользователей, посчитанные в базе двумя запросами"""
+    summaries = {user_id: Summary({}, {}) for user_id in user_ids}
+
+    totals = PortfolioRepository.get_totals(user_ids=user_ids)
+    for portfolio_id, row in totals.items():
+        summaries[row.user_id].portfolios[portfolio_id] = PortfolioTotals(
+            row.cost_now or 0, row.amount or 0, row.invested or 0,
+            row.buy_orders or 0)
+
+    for wallet_id, row in WalletRepository.get_totals(user_ids).items():
+        summaries[row.user_id].wallets[wallet_id] = WalletTotals(
+            row.cost_now or 0, row.buy_orders or 0)
+
+    return summaries
+
+
+def _store(pipe, user_id: int, summary: Summary) -> None:
+    key = KEY.format(user_id)
+    mapping = {f'portfolio.{portfolio_id}': struct.pack(PORTFOLIO_FORMAT, *totals)
+               for portfolio_id, totals in summary.portfolios.items()}
+    mapping.update({f'wallet.{wallet_id}': struct.pack(WALLET_FORMAT, *totals)
+                    for wallet_id, totals in summary.wallets.items()})
+    # Пустое поле - признак того, что снимок есть (у пользователя нет активов)
+    mapping[''] = b''
+
+    pipe.delete(key)
+    pipe.hset(key, mapping=mapping)
+    pipe.expire(key, SUMMARY_TTL)
+
+
+def _unpack(data: Dict[bytes, bytes]) -> Summary:
+    summary = Summary({}, {})
+    for field, value in data.items():
+        kind, _, obj_id = field.decode().partition('.')
+        if kind == 'portfolio':
+            summary.portfolios[int(obj_id)] = PortfolioTotals(
+                *struct.unpack(PORTFOLIO_FORMAT, value))
+        elif kind == 'wallet':
+            summary.wallets[int(obj_id)] = WalletTotals(
+                *struct.unpack(WALLET_FORMAT, value))
+    return summary
+
+
+def get_affected_users(market: Market) -> List[int]:
+    """Пользователи, у которых есть активы рынка в портфелях или кошельках"""
+    select = union(
+        db.select(Portfolio.user_id)
+        .join(Asset, Asset.portfolio_id == Portfolio.id)
+        .join(Ticker, Ticker.id == Asset.ticker_id)
+        .where(Ticker.market == market),
+        db.select(Wallet.user_id)
+        .join(WalletAsset, WalletAsset.wallet_id == Wallet.id)
+        .join(Ticker, Ticker.id == WalletAsset.ticker_id)
+        .where(Ticker.market == market))
+    return list(db.session.execute(select).scalars())
+
+
+def refresh_summaries(market: Market) -> None:
+    """Пересчет снимков пользователей с активами рынка (после загрузки цен)"""
+    user_ids = get_affected_users(market)
+    try:
+        for n in range(0, len(user_ids), CHUNK_SIZE):
+            pipe = redis.pipeline(transaction=False)
+            for user_id, summary in _calculate(user_ids[n:n + CHUNK_SIZE]).items():
+                _store(pipe, user_id, summary)
+            pipe.execute()
+    except Exception:
+        current_app.logger.warning('Снимки итогов не обновлены', exc_info=True)
+
+
+def get_summary(user_id: int) -> Summary:
+    """Итоги пользователя из снимка (при отсутствии - посчитанные в базе)"""
+    try:
+        data = redis.hgetall(KEY.format(user_id))
+        if data:
+            return _unpack(data)
+    except Exception:
+        current_app.logger.debug('Снимки итогов недоступны', exc_info=True)
+        return _calculate([user_id])[user_id]
+
+    summary = _calculate([user_id])[user_id]
+    try:
+        pipe = redis.pipeline(transaction=False)
+        _store(pipe, user_id, summary)
+        pipe.execute()
+    except Exception:
+        current_app.logger.debug('Снимки итогов недоступны', exc_info=True)
+    return summary
+
+
+def reset_summary(user_ids: int | Iterable[int]) -> None:
+    """Сброс снимков после изменений пользователя (после commit)"""
+    if isinstance(user_ids, int):
+        user_ids = [user_ids]
+    keys = [KEY.format(user_id) for user_id in user_ids if user_id]
+    if keys:
+        after_commit(_delete, keys)
+
+
+def _delete(keys: List[str]) -> None:
+    try:
+        redis.delete(*keys)
+    except Exception:
+        current_app.logger.debug('Снимки итогов недоступны', exc_info=True)
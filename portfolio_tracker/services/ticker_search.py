@@ -0,0 +1,244 @@
+"""Поиск тикеров.
+
+Выпадающие списки (все рынки, поиск по началу символа или названия):
+страницы результатов кэшируются в Redis, в кэше только ID, символ и
+название, цены добавляются при выдаче из кэша цен. Если Redis недоступен -
+страница берется из базы.
+
+Добавление актива (тикеры рынка, поиск по вхождению): индекс рынка в
+памяти процесса с постраничной выдачей по ключу последнего тикера. После
+загрузки тикеров версия индекса в Redis увеличивается, и процессы
+перестраивают индекс при следующем поиске.
+"""
+from __future__ import annotations
+from array import array
+from bisect import bisect_left, bisect_right
+import json
+import threading
+import time
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+from flask import current_app
+
+from portfolio_tracker.app import db, redis
+from portfolio_tracker.general_functions import MARKETS, Market
+from portfolio_tracker.portfolio.models import Ticker
+from portfolio_tracker.portfolio.repository import TickerRepository
+from portfolio_tracker.repository import after_commit
+
+PER_PAGE = 20
+CACHE_KEY = 'tickers.search.{}.{}'
+CACHE_TTL = 10 * 60
+
+INDEX_KEY = 'tickers.index.{}'
+# Перестроение индекса, если версия неизвестна (нет Redis), сек.
+INDEX_MAX_AGE = 10 * 60
+NGRAM = 3
+
+Page = Tuple[List[Tuple[str, str, str]], bool]
+
+
+def get_page(search: str = '', page: int = 1) -> Page:
+    """Тикеры страницы [(id, symbol, name)] и признак следующей страницы"""
+    search = search.strip().lower()
+    key = CACHE_KEY.format(page, search)
+    try:
+        data = redis.get(key)
+        if data:
+            rows, more = json.loads(data)
+            return [tuple(row) for row in rows], more
+    except Exception:
+        current_app.logger.debug('Кэш поиска тикеров недоступен', exc_info=True)
+
+    rows, more = TickerRepository.search_page(search, page, PER_PAGE)
+    rows = [(row.id, row.symbol, row.name) for row in rows]
+    try:
+        redis.set(key, json.dumps([rows, more]), ex=CACHE_TTL)
+    except Exception:
+        current_app.logger.debug('Кэш поиска тикеров недоступен', exc_info=True)
+    return rows, more
+
+
+def matches(search: str, *values: str | None) -> bool:
+    """Совпадение начала одного из значений с запросом (как в поиске)"""
+    search = search.strip().lower()
+    return not search or any(v and v.lower().startswith(search) for v in values)
+
+
+class TickerEntry(NamedTuple):
+    id: str
+    symbol: str
+    name: str
+    market_cap_rank: int | None
+    image: str | None
+    market: str
+
+    @property
+    def cursor(self) -> str:
+        """Ключ тикера для запроса следующей страницы"""
+        return f"{self.market_cap_rank or ''}:{self.id}"
+
+
+SortKey = Tuple[bool, int, str]
+
+
+def _sort_key(rank: int | None, ticker_id: str) -> SortKey:
+    # Порядок выдачи: по капитализации (без нее - в конце), затем по ID
+    return rank is None, rank or 0, ticker_id
+
+
+def parse_cursor(cursor: str | None) -> SortKey | None:
+    if not cursor or ':' not in cursor:
+        return None
+    rank, ticker_id = cursor.split(':', 1)
+    try:
+        return _sort_key(int(rank) if rank else None, ticker_id)
+    except ValueError:
+        return None
+
+
+class TickerIndex:
+    """Индекс тикеров рынка.
+
+    Тикеры лежат в порядке выдачи, для каждой n-граммы символа и названия
+    хранится возрастающий список позиций. Запрос проверяется вхождением по
+    самому короткому из списков своих n-грамм, запрос короче n-граммы -
+    перебором по порядку до заполнения страницы. Тикеры с символом, равным
+    запросу, выдаются первыми: порядок выдачи (точное совпадение, ключ
+    тикера), совпадение для ключа after определяется по символу его тикера.
+    """
+
+    def __init__(self, entries: Iterable[TickerEntry]) -> None:
+        self.entries = sorted(entries, key=lambda e: _sort_key(
+            e.market_cap_rank, e.id))
+        self.keys = [_sort_key(e.market_cap_rank, e.id) for e in self.entries]
+        self.texts = [f"{e.symbol or ''}\n{e.name or ''}".lower()
+                      for e in self.entries]
+        self.symbols: Dict[str, List[int]] = {}
+        self.grams: Dict[str, array] = {}
+
+        for pos, (entry, text) in enumerate(zip(self.entries, self.texts)):
+            self.symbols.setdefault((entry.symbol or '').lower(), []).append(pos)
+            for gram in {text[i:i + NGRAM]
+                         for i in range(len(text) - NGRAM + 1)}:
+                positions = self.grams.get(gram)
+                if positions is None:
+                    positions = self.grams[gram] = array('I')
+                positions.append(pos)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _candidates(self, query: str, start: int) -> Iterable[int]:
+        if len(query) < NGRAM:
+            return range(start, len(self.entries))
+
+        postings = []
+        for i in range(len(query) - NGRAM + 1):
+            positions = self.grams.get(query[i:i + NGRAM])
+            if positions is None:
+                return ()
+            postings.append(positions)
+        positions = min(postings, key=len)
+        return positions[bisect_left(positions, start):]
+
+    def search(self, search: str = '', after: str | None = None,
+               limit: int = PER_PAGE) -> Tuple[List[TickerEntry], bool]:
+        """Страница тикеров после ключа after и признак следующей страницы"""
+        query = search.strip().lower()
+        if '\n' in query:
+            return [], False
+
+        exact = self.symbols.get(query, []) if query else []
+        exact_keys = [self.keys[pos] for pos in exact]
+
+        # Начало страницы: среди точных совпадений или среди остальных
+        key = parse_cursor(after)
+        exact_start, start = 0, 0
+        if key:
+            i = bisect_left(exact_keys, key)
+            if i < len(exact_keys) and exact_keys[i] == key:
+                exact_start = i + 1
+            else:
+                exact_start = len(exact)
+                start = bisect_right(self.keys, key)
+
+        result = [self.entries[pos]
+                  for pos in exact[exact_start:exact_start + limit]]
+        if len(exact) - exact_start > limit:
+            return result, True
+        skip = set(exact)
+
+        for pos in self._candidates(query, start):
+            if pos in skip or query not in self.texts[pos]:
+                continue
+            if len(result) == limit:
+                return result, True
+            result.append(self.entries[pos])
+        return result, False
+
+
+_indexes: Dict[Market, Tuple[bytes | None, float, TickerIndex]] = {}
+_lock = threading.Lock()
+
+
+def _index_version(market: Market) -> bytes | None:
+    try:
+        return redis.get(INDEX_KEY.format(market))
+    except Exception:
+        current_app.logger.debug('Версия индекса тикеров недоступна',
+                                 exc_info=True)
+        return None
+
+
+def _is_actual(cached, version: bytes | None) -> bool:
+    return bool(cached) and cached[0] == version and (
+        version is not None
+        or time.monotonic() - cached[1] < INDEX_MAX_AGE)
+
+
+def get_index(market: Market) -> TickerIndex:
+    """Индекс тикеров рынка (строится при первом поиске и после обновления
+    тикеров)"""
+    version = _index_version(market)
+    cached = _indexes.get(market)
+    if _is_actual(cached, version):
+        return cached[2]
+
+    with _lock:
+        cached = _indexes.get(market)
+        if _is_actual(cached, version):
+            return cached[2]
+
+        select = (db.select(Ticker.id, Ticker.symbol, Ticker.name,
+                            Ticker.market_cap_rank, Ticker.image, Ticker.market)
+                  .where(Ticker.market == market))
+        index = TickerIndex(TickerEntry(*row)
+                            for row in db.session.execute(select))
+        _indexes[market] = (version, time.monotonic(), index)
+        return index
+
+
+def reset_index(market: Market | None = None) -> None:
+    """Перестроение индекса рынка (None - всех рынков) во всех процессах
+    (после загрузки или изменения тикеров, после commit)"""
+    after_commit(_reset_index, [market] if market else MARKETS)
+
+
+def _reset_index(markets: List[Market]) -> None:
+    for market in markets:
+        _indexes.pop(market, None)
+    try:
+        pipe = redis.pipeline(transaction=False)
+        for market in markets:
+            pipe.incr(INDEX_KEY.format(market))
+        pipe.execute()
+    except Exception:
+        current_app.logger.warning('Версия индекса тикеров не обновлена',
+                                   exc_info=True)
+
+
+def search_market(market: Market, search: str = '', after: str | None = None,
+                  limit: int = PER_PAGE) -> Tuple[List[TickerEntry], bool]:
+    """Тикеры рынка для добавления актива: страница после ключа after"""
+    return get_index(market).search(search, after, limit)
@@ -31,6 +31,11 @@ class Config:
 
     # API
     PROXIES_API_KEY = os.environ.get('PROXIES_API_KEY', '')
+    API_POOL_SIZE = int(os.environ.get('API_POOL_SIZE', 10))
+    API_MAX_RETRIES = int(os.environ.get('API_MAX_RETRIES', 3))
+    API_BACKOFF_FACTOR = float(os.environ.get('API_BACKOFF_FACTOR', 2))
+    # Глубина загрузки истории цен, дней
+    HISTORY_DAYS = int(os.environ.get('HISTORY_DAYS', 365))
 
 
 LANGUAGES = {
@@ -379,6 +379,24 @@ function UpdateTables($element = $("body")) {
   })
 }
 
+// Server side tables: следующая страница по ключу последней строки
+// (сервер возвращает next: {offset, after}), остальные - через offset
+function TableQueryParams(params) {
+  var next = this.nextPage;
+  if (next && next.offset == params.offset && next.limit == params.limit
+      && next.sort == params.sort && next.order == params.order
+      && next.search == params.search) {
+    params.after = next.after;
+  }
+  this.requestParams = params;
+  return params;
+}
+
+function TableResponseHandler(res) {
+  this.nextPage = res.next ? $.extend({}, this.requestParams, res.next) : null;
+  return res;
+}
+
 // Sticky Bottom Actions
 function StickyBottomActionsUpdate($element = $("body")) {
 
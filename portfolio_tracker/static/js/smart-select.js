@@ -83,42 +83,34 @@ function SearchSelect($select, search) {
 
 function GenerateSelect($select) {
   var options_list = $select.parent().find('.smart-select__item').length,
-    selectList = $select.next('.smart-select').next('.smart-select__list');
+    selectList = $select.next('.smart-select').next('.smart-select__list'),
+    remote = $select.data('paged');
+
+  // Search
+  if (!selectList.find('.smart-select__search').length
+      && (remote || (!options_list && $select.find('option').length >= 5))) {
+    var timer;
+    selectList.append($('<div>', {
+        class: 'smart-select__search',
+        html: $('<input>', {
+            class: 'border rounded-3 w-100',
+        }).on("input", function () {
+            var search = $(this).val();
+            if (!remote) {
+              SearchSelect($select, search);
+              return;
+            }
+            // Поиск на сервере после паузы ввода
+            clearTimeout(timer);
+            timer = setTimeout(function () {
+              GetOptions($select, search.trim());
+            }, 300);
+          })
+    }));
+  }
 
   if (!options_list) {
-
-    // Search
-    if ($select.find('option').length >= 5) {
-      selectList.append($('<div>', {
-          class: 'smart-select__search',
-          html: $('<input>', {
-              class: 'border rounded-3 w-100',
-          }).on("input", function () {
-              SearchSelect($select, $(this).val());
-            })
-      }));
-    }
-
-
-    var selectOption = $select.find('option'),
-      selectOptionLength = selectOption.length;
-
-    for (let i = 0; i < selectOptionLength; i++) {
-      if (selectOption.eq(i).val() && selectOption.eq(i).text()) {
-        var text = `<span class="text">${selectOption.eq(i).text()}</span>`;
-        if (selectOption.eq(i).data('subtext')) {
-          text += `<span class="subtext">${selectOption.eq(i).data('subtext')}</span>`;
-        }
-
-        var is_selected = selectOption.eq(i).prop('selected') ? ' selected' : '';
-        $('<div>', {
-          class: `smart-select__item ${is_selected}`,
-          html: text 
-        })
-        .attr('data-value', selectOption.eq(i).val())
-        .appendTo(selectList);
-      }
-    }
+    AppendItems(selectList, $select.find('option'));
   }
   ClickInSelect($select);
   // selectList.slideDown(50);
@@ -127,13 +119,37 @@ function GenerateSelect($select) {
   selectList.find('.smart-select__search input').focus();
 }
 
-function GetOptions($select) {
-  var selectedOptionValue = $select.find('option:selected').val();
-  $.get($select.attr('data-url'), function (data) {
+function AppendItems(selectList, selectOption) {
+  var selectOptionLength = selectOption.length;
+
+  for (let i = 0; i < selectOptionLength; i++) {
+    if (selectOption.eq(i).val() && selectOption.eq(i).text()) {
+      var text = `<span class="text">${selectOption.eq(i).text()}</span>`;
+      if (selectOption.eq(i).data('subtext')) {
+        text += `<span class="subtext">${selectOption.eq(i).data('subtext')}</span>`;
+      }
+
+      var is_selected = selectOption.eq(i).prop('selected') ? ' selected' : '';
+      $('<div>', {
+        class: `smart-select__item ${is_selected}`,
+        html: text 
+      })
+      .attr('data-value', selectOption.eq(i).val())
+      .appendTo(selectList);
+    }
+  }
+}
+
+function GetOptions($select, search = '', page = 1) {
+  var selectedOptionValue = $select.find('option:selected').val(),
+    selectList = $select.next('.smart-select').next('.smart-select__list');
+
+  $select.data({loading: true, query: search});
+  $.get($select.attr('data-url'), {search: search, page: page}, function (data) {
     data = $.parseJSON(data);
+    $select.data('loading', false);
 
     if (data.message) { // Error
-      var selectList = $select.next('.smart-select').next('.smart-select__list');
       selectList.empty();
       $('<div>', {
         class: 'smart-select__item',
@@ -144,34 +160,69 @@ function GetOptions($select) {
       return false;
     } 
 
-    $select.empty().append($('<option>', {value: '', text: ''}));
+    // Ответ на устаревший запрос поиска
+    if (search != $select.data('query')) {
+      return false;
+    }
+
+    // Постраничный ответ {results, more}
+    var results = data;
+    if (!Array.isArray(data)) {
+      results = data.results;
+      $select.data({paged: true, more: data.more, page: page, search: search});
+      WatchScroll($select, selectList);
+    }
+
+    if (page == 1) {
+      $select.empty().append($('<option>', {value: '', text: ''}));
+      selectList.find('.smart-select__item').remove();
+    }
 
-    for (let i = 0; i < data.length; i++) {
+    var $newOptions = $();
+    for (let i = 0; i < results.length; i++) {
       var $newOption = $('<option>', {
-        value: data[i].value,
-        text: data[i].text
+        value: results[i].value,
+        text: results[i].text
       })
       
       // Сохранение дополнительных данных
-      for (let key of Object.keys(data[i])) $newOption.data(key, data[i][key]);
+      for (let key of Object.keys(results[i])) $newOption.data(key, results[i][key]);
 
       $select.append($newOption);
-      if (data[i].value == selectedOptionValue) {
+      $newOptions = $newOptions.add($newOption);
+      if (results[i].value == selectedOptionValue) {
         $newOption.attr('selected', 'selected');
       }
     }
-    $select.parent().find('.smart-select__list').empty();
-    GenerateSelect($select);
 
+    if (page == 1) {
+      GenerateSelect($select);
+    } else {
+      AppendItems(selectList, $newOptions);
+      ClickInSelect($select);
+    }
   })
 }
 
+function WatchScroll($select, selectList) {
+  if (selectList.data('watch-scroll')) return;
+  selectList.data('watch-scroll', true);
+
+  // Следующая страница при прокрутке к концу списка
+  selectList.on('scroll', function () {
+    if (!$select.data('more') || $select.data('loading')) return;
+    if (this.scrollTop + this.clientHeight >= this.scrollHeight - 50) {
+      GetOptions($select, $select.data('search'), $select.data('page') + 1);
+    }
+  });
+}
+
 function ClickInSelect($select){
   var selectList = $select.next('.smart-select').next('.smart-select__list'),
     selectItem = selectList.find('.smart-select__item'),
     selectHead = $select.next('.smart-select');
 
-  selectItem.on('click', function() {
+  selectItem.off('click').on('click', function() {
     var chooseItem = $(this).data('value');
 
     // selected class
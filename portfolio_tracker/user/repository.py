@@ -1,4 +1,4 @@
-from portfolio_tracker.repository import DefaultRepository
+from portfolio_tracker.repository import DefaultRepository, commit
 from .models import User
 from ..app import login_manager, db
 
@@ -25,7 +25,7 @@ class UserRepository(DefaultRepository):
             db.session.delete(user.info)
 
         db.session.delete(user)
-        db.session.commit()
+        commit()
 
     @staticmethod
     def get_demo_user() -> User | None:
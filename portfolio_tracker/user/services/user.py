@@ -1,4 +1,5 @@
 from __future__ import annotations
+from datetime import datetime
 from typing import TYPE_CHECKING
 import requests
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -8,6 +9,7 @@ from flask import request, current_app
 
 from portfolio_tracker.general_functions import find_by_attr
 from portfolio_tracker.portfolio.models import Portfolio
+from portfolio_tracker.portfolio.services.positions import recalculate_positions
 from portfolio_tracker.user.repository import UserRepository
 from portfolio_tracker.wallet.models import Wallet
 from portfolio_tracker.watchlist.models import Watchlist
@@ -101,27 +103,11 @@ class UserService:
         """Снять статус администратора."""
         self.user.type = ''
 
-    def recalculate(self) -> None:
-        """Пересчитать транзакции и обновить активы пользователя."""
-        transactions = []
-        for p in self.user.portfolios:
-            for a in p.assets:
-                a.service.set_default_data()
-
-            for t in p.transactions:
-                if t not in transactions:
-                    transactions.append(t)
-
-        for w in self.user.wallets:
-            for a in w.assets:
-                a.service.set_default_data()
-
-            for t in w.transactions:
-                if t not in transactions:
-                    transactions.append(t)
-
-        for t in transactions:
-            t.service.update_dependencies()
+    def recalculate(self, since_id: int | None = None,
+                    since_date: datetime | None = None) -> None:
+        """Пересчитать активы пользователя по транзакциям (все или только
+        затронутые транзакциями начиная с since_id/since_date)."""
+        recalculate_positions(self.user, since_id, since_date)
 
     def create_portfolio(self) -> Portfolio:
         """Возвращает новый портфель"""
@@ -1,5 +1,10 @@
 from __future__ import annotations
+from typing import Dict, Iterable
 
+from sqlalchemy import Row, func
+
+from portfolio_tracker.app import db
+from portfolio_tracker.portfolio.models import Ticker
 from portfolio_tracker.repository import DefaultRepository
 from portfolio_tracker.wallet.models import Wallet, WalletAsset
 
@@ -7,6 +12,24 @@ from portfolio_tracker.wallet.models import Wallet, WalletAsset
 class WalletRepository(DefaultRepository):
     model = Wallet
 
+    @staticmethod
+    def get_totals(user_ids: Iterable[int]) -> Dict[int, Row]:
+        """Итоги по кошелькам пользователей, посчитанные в базе одним
+        запросом: wallet_id -> строка с полями user_id, cost_now и
+        buy_orders."""
+        select = (
+            db.select(WalletAsset.wallet_id.label('wallet_id'),
+                      Wallet.user_id.label('user_id'),
+                      func.sum(WalletAsset.quantity
+                               * func.coalesce(Ticker.price, 0))
+                      .label('cost_now'),
+                      func.sum(WalletAsset.buy_orders).label('buy_orders'))
+            .join(Wallet, Wallet.id == WalletAsset.wallet_id)
+            .outerjoin(Ticker, Ticker.id == WalletAsset.ticker_id)
+            .where(Wallet.user_id.in_(list(user_ids)))
+            .group_by(WalletAsset.wallet_id, Wallet.user_id))
+        return {row.wallet_id: row for row in db.session.execute(select)}
+
 
 class WalletAssetRepository(DefaultRepository):
     model = WalletAsset
@@ -2,12 +2,21 @@ from flask import abort, render_template, request, session
 from flask_login import current_user as user, login_required
 
 from ..services import user_object_search_engine as ose
+from ..services.summary import reset_summary
 from ..general_functions import actions_on_objects
 from ..wraps import closed_for_demo_user
 from .services.wallets import Wallets
 from . import bp
 
 
+@bp.after_request
+def reset_user_summary(response):
+    """Сбрасывает снимок итогов пользователя после изменений."""
+    if request.method == 'POST' and user.is_authenticated:
+        reset_summary(user.id)
+    return response
+
+
 @bp.route('/', methods=['GET', 'POST'])
 @login_required
 @closed_for_demo_user(['POST'])
@@ -64,7 +73,8 @@ def asset_info():
 
     # Actions
     if request.method == 'POST':
-        actions_on_objects(request.data, asset.service.get_transaction)
+        actions_on_objects(request.data, asset.service.get_transaction,
+                           asset.service.get_transactions)
         return ''
 
     return render_template('wallet/asset_info.html', asset=asset)
@@ -1,6 +1,9 @@
 from datetime import datetime, timezone
+from typing import List
+
 from portfolio_tracker.general_functions import find_by_attr
 from portfolio_tracker.portfolio.models import Transaction
+from portfolio_tracker.portfolio.repository import TransactionRepository
 from portfolio_tracker.wallet.models import WalletAsset
 from portfolio_tracker.wallet.repository import WalletAssetRepository
 
@@ -37,6 +40,10 @@ class AssetService:
     def get_transaction(self, transaction_id: str | int | None):
         return find_by_attr(self.asset.transactions, 'id', transaction_id)
 
+    def get_transactions(self, ids: list) -> List[Transaction]:
+        return TransactionRepository.get_with_parent(
+            self.asset, WalletAsset.transactions, ids)
+
     def create_transaction(self) -> Transaction:
         """Возвращает новую транзакцию."""
         transaction = Transaction()
@@ -3,6 +3,7 @@ from flask_babel import gettext
 
 from portfolio_tracker.general_functions import find_by_attr
 from portfolio_tracker.portfolio.repository import TickerRepository
+from portfolio_tracker.services.price_cache import get_prices
 from portfolio_tracker.wallet.models import Wallet, WalletAsset
 from portfolio_tracker.wallet.repository import WalletAssetRepository, WalletRepository
 
@@ -35,6 +36,9 @@ class WalletService:
         self.wallet.cost_now = 0
         self.wallet.buy_orders = 0
 
+        # Цены активов одним запросом к кэшу
+        get_prices(asset.ticker_id for asset in self.wallet.assets)
+
         for asset in self.wallet.assets:
             self.wallet.buy_orders += asset.buy_orders
             self.wallet.cost_now += asset.cost_now
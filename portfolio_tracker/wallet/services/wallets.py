@@ -2,6 +2,7 @@ from __future__ import annotations
 from typing import TYPE_CHECKING
 
 from ...mixins import DetailsMixin
+from ...services.summary import WalletTotals, get_summary
 
 if TYPE_CHECKING:
     from portfolio_tracker.user.models import User
@@ -10,7 +11,13 @@ if TYPE_CHECKING:
 class Wallets(DetailsMixin):
     def __init__(self, user: User):
         super().__init__()
+
+        # Итоги из снимка, пересчитанного после загрузки цен
+        totals = get_summary(user.id).wallets
+
         for wallet in user.wallets:
-            wallet.service.update_price()
+            wallet_totals = totals.get(wallet.id, WalletTotals())
+            wallet.cost_now = wallet_totals.cost_now
+            wallet.buy_orders = wallet_totals.buy_orders
             self.cost_now += wallet.cost_now
             self.buy_orders += wallet.buy_orders
@@ -2,6 +2,7 @@ from __future__ import annotations
 from typing import List
 from datetime import datetime, timezone
 
+from flask import has_request_context
 from sqlalchemy import ForeignKey, Integer, String
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -33,7 +34,12 @@ class WatchlistAsset(Base):
 
     @property
     def price(self):
-        return self.ticker.price
+        from portfolio_tracker.services.price_cache import get_price
+
+        # Тикер уже загружен или вне запроса - цена из тикера
+        if 'ticker' in self.__dict__ or not has_request_context():
+            return self.ticker.price
+        return get_price(self.ticker_id) or 0
 
 class Alert(Base):
     __tablename__ = "alert"
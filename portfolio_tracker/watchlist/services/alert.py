@@ -3,6 +3,7 @@ from portfolio_tracker.portfolio.repository import TickerRepository
 from ..models import Alert
 from ..models import Watchlist
 from ..repository import AlertRepository
+from .alert_index import update_alert_index
 
 
 class AlertService:
@@ -22,22 +23,26 @@ class AlertService:
         self.alert.type = 'down' if asset_price >= self.alert.price_usd else 'up'
 
         AlertRepository.save(self.alert)
+        update_alert_index(self.alert)
 
     def turn_off(self) -> None:
         if not self.alert.transaction_id:
             self.alert.status = 'off'
+            update_alert_index(self.alert)
 
     def turn_on(self) -> None:
         if self.alert.transaction_id and self.alert.status != 'on':
             self.alert.transaction_id = None
             self.alert.asset_id = None
         self.alert.status = 'on'
+        update_alert_index(self.alert)
 
     def convert_order_to_transaction(self):
         self.alert.transaction.service.convert_order_to_transaction()
 
     def delete(self) -> None:
         if not self.alert.transaction_id:
+            update_alert_index(self.alert, deleted=True)
             AlertRepository.delete(self.alert)
 
 
@@ -65,3 +70,4 @@ def update_alert(alert: Alert | None, transaction: Transaction) -> None:
 
         alert.type = ('down' if transaction.base_ticker.price >= alert.price_usd
                         else 'up')
+        update_alert_index(alert)
@@ -0,0 +1,141 @@
+"""Индекс порогов уведомлений по тикерам.
+
+Индекс общий для веб-процессов и загрузчиков цен и хранится в Redis: для
+каждого тикера - два отсортированных множества 'up' и 'down' (ID
+уведомления с ценой в USD). Сработавшие при новой цене уведомления
+извлекаются диапазоном по цене за O(log n + k).
+
+AlertService (edit/turn_on/turn_off/delete) и ордера обновляют индекс
+после commit изменения уведомления. Загрузчики цен строят индекс рынка
+заново, если его нет или он старше REBUILD_INTERVAL. Если Redis недоступен,
+уведомления срабатывают при итоговой проверке загрузчика (alerts_update).
+"""
+from __future__ import annotations
+from typing import Dict, Iterable, List, Tuple
+
+from flask import current_app
+
+from portfolio_tracker.app import db, redis
+from portfolio_tracker.general_functions import Market
+from portfolio_tracker.portfolio.models import Ticker
+from portfolio_tracker.repository import after_commit, in_unit_of_work
+from ..models import Alert, WatchlistAsset
+
+BUILT_KEY = 'alerts.index.{}'
+TICKERS_KEY = 'alerts.index.{}.tickers'
+THRESHOLDS_KEY = 'alerts.index.{}.{}.{}'
+TYPES = ('up', 'down')
+# Полное перестроение индекса рынка (на случай расхождения с базой), сек.
+REBUILD_INTERVAL = 24 * 60 * 60
+
+
+def _thresholds_key(market: Market, type: str, ticker_id: str) -> str:
+    return THRESHOLDS_KEY.format(market, type, ticker_id)
+
+
+class AlertIndex:
+    """Активные уведомления одного рынка"""
+
+    def __init__(self, market: Market) -> None:
+        self.market = market
+
+    def is_built(self) -> bool:
+        return bool(redis.exists(BUILT_KEY.format(self.market)))
+
+    def load(self) -> None:
+        """Построение индекса по активным уведомлениям из базы"""
+        thresholds: Dict[Tuple[str, str], Dict[int, float]] = {}
+
+        select = (db.select(Alert.id, Alert.type, Alert.price_usd,
+                            WatchlistAsset.ticker_id)
+                  .join(Alert.watchlist_asset).join(WatchlistAsset.ticker)
+                  .where(Alert.status == 'on', Alert.type.in_(TYPES),
+                         Alert.price_usd.is_not(None),
+                         Ticker.market == self.market))
+        for row in db.session.execute(select):
+            thresholds.setdefault((row.type, row.ticker_id), {})[row.id] = \
+                row.price_usd
+
+        tickers_key = TICKERS_KEY.format(self.market)
+        old_tickers = [t.decode() for t in redis.smembers(tickers_key)]
+
+        pipe = redis.pipeline()
+        for ticker_id in old_tickers:
+            pipe.delete(*_keys(self.market, ticker_id))
+        pipe.delete(tickers_key)
+        for (type, ticker_id), alerts in thresholds.items():
+            pipe.zadd(_thresholds_key(self.market, type, ticker_id), alerts)
+            pipe.sadd(tickers_key, ticker_id)
+        pipe.set(BUILT_KEY.format(self.market), 1, ex=REBUILD_INTERVAL)
+        pipe.execute()
+
+    def crossed(self, prices: Dict[str, float]) -> List[int]:
+        """Извлекает из индекса уведомления, пороги которых достигнуты"""
+        prices = {ticker_id: price for ticker_id, price in prices.items()
+                  if price}
+        if not prices:
+            return []
+
+        pipe = redis.pipeline()
+        for ticker_id, price in prices.items():
+            # 'up' - цена поднялась до порога, 'down' - опустилась до порога
+            for type, min_, max_ in (('up', '-inf', price),
+                                     ('down', price, '+inf')):
+                key = _thresholds_key(self.market, type, ticker_id)
+                pipe.zrangebyscore(key, min_, max_)
+                pipe.zremrangebyscore(key, min_, max_)
+
+        try:
+            results = pipe.execute()
+        except Exception:
+            current_app.logger.warning('Индекс уведомлений недоступен',
+                                       exc_info=True)
+            return []
+        return [int(alert_id) for ids in results[::2] for alert_id in ids]
+
+
+def get_alert_index(market: Market) -> AlertIndex:
+    """Индекс рынка (строится, если его нет или пора перестроить)"""
+    index = AlertIndex(market)
+    try:
+        if not index.is_built():
+            index.load()
+    except Exception:
+        current_app.logger.warning('Индекс уведомлений не построен',
+                                   exc_info=True)
+    return index
+
+
+def update_alert_index(alert: Alert, deleted: bool = False) -> None:
+    """Обновление индекса после изменения уведомления (после commit)"""
+    if not alert.id and not deleted and in_unit_of_work():
+        # Новое уведомление - ID будет после commit
+        after_commit(update_alert_index, alert)
+        return
+    if not alert.id or not alert.watchlist_asset:
+        return
+
+    ticker = alert.watchlist_asset.ticker
+    active = (not deleted and alert.status == 'on' and alert.type in TYPES
+              and alert.price_usd is not None)
+    after_commit(_write_alert, ticker.market, ticker.id, alert.id,
+                 alert.type if active else None, alert.price_usd)
+
+
+def _write_alert(market: Market, ticker_id: str, alert_id: int,
+                 type: str | None, price: float | None) -> None:
+    pipe = redis.pipeline()
+    for key in _keys(market, ticker_id):
+        pipe.zrem(key, alert_id)
+    if type:
+        pipe.zadd(_thresholds_key(market, type, ticker_id), {alert_id: price})
+        pipe.sadd(TICKERS_KEY.format(market), ticker_id)
+    try:
+        pipe.execute()
+    except Exception:
+        current_app.logger.warning('Индекс уведомлений не обновлен',
+                                   exc_info=True)
+
+
+def _keys(market: Market, ticker_id: str) -> Iterable[str]:
+    return (_thresholds_key(market, type, ticker_id) for type in TYPES)
@@ -1,6 +1,9 @@
 
+from contextlib import contextmanager
 import unittest
 
+from sqlalchemy import event
+
 from portfolio_tracker.app import create_app, db
 from portfolio_tracker.settings import Config
 
@@ -19,5 +22,20 @@ class TestConfig(Config):
 app = create_app(TestConfig)
 
 
+@contextmanager
+def count_queries():
+    """Считает SQL запросы, выполненные внутри блока."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,102 @@
+from datetime import datetime
+import unittest
+
+from tests import app, count_queries, db
+from portfolio_tracker.admin.services.tables import table_result, \
+    tickers_page, users_page
+from portfolio_tracker.portfolio.models import Portfolio, Ticker
+from portfolio_tracker.user.models import User, UserInfo
+
+
+class TestAdminTables(unittest.TestCase):
+    """Класс для тестирования серверной выдачи таблиц админки"""
+
+    def setUp(self):
+        self.app = app
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        ranks = [3, None, 1, 2, None, 5, 4]
+        db.session.add_all(
+            [Ticker(id=f't{n}', symbol=f's{n}', name=f'Name {n}', price=n,
+                    market='crypto', market_cap_rank=rank)
+             for n, rank in enumerate(ranks)]
+            + [Ticker(id='aapl', symbol='aapl', name='Apple', market='stocks')])
+
+        db.session.add_all([
+            User(id=1, email='b@test', password='dog'),
+            User(id=2, email='a@test', password='dog', type='admin'),
+            User(id=3, email='demo@test', password='dog', type='demo'),
+            User(id=4, email='c@test', password='dog'),
+            UserInfo(user_id=1, country='Russia', first_visit=datetime(2024, 1, 1),
+                     last_visit=datetime(2024, 1, 2)),
+            Portfolio(user_id=1, market='crypto', name='crypto'),
+            Portfolio(user_id=1, market='stocks', name='stocks'),
+            Portfolio(user_id=2, market='crypto', name='crypto')])
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def ids(self, page):
+        return [row.id for row in page.rows]
+
+    def test_tickers_page(self):
+        with count_queries() as statements:
+            page = tickers_page('crypto', {'limit': '3'})
+        self.assertEqual(len(statements), 2)
+        self.assertEqual(self.ids(page), ['t2', 't3', 't0'])
+        self.assertEqual((page.total, page.total_not_filtered), (7, 7))
+
+        page = tickers_page('crypto', {'sort': 'price', 'order': 'desc',
+                                       'offset': '5', 'limit': '3'})
+        self.assertEqual(self.ids(page), ['t1', 't0'])
+
+        page = tickers_page('crypto', {'search': 'NAME 1'})
+        self.assertEqual(self.ids(page), ['t1'])
+        self.assertEqual((page.total, page.total_not_filtered), (1, 7))
+
+    def test_tickers_page_after(self):
+        # Страницы по ключу совпадают со страницами через OFFSET,
+        # в том числе в конце сортировки (без капитализации)
+        for sort, order in (('market_cap_rank', 'asc'),
+                            ('market_cap_rank', 'desc'), ('name', 'desc')):
+            args = {'sort': sort, 'order': order, 'limit': '2'}
+            by_offset, by_key = [], []
+            after = None
+            for offset in range(0, 8, 2):
+                args['offset'] = str(offset)
+                by_offset += self.ids(tickers_page('crypto', args))
+                page = tickers_page('crypto', {**args, 'after': after})
+                by_key += self.ids(page)
+                after = page.after
+            self.assertEqual(by_key, by_offset)
+            self.assertEqual(len(by_key), 7)
+
+        result = table_result(tickers_page('crypto', {'limit': '3'}), [{}] * 3)
+        self.assertEqual(result['next'], {'offset': 3, 'after': 't0'})
+
+    def test_users_page(self):
+        with count_queries() as statements:
+            page = users_page({'sort': 'portfolios', 'order': 'desc'})
+        self.assertEqual(len(statements), 2)
+
+        # Без демо-пользователя, количество портфелей - из группировки
+        self.assertEqual([(row.id, row.portfolios) for row in page.rows],
+                         [(1, 2), (2, 1), (4, 0)])
+        self.assertEqual(page.total, 3)
+        self.assertEqual(page.rows[0].country, 'Russia')
+
+        page = users_page({'search': 'russia'})
+        self.assertEqual(self.ids(page), [1])
+
+        # Следующая страница по ключу (значения сортировки строки after -
+        # отдельным запросом по ID)
+        with count_queries() as statements:
+            page = users_page({'offset': '1', 'after': '2', 'limit': '1'})
+        self.assertEqual(self.ids(page), [1])
+        self.assertEqual(len(statements), 3)
+        self.assertIn('user.id > ?', statements[-1])
@@ -0,0 +1,145 @@
+from io import BytesIO
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from PIL import Image
+
+from tests import app, db
+from portfolio_tracker.admin.services import images
+from portfolio_tracker.portfolio.models import Ticker
+
+
+def make_image(img_format, size=(200, 100), color='red'):
+    output = BytesIO()
+    Image.new('RGB', size, color).save(output, format=img_format)
+    return output.getvalue()
+
+
+class MockResponse:
+    status_code = 200
+
+    def __init__(self, content):
+        self.content = content
+
+
+class MockLogs:
+    def set(self, *args):
+        pass
+
+
+class MockStream:
+    name = 'Поток 1'
+
+
+class MockApi:
+    logs = MockLogs()
+
+    def __init__(self, streams=(MockStream(),)):
+        self.streams = list(streams)
+        self.calls = 0
+
+    def nearest_stream(self):
+        return self.streams[0] if self.streams else None
+
+    def reserve_call(self, stream):
+        self.calls += 1
+        return 0
+
+
+class TestImages(unittest.TestCase):
+    """Класс для тестирования загрузки иконок"""
+
+    def setUp(self):
+        self.app = app
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.folder = tempfile.TemporaryDirectory()
+        self.config = patch.dict(app.config, UPLOAD_FOLDER=self.folder.name)
+        self.config.start()
+
+        self.icons = {f'http://{color}': make_image(img_format, color=color)
+                      for color, img_format in (('red', 'PNG'), ('blue', 'JPEG'))}
+        self.send_request = patch.object(
+            images, 'send_request',
+            lambda api, url, session, name: MockResponse(self.icons[url])
+            if url in self.icons else None)
+        self.send_request.start()
+        self.get_session = patch.object(images, 'get_session',
+                                        lambda stream: None)
+        self.get_session.start()
+
+    def tearDown(self):
+        self.get_session.stop()
+        self.send_request.stop()
+        self.config.stop()
+        self.folder.cleanup()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_resize_icon(self):
+        for img_format in ('PNG', 'JPEG'):
+            result_format, icons = images.resize_icon(make_image(img_format))
+
+            self.assertEqual(result_format, img_format)
+            # Неквадратная иконка - по центру квадрата
+            icon = Image.open(BytesIO(icons[40])).convert('RGB')
+            self.assertEqual(icon.size, (40, 40))
+            self.assertGreater(icon.getpixel((20, 20))[0], 200)
+            self.assertNotEqual(icon.getpixel((20, 2)), icon.getpixel((20, 20)))
+            self.assertEqual(Image.open(BytesIO(icons[24])).size, (24, 24))
+
+    def test_load_images(self):
+        tickers = [Ticker(id=f't{n}', name='', symbol='', market='crypto')
+                   for n in range(4)]
+        db.session.add_all(tickers)
+        db.session.commit()
+
+        api = MockApi()
+        loaded = images.load_images(
+            zip(tickers, ['http://red', 'http://blue', 'http://red',
+                          'http://missing']), 'crypto', api)
+
+        self.assertEqual(sorted(loaded), ['t0', 't1', 't2'])
+        # Каждый запрос учтен в лимитах потока
+        self.assertEqual(api.calls, 4)
+        # Одинаковые иконки - один файл
+        self.assertEqual(tickers[0].image, tickers[2].image)
+        self.assertTrue(tickers[1].image.endswith('.jpeg'))
+        self.assertIsNone(tickers[3].image)
+        for px in (24, 40):
+            path = os.path.join(images.icons_path('crypto'), str(px))
+            self.assertEqual(sorted(os.listdir(path)),
+                             sorted({tickers[0].image, tickers[1].image}))
+
+    def test_load_images_without_streams(self):
+        ticker = Ticker(id='t0', name='', symbol='', market='crypto')
+        db.session.add(ticker)
+        db.session.commit()
+
+        loaded = images.load_images([(ticker, 'http://red')], 'crypto',
+                                    MockApi(streams=()))
+        self.assertEqual(loaded, [])
+
+    def test_delete_shared_image(self):
+        tickers = [Ticker(id=f't{n}', name='', symbol='', market='crypto')
+                   for n in range(2)]
+        db.session.add_all(tickers)
+        db.session.commit()
+        images.load_images(zip(tickers, ['http://red', 'http://red']),
+                           'crypto', MockApi())
+        path = os.path.join(images.icons_path('crypto'), '24', tickers[0].image)
+
+        # Файл остается, пока иконкой пользуется другой тикер
+        tickers[0].service.delete()
+        self.assertTrue(os.path.exists(path))
+        tickers[1].service.delete()
+        self.assertFalse(os.path.exists(path))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
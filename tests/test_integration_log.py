@@ -0,0 +1,120 @@
+from datetime import datetime, timedelta
+import fnmatch
+import itertools
+import unittest
+from unittest.mock import patch
+
+from tests import app
+from portfolio_tracker.admin.services.integrations import Log
+
+
+class MockRedis:
+    """Потоки Redis в памяти (ID - миллисекунды и порядковый номер)"""
+
+    def __init__(self):
+        self.streams = {}
+        self.ms = itertools.count(1_700_000_000_000)
+
+    def xadd(self, key, fields, maxlen=None, approximate=True):
+        stream = self.streams.setdefault(key, [])
+        entry_id = (next(self.ms), 0)
+        stream.append((entry_id, {k.encode(): v.encode()
+                                  for k, v in fields.items()}))
+        if maxlen:
+            del stream[:-maxlen]
+        return f'{entry_id[0]}-{entry_id[1]}'.encode()
+
+    def xrange(self, key, min='-', max='+'):
+        exclusive = min.startswith('(')
+        min_id = tuple(map(int, min.lstrip('(').split('-'))) \
+            if min != '-' else (0, 0)
+        return [(f'{i[0]}-{i[1]}'.encode(), fields)
+                for i, fields in self.streams.get(key, [])
+                if i > min_id or (i == min_id and not exclusive)]
+
+    def xtrim(self, key, minid, approximate=True):
+        key = key.decode()
+        self.streams[key] = [(i, f) for i, f in self.streams.get(key, [])
+                             if i[0] >= minid]
+
+    def scan_iter(self, pattern):
+        return [k.encode() for k in self.streams
+                if fnmatch.fnmatch(k, pattern)]
+
+    def delete(self, *keys):
+        for key in keys:
+            self.streams.pop(key, None)
+
+    def pipeline(self):
+        return MockPipeline(self)
+
+
+class MockPipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            self.calls.append((getattr(self.redis, name), args, kwargs))
+        return call
+
+    def execute(self):
+        return [method(*args, **kwargs) for method, args, kwargs in self.calls]
+
+
+class TestLog(unittest.TestCase):
+    """Класс для тестирования логов модулей"""
+
+    def setUp(self):
+        self.app = app
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+        self.redis = patch('portfolio_tracker.admin.services.integrations.redis',
+                           new_callable=MockRedis)
+        self.mock_redis = self.redis.start()
+        self.logs = Log('crypto')
+
+    def tearDown(self):
+        self.redis.stop()
+        self.app_context.pop()
+
+    def test_get_after_timestamp(self):
+        self.logs.set('info', 'Первый')
+        self.logs.set('error', 'Второй')
+
+        logs = sorted(self.logs.get(), key=Log.sort_key)
+        self.assertEqual([log['text'] for log in logs], ['Первый', 'Второй'])
+        self.assertEqual([log['category'] for log in logs], [0, 3])
+
+        # Только новые записи после последней полученной
+        self.logs.set('warning', 'Третий')
+        logs = self.logs.get(logs[-1]['timestamp'])
+        self.assertEqual([log['text'] for log in logs], ['Третий'])
+
+    def test_max_len(self):
+        with patch.object(Log, 'MAX_LEN', 3):
+            for n in range(5):
+                self.logs.set('debug', str(n))
+
+        self.assertEqual([log['text'] for log in self.logs.get()],
+                         ['2', '3', '4'])
+
+    def test_clear(self):
+        self.logs.set('info', 'Инфо')
+        self.logs.set('warning', 'Предупреждение')
+
+        # Записи старше недели удаляются, по warning - не старше 60 дней
+        with patch('portfolio_tracker.admin.services.integrations.datetime') as dt:
+            dt.now.return_value = datetime.fromtimestamp(1_700_000_000) \
+                + timedelta(days=30)
+            Log.clear({'info': 7, 'warning': 60})
+
+        self.assertEqual([log['text'] for log in self.logs.get()],
+                         ['Предупреждение'])
+
+    def test_delete(self):
+        self.logs.set('info', 'Инфо')
+        self.logs.delete()
+        self.assertEqual(self.logs.get(), [])
@@ -0,0 +1,67 @@
+import json
+import unittest
+
+from portfolio_tracker.admin.services.json_stream import JsonStream
+
+
+def chunks(data, size):
+    body = json.dumps(data, ensure_ascii=False).encode()
+    return (body[n:n + size] for n in range(0, len(body), size))
+
+
+class TestJsonStream(unittest.TestCase):
+    """Класс для тестирования потокового разбора JSON"""
+
+    def setUp(self):
+        self.data = {
+            'status': 'OK',
+            'results': [{'T': f'A{n}', 'c': n * 1.5, 'name': 'Акция'}
+                        for n in range(100)],
+            'count': 100,
+            'next_url': None}
+
+    def test_chunk_sizes(self):
+        # Границы частей посреди чисел, строк и символов UTF-8
+        for size in (1, 2, 7, 100, 10 ** 6):
+            stream = JsonStream(chunks(self.data, size), 'results')
+
+            self.assertEqual(list(stream), self.data['results'])
+            self.assertEqual(stream.fields,
+                             {'status': 'OK', 'count': 100, 'next_url': None})
+
+    def test_incremental(self):
+        # Первый элемент доступен до получения всего ответа
+        parts = chunks(self.data, 50)
+        read = []
+        stream = JsonStream((read.append(part) or part for part in parts),
+                            'results')
+
+        self.assertEqual(next(iter(stream))['T'], 'A0')
+        self.assertLess(len(read), 5)
+
+    def test_top_level_array(self):
+        self.assertEqual(list(JsonStream(chunks([1, 22, 333, {'a': []}], 1))),
+                         [1, 22, 333, {'a': []}])
+
+    def test_numbers(self):
+        # Граница части после '1.', '2.25e' и т.п.
+        body = b'[1.5, 2.25e3, -0.125, 1E-7, 10]'
+        for size in range(1, 5):
+            stream = JsonStream(body[n:n + size]
+                                for n in range(0, len(body), size))
+            self.assertEqual(list(stream), [1.5, 2250.0, -0.125, 1e-7, 10])
+
+    def test_missing_key(self):
+        stream = JsonStream(chunks({'status': 'OK', 'resultsCount': 0}, 3),
+                            'results')
+
+        self.assertEqual(list(stream), [])
+        self.assertEqual(stream.fields['resultsCount'], 0)
+
+    def test_invalid(self):
+        with self.assertRaises(json.JSONDecodeError):
+            list(JsonStream([b'{"results": [1, 2'], 'results'))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
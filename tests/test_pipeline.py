@@ -0,0 +1,114 @@
+import threading
+import time
+import unittest
+
+from tests import app, db
+from portfolio_tracker.admin.services.pipeline import Pipeline, StopPipeline
+from portfolio_tracker.portfolio.models import Ticker
+from portfolio_tracker.portfolio.repository import TickerRepository
+
+
+class TestPipeline(unittest.TestCase):
+    """Класс для тестирования конвейера загрузки"""
+
+    def setUp(self):
+        self.app = app
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_run(self):
+        batches = []
+        pipeline = Pipeline(lambda x: x * 2 if x % 3 else None,
+                            batches.append, batch_size=2)
+
+        self.assertTrue(pipeline.run(range(10)))
+        self.assertEqual(batches, [[2, 4], [8, 10], [14, 16]])
+        self.assertEqual([m.items for m in pipeline.metrics], [10, 6, 6])
+
+    def test_overlap(self):
+        # Запись части ждет начала получения следующей: без одновременной
+        # работы стадий ожидание заканчивается по таймауту
+        started = [threading.Event() for _ in range(4)]
+        overlapped = []
+        written = []
+
+        def fetch():
+            for n in range(4):
+                started[n].set()
+                yield n
+
+        def write(batch):
+            n = batch[-1]
+            if n + 1 < len(started):
+                overlapped.append(started[n + 1].wait(5))
+            written.extend(batch)
+
+        Pipeline(lambda x: x, write).run(fetch())
+
+        self.assertEqual(written, [0, 1, 2, 3])
+        self.assertEqual(overlapped, [True, True, True])
+
+    def test_bounded_queues(self):
+        # Запись стоит - получение останавливается на заполненных очередях
+        release = threading.Event()
+        fetched = []
+
+        def fetch():
+            for n in range(100):
+                fetched.append(n)
+                yield n
+
+        pipeline = Pipeline(lambda x: x, lambda batch: release.wait(),
+                            maxsize=2)
+        thread = threading.Thread(target=lambda: app.app_context().push()
+                                  or pipeline.run(fetch()))
+        thread.start()
+        time.sleep(0.2)
+        self.assertLess(len(fetched), 10)
+
+        release.set()
+        thread.join()
+        self.assertEqual(len(fetched), 100)
+
+    def test_stop(self):
+        written = []
+
+        def parse(x):
+            if x == 3:
+                raise StopPipeline
+            return x
+
+        pipeline = Pipeline(parse, written.extend, batch_size=10)
+        self.assertFalse(pipeline.run(range(10)))
+        # Разобранное до остановки записывается
+        self.assertEqual(written, [0, 1, 2])
+
+    def test_error(self):
+        def write(batch):
+            raise ValueError('write')
+
+        with self.assertRaises(ValueError):
+            Pipeline(lambda x: x, write).run(range(10))
+
+    def test_write_session(self):
+        db.session.add(Ticker(id='btc', name='btc', symbol='btc', price=1,
+                              market='crypto'))
+        db.session.commit()
+
+        pipeline = Pipeline(lambda price: {'btc': price},
+                            lambda batch: TickerRepository.update_prices(batch[-1]),
+                            batch_size=3)
+        pipeline.run([2, 3, 4])
+
+        # Запись из потока конвейера видна в сессии задачи
+        self.assertEqual(db.session.get(Ticker, 'btc').price, 4)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -2,9 +2,10 @@ import unittest
 
 from flask_login import login_user
 
-from tests import app, db
+from tests import app, count_queries, db
 from portfolio_tracker.user.models import User
 from portfolio_tracker.portfolio.models import Asset, OtherAsset, Portfolio, Ticker
+from portfolio_tracker.portfolio.services.portfolios import Portfolios
 
 
 class TestPortfolio(unittest.TestCase):
@@ -118,6 +119,20 @@ class TestPortfolioService(unittest.TestCase):
         self.assertEqual(self.portfolio.invested, 8000)
         
 
+    def test_update_info_without_assets(self):
+        # Активы другого портфеля не учитываются
+        portfolio = Portfolio(id=2, user_id=1, market='crypto', name='Second')
+        portfolio.assets.append(Asset(ticker_id='btc', quantity=1, amount=100))
+        self.user.portfolios.append(portfolio)
+        db.session.commit()
+
+        self.portfolio.service.update_info()
+
+        self.assertEqual(self.portfolio.cost_now, 0)
+        self.assertEqual(self.portfolio.amount, 0)
+        self.assertEqual(self.portfolio.invested, 0)
+        self.assertEqual(self.portfolio.buy_orders, 0)
+
     def test_update_info_other(self):
         # Меняем рынок на 'other'
         self.portfolio.market = 'other'
@@ -281,5 +296,76 @@ class TestPortfolioService(unittest.TestCase):
         other_assets = db.session.execute(db.select(OtherAsset).filter_by(portfolio_id=1)).all()
         self.assertEqual(len(other_assets), 0)
 
+
+class TestPortfolios(unittest.TestCase):
+    """Класс для тестирования сводки по всем портфелям"""
+
+    def setUp(self):
+        self.app = app
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.user = User(id=1, email='1@1', password='')
+        db.session.add(self.user)
+
+        self.tickers = [Ticker(id=f't{n}', name=f'T{n}', symbol=f't{n}',
+                               price=n + 1, market='crypto')
+                        for n in range(30)]
+        db.session.add_all(self.tickers)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+
+    def add_portfolios(self, count, assets_count):
+        for _ in range(count):
+            portfolio = Portfolio(market='crypto', name='Crypto')
+            for ticker in self.tickers[:assets_count]:
+                portfolio.assets.append(Asset(ticker_id=ticker.id, quantity=2,
+                                              amount=10, buy_orders=1))
+            self.user.portfolios.append(portfolio)
+
+            other = Portfolio(market='other', name='Other')
+            for _ in range(assets_count):
+                other.other_assets.append(OtherAsset(cost_now=5, amount=3))
+            self.user.portfolios.append(other)
+        db.session.commit()
+
+    def render_queries(self):
+        """Запросы на сводку и данные, которые выводит страница портфелей"""
+        db.session.expire_all()
+        with count_queries() as statements:
+            portfolios = Portfolios(self.user)
+            for portfolio in self.user.portfolios:
+                portfolio.is_empty
+                for asset in portfolio.assets:
+                    asset.ticker.price
+        return portfolios, statements
+
+    def test_totals(self):
+        self.add_portfolios(2, 3)
+        portfolios, _ = self.render_queries()
+
+        # Крипто: 2 * (1 + 2 + 3) * 2, прочие: 2 * 3 * 5
+        self.assertEqual(portfolios.cost_now, 24 + 30)
+        self.assertEqual(portfolios.amount, 2 * 30 + 2 * 9)
+        self.assertEqual(portfolios.invested, 2 * 30 + 2 * 9)
+        self.assertEqual(portfolios.buy_orders, 2 * 3)
+
+    def test_query_count_does_not_depend_on_size(self):
+        self.add_portfolios(1, 1)
+        _, small = self.render_queries()
+
+        self.add_portfolios(10, 30)
+        _, large = self.render_queries()
+
+        # Пользователь, итоги портфелей и кошельков (без снимка в Redis),
+        # портфели, активы с тикерами, прочие активы
+        self.assertEqual(len(small), 6)
+        self.assertEqual(len(large), len(small))
+
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)
@@ -0,0 +1,120 @@
+import struct
+import unittest
+from unittest.mock import patch
+
+from flask import g
+
+from tests import app, count_queries, db
+from portfolio_tracker.portfolio.models import Ticker
+from portfolio_tracker.services import price_cache
+
+
+class MockRedis:
+    def __init__(self):
+        self.data = {}
+        self.calls = 0
+
+    def incr(self, key):
+        self.data[key] = self.data.get(key, 0) + 1
+        return self.data[key]
+
+    def get(self, key):
+        self.calls += 1
+        value = self.data.get(key)
+        return str(value).encode() if value is not None else None
+
+    def getset(self, key, value):
+        old = self.get(key)
+        self.data[key] = value
+        return old
+
+    def hset(self, key, mapping):
+        self.data.setdefault(key, {}).update(mapping)
+
+    def hmget(self, key, fields):
+        self.calls += 1
+        return [self.data.get(key, {}).get(field) for field in fields]
+
+    def expire(self, key, seconds):
+        pass
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def execute(self):
+        pass
+
+
+class TestPriceCache(unittest.TestCase):
+    """Класс для тестирования кэша цен"""
+
+    def setUp(self):
+        self.app = app
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        db.session.add_all([
+            Ticker(id='btc', name='Bitcoin', symbol='btc', price=26000, market='crypto'),
+            Ticker(id='eth', name='Ethereum', symbol='eth', price=1600, market='crypto')])
+        db.session.commit()
+
+        self.redis = patch('portfolio_tracker.services.price_cache.redis',
+                           new_callable=MockRedis)
+        self.mock_redis = self.redis.start()
+        price_cache._unavailable_until = 0.0
+
+    def tearDown(self):
+        self.redis.stop()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_get_prices_from_cache(self):
+        price_cache.publish_prices()
+
+        # Цена в базе изменилась, в кэше - опубликованная
+        db.session.get(Ticker, 'btc').price = 30000
+        db.session.commit()
+
+        with count_queries() as statements:
+            prices = price_cache.get_prices(['btc', 'eth'])
+        self.assertEqual(prices, {'btc': 26000, 'eth': 1600})
+        self.assertEqual(statements, [])
+
+    def test_get_prices_without_cache(self):
+        self.assertEqual(price_cache.get_prices(['btc', 'usd']),
+                         {'btc': 26000, 'usd': None})
+
+    def test_get_prices_redis_error(self):
+        self.mock_redis.get = None  # TypeError при обращении
+
+        self.assertEqual(price_cache.get_price('eth'), 1600)
+        self.assertFalse(price_cache._available())
+
+    def test_new_version(self):
+        price_cache.publish_prices()
+        db.session.get(Ticker, 'btc').price = 30000
+        db.session.commit()
+        price_cache.publish_prices()
+
+        self.assertEqual(price_cache.get_price('btc'), 30000)
+
+    def test_request_memo(self):
+        price_cache.publish_prices()
+
+        with app.test_request_context():
+            price_cache.get_prices(['btc', 'eth'])
+            calls = self.mock_redis.calls
+
+            self.assertEqual(price_cache.get_price('btc'), 26000)
+            self.assertEqual(self.mock_redis.calls, calls)
+            self.assertEqual(g.prices, {'btc': 26000, 'eth': 1600})
+
+    def test_old_format(self):
+        # Значение прошлого формата (цена, время публикации)
+        self.mock_redis.data[price_cache.VERSION_KEY] = 1
+        self.mock_redis.hset(price_cache._key(1), mapping={
+            'btc': struct.pack('<dd', 27000, 1700000000)})
+
+        self.assertEqual(price_cache.get_price('btc'), 27000)
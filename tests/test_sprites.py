@@ -0,0 +1,131 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from flask import render_template_string
+from PIL import Image
+
+from tests import app, db
+from portfolio_tracker.portfolio.models import Ticker
+from portfolio_tracker.services import sprites
+
+
+class TestSprites(unittest.TestCase):
+    """Класс для тестирования спрайтов иконок"""
+
+    def setUp(self):
+        self.app = app
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.folder = tempfile.TemporaryDirectory()
+        self.config = patch.dict(app.config, UPLOAD_FOLDER=self.folder.name)
+        self.config.start()
+        self.path = os.path.join(self.folder.name, 'images/tickers/crypto')
+        os.makedirs(os.path.join(self.path, '24'))
+
+    def tearDown(self):
+        self.config.stop()
+        self.folder.cleanup()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def add_ticker(self, ticker_id, color):
+        image = f'{ticker_id}.png'
+        Image.new('RGB', (24, 24), color).save(os.path.join(self.path, '24', image))
+        db.session.add(Ticker(id=ticker_id, name=ticker_id, symbol=ticker_id,
+                              market='crypto', image=image))
+        db.session.commit()
+
+    def sheet(self, n=0):
+        sprite_map = sprites.load_map('crypto')
+        return sprite_map, Image.open(
+            os.path.join(self.path, 'sprite', sprite_map['files'][n])).convert('RGB')
+
+    def test_build(self):
+        self.add_ticker('btc', 'red')
+        self.add_ticker('eth', 'blue')
+
+        self.assertEqual(sprites.build_sprite('crypto'), 2)
+        sprite_map, sheet = self.sheet()
+        self.assertEqual(sprite_map['icons'],
+                         {'btc.png': [0, 0], 'eth.png': [0, 1]})
+        self.assertEqual(sheet.getpixel((12, 12)), (255, 0, 0))
+        self.assertEqual(sheet.getpixel((36, 12)), (0, 0, 255))
+
+        # Без новых иконок спрайт не пересобирается
+        self.assertEqual(sprites.build_sprite('crypto'), 0)
+
+    def test_incremental(self):
+        self.add_ticker('btc', 'red')
+        sprites.build_sprite('crypto')
+        old_files = sprites.load_map('crypto')['files']
+
+        self.add_ticker('eth', 'blue')
+        self.assertEqual(sprites.build_sprite('crypto'), 1)
+        sprite_map, sheet = self.sheet()
+        self.assertEqual(sprite_map['icons'],
+                         {'btc.png': [0, 0], 'eth.png': [0, 1]})
+        self.assertNotEqual(sprite_map['files'], old_files)
+        self.assertEqual(sheet.getpixel((12, 12)), (255, 0, 0))
+        self.assertEqual(sheet.getpixel((36, 12)), (0, 0, 255))
+
+    def test_rebuild_stale(self):
+        for n in range(4):
+            self.add_ticker(f't{n}', 'red')
+        sprites.build_sprite('crypto')
+
+        # Больше четверти ячеек не используется - пересборка
+        db.session.execute(db.delete(Ticker).where(Ticker.id.in_(['t0', 't1'])))
+        self.add_ticker('eth', 'blue')
+        sprites.build_sprite('crypto')
+        self.assertEqual(sprites.load_map('crypto')['icons'],
+                         {'eth.png': [0, 0], 't2.png': [0, 1], 't3.png': [0, 2]})
+
+    def test_sheets(self):
+        # Лист - одна строка: иконки сверх COLUMNS - на следующем листе
+        rows = patch.object(sprites, 'SHEET_ROWS', 1)
+        rows.start()
+        self.addCleanup(rows.stop)
+        for n in range(sprites.COLUMNS):
+            self.add_ticker(f't{n:02}', 'red')
+        sprites.build_sprite('crypto')
+        first_sheet = sprites.load_map('crypto')['files'][0]
+
+        self.add_ticker('z', 'blue')
+        self.assertEqual(sprites.build_sprite('crypto'), 1)
+        sprite_map, sheet = self.sheet(1)
+        self.assertEqual(sprite_map['icons']['z.png'], [1, 0])
+        self.assertEqual(sheet.size, (sprites.COLUMNS * 24, 24))
+        self.assertEqual(sheet.getpixel((12, 12)), (0, 0, 255))
+        # Заполненный лист не пересобирается
+        self.assertEqual(sprite_map['files'][0], first_sheet)
+
+        with app.test_request_context():
+            style = sprites.sprite_style('crypto', 'z.png')
+        self.assertIn(sprite_map['files'][1], style)
+        self.assertIn('background-position:-0px -0px', style)
+
+    def test_ticker_icon(self):
+        self.add_ticker('btc', 'red')
+        self.add_ticker('eth', 'blue')
+        sprites.build_sprite('crypto')
+        ticker = Ticker(id='new', market='crypto', image='new.png')
+
+        with app.test_request_context():
+            html = render_template_string(
+                "{% import 'macro_info.html' as i with context %}"
+                "{{ i.ticker_icon(eth) }}{{ i.ticker_icon(new) }}",
+                eth=db.session.get(Ticker, 'eth'), new=ticker)
+
+        self.assertIn('background-position:-24px -0px', html)
+        self.assertIn(sprites.load_map('crypto')['files'][0], html)
+        # Иконки нет в спрайте - отдельная картинка
+        self.assertIn('/24/new.png', html)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,129 @@
+import unittest
+from unittest.mock import patch
+
+from tests import app, count_queries, db
+from portfolio_tracker.portfolio.models import Asset, Portfolio, Ticker
+from portfolio_tracker.portfolio.services.portfolios import Portfolios
+from portfolio_tracker.services import summary
+from portfolio_tracker.user.models import User
+from portfolio_tracker.wallet.models import Wallet, WalletAsset
+from portfolio_tracker.wallet.services.wallets import Wallets
+
+
+class MockRedis:
+    def __init__(self):
+        self.data = {}
+
+    def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    def hset(self, key, mapping):
+        self.data.setdefault(key, {}).update(
+            {k.encode(): v for k, v in mapping.items()})
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def expire(self, key, seconds):
+        pass
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def execute(self):
+        pass
+
+
+class TestSummary(unittest.TestCase):
+    """Класс для тестирования снимков итогов пользователя"""
+
+    def setUp(self):
+        self.app = app
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.redis = patch('portfolio_tracker.services.summary.redis',
+                           new_callable=MockRedis)
+        self.mock_redis = self.redis.start()
+
+        self.user = User(id=1, email='test@test', password='dog')
+        self.btc = Ticker(id='btc', name='btc', symbol='btc', price=10, market='crypto')
+        self.aapl = Ticker(id='aapl', name='aapl', symbol='aapl', price=5, market='stocks')
+        db.session.add_all([
+            self.user, self.btc, self.aapl,
+            Portfolio(id=1, user_id=1, market='crypto', name='Crypto'),
+            Asset(portfolio_id=1, ticker_id='btc', quantity=2, amount=15,
+                  buy_orders=3),
+            Wallet(id=1, user_id=1, name='Wallet'),
+            WalletAsset(wallet_id=1, ticker_id='btc', quantity=2, buy_orders=3),
+            WalletAsset(wallet_id=1, ticker_id='aapl', quantity=4)])
+        db.session.commit()
+
+    def tearDown(self):
+        self.redis.stop()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_get_summary(self):
+        result = summary.get_summary(1)
+
+        self.assertEqual(result.portfolios, {1: (20, 15, 15, 3)})
+        self.assertEqual(result.wallets, {1: (40, 3)})
+        self.assertIn(summary.KEY.format(1), self.mock_redis.data)
+
+        # Повторное чтение - из снимка, без запросов к базе
+        with count_queries() as statements:
+            self.assertEqual(summary.get_summary(1), result)
+        self.assertEqual(statements, [])
+
+    def test_refresh_summaries(self):
+        summary.get_summary(1)
+
+        # Новые цены видны только после пересчета снимков
+        self.btc.price = 20
+        db.session.commit()
+        self.assertEqual(summary.get_summary(1).wallets[1].cost_now, 40)
+
+        summary.refresh_summaries('crypto')
+        self.assertEqual(summary.get_summary(1).wallets[1].cost_now, 60)
+        self.assertEqual(summary.get_affected_users('stocks'), [1])
+        self.assertEqual(summary.get_affected_users('currency'), [])
+
+    def test_reset_summary(self):
+        summary.get_summary(1)
+        db.session.get(Asset, 1).amount = 5
+        db.session.commit()
+
+        summary.reset_summary(1)
+        self.assertEqual(summary.get_summary(1).portfolios[1].amount, 5)
+
+    def test_empty_user(self):
+        db.session.add(User(id=2, email='empty@test', password='dog'))
+        db.session.commit()
+
+        summary.get_summary(2)
+        with count_queries() as statements:
+            self.assertEqual(summary.get_summary(2), ({}, {}))
+        self.assertEqual(statements, [])
+
+    def test_redis_error(self):
+        self.mock_redis.hgetall = None  # TypeError при обращении
+
+        self.assertEqual(summary.get_summary(1).wallets, {1: (40, 3)})
+
+    def test_pages(self):
+        summary.get_summary(1)
+
+        portfolios = Portfolios(self.user)
+        self.assertEqual((portfolios.cost_now, portfolios.amount,
+                          portfolios.buy_orders), (20, 15, 3))
+
+        wallets = Wallets(self.user)
+        self.assertEqual((wallets.cost_now, wallets.buy_orders), (40, 3))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,229 @@
+import unittest
+from unittest.mock import patch
+
+from tests import app, count_queries, db
+from portfolio_tracker.portfolio.models import Ticker
+from portfolio_tracker.portfolio.repository import TickerRepository
+from portfolio_tracker.services import ticker_search
+
+
+class MockRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1).encode()
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def execute(self):
+        pass
+
+
+class TestTickerSearch(unittest.TestCase):
+    """Класс для тестирования поиска тикеров"""
+
+    def setUp(self):
+        self.app = app
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.redis = patch('portfolio_tracker.services.ticker_search.redis',
+                           new_callable=MockRedis)
+        self.mock_redis = self.redis.start()
+
+        db.session.add_all([
+            Ticker(id='btc', symbol='btc', name='Bitcoin', market_cap_rank=1,
+                   market='crypto'),
+            Ticker(id='bch', symbol='bch', name='Bitcoin Cash', market_cap_rank=20,
+                   market='crypto'),
+            Ticker(id='wbtc', symbol='wbtc', name='Wrapped Bitcoin', market_cap_rank=15,
+                   market='crypto'),
+            Ticker(id='bnb', symbol='bnb', name='BNB', market_cap_rank=4,
+                   market='crypto'),
+            Ticker(id='b', symbol='b', name='B Token', market='crypto'),
+            Ticker(id='pct', symbol='pct', name='100% Token', market_cap_rank=30,
+                   market='crypto')])
+        db.session.commit()
+
+    def tearDown(self):
+        self.redis.stop()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def ids(self, rows):
+        return [row[0] for row in rows]
+
+    def test_search_page(self):
+        rows, more = TickerRepository.search_page('BIT')
+        self.assertEqual(self.ids(rows), ['btc', 'bch'])
+        self.assertFalse(more)
+
+        # Точное совпадение символа первым, дальше по капитализации
+        rows, _ = TickerRepository.search_page('b')
+        self.assertEqual(self.ids(rows), ['b', 'btc', 'bnb', 'bch'])
+
+        # Спецсимволы LIKE ищутся как текст
+        rows, _ = TickerRepository.search_page('100%')
+        self.assertEqual(self.ids(rows), ['pct'])
+        rows, _ = TickerRepository.search_page('%')
+        self.assertEqual(self.ids(rows), [])
+
+    def test_search_page_paging(self):
+        rows, more = TickerRepository.search_page(page=1, per_page=4)
+        self.assertEqual(self.ids(rows), ['btc', 'bnb', 'wbtc', 'bch'])
+        self.assertTrue(more)
+
+        rows, more = TickerRepository.search_page(page=2, per_page=4)
+        self.assertEqual(self.ids(rows), ['pct', 'b'])
+        self.assertFalse(more)
+
+    def test_get_page_cache(self):
+        rows, more = ticker_search.get_page(' Bit ')
+        self.assertEqual(rows, [('btc', 'btc', 'Bitcoin'),
+                                ('bch', 'bch', 'Bitcoin Cash')])
+        self.assertFalse(more)
+
+        # Повторный запрос - из кэша, без запросов к базе
+        with count_queries() as statements:
+            self.assertEqual(ticker_search.get_page('bit'), (rows, more))
+        self.assertEqual(statements, [])
+
+    def test_get_page_without_redis(self):
+        with patch.object(self.mock_redis, 'get', side_effect=ConnectionError):
+            rows, _ = ticker_search.get_page('bnb')
+        self.assertEqual(rows, [('bnb', 'bnb', 'BNB')])
+
+    def test_matches(self):
+        self.assertTrue(ticker_search.matches('', 'btc', 'Bitcoin'))
+        self.assertTrue(ticker_search.matches('BIT', 'btc', 'Bitcoin'))
+        self.assertFalse(ticker_search.matches('coin', 'btc', 'Bitcoin'))
+        self.assertFalse(ticker_search.matches('b', None, None))
+
+
+class TestTickerIndex(unittest.TestCase):
+    """Класс для тестирования индекса тикеров рынка"""
+
+    def setUp(self):
+        self.app = app
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.redis = patch('portfolio_tracker.services.ticker_search.redis',
+                           new_callable=MockRedis)
+        self.mock_redis = self.redis.start()
+        ticker_search._indexes.clear()
+
+        db.session.add_all([
+            Ticker(id='btc', symbol='btc', name='Bitcoin', market_cap_rank=1,
+                   market='crypto'),
+            Ticker(id='bch', symbol='bch', name='Bitcoin Cash', market_cap_rank=20,
+                   market='crypto'),
+            Ticker(id='wbtc', symbol='wbtc', name='Wrapped Bitcoin', market_cap_rank=15,
+                   market='crypto'),
+            Ticker(id='bnb', symbol='bnb', name='BNB', market_cap_rank=4,
+                   market='crypto'),
+            Ticker(id='eth', symbol='eth', name='Ethereum', market_cap_rank=2,
+                   market='crypto'),
+            Ticker(id='coin', symbol='coin', name='Coin Token', market='crypto'),
+            Ticker(id='aapl', symbol='aapl', name='Apple', market='stocks')])
+        db.session.commit()
+
+    def tearDown(self):
+        self.redis.stop()
+        ticker_search._indexes.clear()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def ids(self, tickers):
+        return [ticker.id for ticker in tickers]
+
+    def test_search(self):
+        tickers, more = ticker_search.search_market('crypto')
+        self.assertEqual(self.ids(tickers),
+                         ['btc', 'eth', 'bnb', 'wbtc', 'bch', 'coin'])
+        self.assertFalse(more)
+
+        # Вхождение в символ или название
+        tickers, _ = ticker_search.search_market('crypto', 'itco')
+        self.assertEqual(self.ids(tickers), ['btc', 'wbtc', 'bch'])
+        tickers, _ = ticker_search.search_market('crypto', 'ere')
+        self.assertEqual(self.ids(tickers), ['eth'])
+        tickers, _ = ticker_search.search_market('crypto', 'xyz')
+        self.assertEqual(tickers, [])
+
+        # Точное совпадение символа первым
+        tickers, _ = ticker_search.search_market('crypto', 'COIN')
+        self.assertEqual(self.ids(tickers), ['coin', 'btc', 'wbtc', 'bch'])
+
+    def test_search_after(self):
+        tickers, more = ticker_search.search_market('crypto', limit=4)
+        self.assertEqual(self.ids(tickers), ['btc', 'eth', 'bnb', 'wbtc'])
+        self.assertTrue(more)
+        self.assertEqual(tickers[-1].cursor, '15:wbtc')
+
+        tickers, more = ticker_search.search_market(
+            'crypto', after=tickers[-1].cursor, limit=4)
+        self.assertEqual(self.ids(tickers), ['bch', 'coin'])
+        self.assertFalse(more)
+
+        self.assertEqual(tickers[-1].cursor, ':coin')
+
+        # Точное совпадение символа не повторяется на следующих страницах
+        tickers, more = ticker_search.search_market('crypto', 'coin', limit=2)
+        self.assertEqual(self.ids(tickers), ['coin', 'btc'])
+        self.assertTrue(more)
+        tickers, more = ticker_search.search_market(
+            'crypto', 'coin', after=tickers[-1].cursor, limit=2)
+        self.assertEqual(self.ids(tickers), ['wbtc', 'bch'])
+        self.assertFalse(more)
+
+    def test_search_after_exact(self):
+        # Точных совпадений больше страницы - листаются по порядку, затем
+        # остальные тикеры с начала
+        db.session.add_all([
+            Ticker(id=f'coin-{n}', symbol='coin', name=f'Coin {n}',
+                   market_cap_rank=rank, market='crypto')
+            for n, rank in ((1, 3), (2, 50), (3, None))])
+        db.session.commit()
+
+        ids, after, more = [], None, True
+        while more:
+            tickers, more = ticker_search.search_market(
+                'crypto', 'coin', after=after, limit=2)
+            ids.append(self.ids(tickers))
+            after = tickers[-1].cursor
+
+        self.assertEqual(ids, [['coin-1', 'coin-2'], ['coin', 'coin-3'],
+                               ['btc', 'wbtc'], ['bch']])
+
+    def test_reset_index(self):
+        ticker_search.search_market('crypto')
+
+        # Индекс построен один раз
+        db.session.add(Ticker(id='sol', symbol='sol', name='Solana',
+                              market_cap_rank=5, market='crypto'))
+        db.session.commit()
+        with count_queries() as statements:
+            tickers, _ = ticker_search.search_market('crypto', 'sol')
+        self.assertEqual(statements, [])
+        self.assertEqual(tickers, [])
+
+        # Новая версия (например, из процесса загрузчика)
+        ticker_search.reset_index('crypto')
+        tickers, _ = ticker_search.search_market('crypto', 'sol')
+        self.assertEqual(self.ids(tickers), ['sol'])
+
+        ticker_search.reset_index()
+        self.assertEqual(self.mock_redis.data['tickers.index.stocks'], b'1')
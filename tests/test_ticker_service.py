@@ -1,8 +1,13 @@
-from datetime import datetime
+from datetime import date, datetime
 import unittest
+from unittest.mock import Mock
 
-from tests import app, db
+from tests import app, count_queries, db
+from portfolio_tracker.admin.services.other_services import HistoryWriter, \
+    TickersIndex, get_tickers
 from portfolio_tracker.portfolio.models import PriceHistory, Ticker
+from portfolio_tracker.portfolio.repository import PriceHistoryRepository, \
+    TickerRepository
 
 
 class TestTickerService(unittest.TestCase):
@@ -59,5 +64,185 @@ class TestTickerService(unittest.TestCase):
         self.assertIsNotNone(self.usdt)
 
 
+class TestTickerRepository(unittest.TestCase):
+    """Класс для тестирования репозитория тикеров"""
+
+    def setUp(self):
+        self.app = app
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        db.session.add_all([
+            Ticker(id=f'coin{n}', name=f'Coin{n}', symbol=f'c{n}', price=0,
+                   market='crypto') for n in range(10)])
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+
+    def test_update_prices(self):
+        prices = {f'coin{n}': n * 1.5 for n in range(5)}
+
+        with count_queries() as statements:
+            TickerRepository.update_prices(prices)
+
+        # Один executemany на все цены
+        self.assertEqual(len(statements), 1)
+
+        db.session.expire_all()
+        for n in range(10):
+            ticker = db.session.get(Ticker, f'coin{n}')
+            self.assertEqual(ticker.price, n * 1.5 if n < 5 else 0)
+
+    def test_update_prices_empty(self):
+        with count_queries() as statements:
+            TickerRepository.update_prices({})
+
+        self.assertEqual(statements, [])
+
+
+class TestTickersIndex(unittest.TestCase):
+    """Класс для тестирования индекса тикеров загрузчиков"""
+
+    def setUp(self):
+        self.app = app
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        db.session.add_all([Ticker(id='currency_eur', name='Euro', symbol='EUR',
+                                   market='currency'),
+                            Ticker(id='currency_rub', name='Ruble', symbol='RUB',
+                                   market='currency')])
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+
+    def test_get_or_create(self):
+        tickers = TickersIndex(get_tickers('currency'), 'currency')
+        self.assertEqual(len(tickers), 2)
+
+        # Существующий тикер по внешнему ID
+        eur = tickers.get_or_create('EUR')
+        self.assertEqual(eur.id, 'currency_eur')
+        self.assertIs(tickers.get('eur'), eur)
+
+        # Новый тикер
+        gbp = tickers.get_or_create('GBP')
+        self.assertEqual(gbp.id, 'currency_gbp')
+        self.assertIs(tickers.get_or_create('GBP'), gbp)
+
+        self.assertEqual(tickers.new_ids, ['currency_gbp'])
+        self.assertEqual(tickers.not_found_ids, {'currency_rub'})
+        self.assertIsNone(tickers.get('usd'))
+
+
+class TestPriceHistoryRepository(unittest.TestCase):
+    """Класс для тестирования хранения истории цен"""
+
+    def setUp(self):
+        self.app = app
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        db.session.add_all([
+            Ticker(id='btc', name='Bitcoin', symbol='btc', market='crypto'),
+            Ticker(id='eth', name='Ethereum', symbol='eth', market='crypto')])
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_upsert(self):
+        PriceHistoryRepository.upsert([('btc', date(2024, 1, 1), 40000),
+                                       ('btc', date(2024, 1, 2), 41000)])
+        # Повторная запись даты обновляет цену
+        PriceHistoryRepository.upsert([('btc', date(2024, 1, 2), 42000),
+                                       ('eth', date(2024, 1, 2), 2300)])
+
+        rows = db.session.execute(
+            db.select(PriceHistory.ticker_id, PriceHistory.date,
+                      PriceHistory.price_usd)
+            .order_by(PriceHistory.ticker_id, PriceHistory.date)).all()
+        self.assertEqual([tuple(r) for r in rows],
+                         [('btc', date(2024, 1, 1), 40000),
+                          ('btc', date(2024, 1, 2), 42000),
+                          ('eth', date(2024, 1, 2), 2300)])
+
+        # id - автоинкремент базы
+        ids = db.session.execute(db.select(PriceHistory.id)).scalars().all()
+        self.assertEqual(len(set(ids)), 3)
+
+    def test_upsert_only_missing(self):
+        PriceHistoryRepository.upsert([('btc', date(2024, 1, 1), 40000)])
+        PriceHistoryRepository.upsert([('btc', date(2024, 1, 1), 45000),
+                                       ('btc', date(2024, 1, 2), 41000)],
+                                      only_missing=True)
+
+        rows = db.session.execute(
+            db.select(PriceHistory.date, PriceHistory.price_usd)
+            .order_by(PriceHistory.date)).all()
+        self.assertEqual([tuple(r) for r in rows],
+                         [(date(2024, 1, 1), 40000), (date(2024, 1, 2), 41000)])
+
+    def test_get_series(self):
+        PriceHistoryRepository.upsert(
+            [('btc', date(2024, 1, d), 40000 + d) for d in range(5, 0, -1)]
+            + [('eth', date(2024, 1, 3), 2300)])
+
+        with count_queries() as statements:
+            series = PriceHistoryRepository.get_series(
+                ['btc', 'eth', 'usd'], date(2024, 1, 2), date(2024, 1, 4))
+        self.assertEqual(len(statements), 1)
+
+        self.assertEqual(list(series), ['btc', 'eth'])
+        self.assertEqual([date.fromordinal(d) for d in series['btc'].dates],
+                         [date(2024, 1, d) for d in (2, 3, 4)])
+        self.assertEqual(series['btc'].prices.tolist(), [40002, 40003, 40004])
+        self.assertEqual(series['eth'].prices.tolist(), [2300])
+
+    def test_get_missing_dates(self):
+        db.session.add(Ticker(id='aapl', name='Apple', symbol='aapl', market='stocks'))
+        PriceHistoryRepository.upsert([('btc', date(2024, 1, 1), 40000),
+                                       ('btc', date(2024, 1, 3), 41000),
+                                       ('eth', date(2024, 1, 3), 2300),
+                                       ('btc', date(2023, 12, 1), 30000)])
+
+        with count_queries() as statements:
+            first = PriceHistoryRepository.get_first_missing_dates(
+                'crypto', date(2024, 1, 1), date(2024, 1, 3))
+            days = PriceHistoryRepository.get_missing_days(
+                'crypto', date(2024, 1, 1), date(2024, 1, 3))
+        self.assertEqual(len(statements), 2)
+        self.assertEqual(first, {'btc': date(2024, 1, 2),
+                                 'eth': date(2024, 1, 1)})
+        self.assertEqual(days, [date(2024, 1, 1), date(2024, 1, 2)])
+
+    def test_history_writer(self):
+        checkpoint = Mock()
+        writer = HistoryWriter(checkpoint, batch_size=3)
+
+        writer.add('btc', [('btc', date(2024, 1, d), 40000) for d in (1, 2)])
+        checkpoint.add.assert_not_called()
+
+        # Пакет заполнен - запись и отметка обработанных тикеров
+        writer.add('eth', [('eth', date(2024, 1, 1), 2300)])
+        checkpoint.add.assert_called_once_with(['btc', 'eth'])
+        self.assertEqual(writer.count, 3)
+
+        writer.add('usdt', [])
+        writer.flush()
+        checkpoint.add.assert_called_with(['usdt'])
+        self.assertEqual(db.session.execute(
+            db.select(db.func.count()).select_from(PriceHistory)).scalar(), 3)
+
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)
@@ -1,7 +1,11 @@
 from datetime import datetime
+import json
 import unittest
+from unittest.mock import patch
 
-from tests import app, db
+from tests import app, count_queries, db
+from portfolio_tracker.general_functions import actions_on_objects
+from portfolio_tracker.portfolio.services.transaction import TransactionService
 from portfolio_tracker.wallet.models import Wallet, WalletAsset
 from portfolio_tracker.portfolio.models import Asset, Portfolio, Ticker, Transaction
 
@@ -352,6 +356,75 @@ class TestTransactionService(unittest.TestCase):
         self.assertEqual(self.wallet_btc.sell_orders, 0)
         self.assertEqual(self.wallet_usdt.buy_orders, 0)
 
+    def add_buys(self, count):
+        for n in range(count):
+            transaction = Transaction(id=n + 2, type='Buy', quantity=1,
+                                      quantity2=-1, price=1, price_usd=1,
+                                      wallet_id=1, portfolio_id=1,
+                                      ticker_id='btc', ticker2_id='usdt',
+                                      date=self.date)
+            db.session.add(transaction)
+            transaction.service.update_dependencies()
+        db.session.commit()
+
+    def test_delete_many(self):
+        self.add_buys(3)
+        self.assertEqual(self.portfolio_btc.quantity, 13)
+        data = json.dumps({'ids': [2, 3, 4, 999], 'action': 'delete'})
+
+        with patch.object(db.session, 'commit', wraps=db.session.commit) as commit, \
+                count_queries() as statements:
+            actions_on_objects(data, self.portfolio_btc.service.get_transaction,
+                               self.portfolio_btc.service.get_transactions)
+
+        # Одна выборка транзакций и один commit
+        self.assertEqual(commit.call_count, 1)
+        self.assertEqual(len([s for s in statements if '.id IN (' in s]), 1)
+        self.assertEqual(self.portfolio_btc.quantity, 10)
+        self.assertEqual(self.wallet_usdt.quantity, 5)
+        self.assertEqual(db.session.scalar(db.select(db.func.count())
+                                           .select_from(Transaction)), 1)
+
+    def test_delete_many_rollback(self):
+        self.add_buys(2)
+        data = json.dumps({'ids': [2, 3], 'action': 'delete'})
+
+        update = TransactionService.update_dependencies
+        calls = []
+
+        def fail_second(service, *args, **kwargs):
+            calls.append(service)
+            if len(calls) == 2:
+                raise ValueError
+            update(service, *args, **kwargs)
+
+        with patch.object(TransactionService, 'update_dependencies', fail_second):
+            with self.assertRaises(ValueError):
+                actions_on_objects(data, self.portfolio_btc.service.get_transaction,
+                                   self.portfolio_btc.service.get_transactions)
+
+        # Изменения первой транзакции отменены
+        self.assertEqual(self.portfolio_btc.quantity, 12)
+        self.assertIsNotNone(db.session.get(Transaction, 2))
+
+    def test_convert_many(self):
+        self.add_buys(2)
+        for transaction_id in (2, 3):
+            transaction = db.session.get(Transaction, transaction_id)
+            transaction.service.update_dependencies('cancel')
+            transaction.order = True
+            transaction.service.update_dependencies()
+        db.session.commit()
+        self.assertEqual(self.portfolio_btc.buy_orders, 2)
+
+        data = json.dumps({'ids': [2, 3], 'action': 'convert_order_to_transaction'})
+        actions_on_objects(data, self.portfolio_btc.service.get_transaction,
+                           self.portfolio_btc.service.get_transactions)
+
+        self.assertEqual(self.portfolio_btc.buy_orders, 0)
+        self.assertEqual(self.portfolio_btc.quantity, 12)
+        self.assertFalse(db.session.get(Transaction, 2).order)
+
 
 if __name__ == '__main__':
     unittest.main(verbosity=2)
@@ -0,0 +1,107 @@
+import unittest
+
+from tests import app, count_queries, db
+from portfolio_tracker.repository import DefaultRepository, after_commit, \
+    commits_count, unit_of_work
+from portfolio_tracker.portfolio.models import Ticker
+
+
+class TestUnitOfWork(unittest.TestCase):
+    """Класс для тестирования единицы работы репозиториев"""
+
+    def setUp(self):
+        self.app = app
+        self.request_context = self.app.test_request_context()
+        self.request_context.push()
+        self.app.preprocess_request()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.request_context.pop()
+
+    def ticker(self, ticker_id):
+        return Ticker(id=ticker_id, symbol=ticker_id, name=ticker_id,
+                      market='crypto')
+
+    def test_without_unit_of_work(self):
+        DefaultRepository.save(self.ticker('btc'))
+        DefaultRepository.save(self.ticker('eth'))
+        self.assertEqual(commits_count(), 2)
+
+    def test_one_commit(self):
+        with unit_of_work():
+            DefaultRepository.save(self.ticker('btc'))
+            DefaultRepository.save(self.ticker('eth'))
+            # Изменения уже записаны в базу, но не сохранены
+            self.assertEqual(db.session.get(Ticker, 'btc').symbol, 'btc')
+            self.assertEqual(commits_count(), 0)
+
+            # Вложенный блок - часть внешнего
+            with unit_of_work():
+                DefaultRepository.delete(db.session.get(Ticker, 'eth'))
+            self.assertEqual(commits_count(), 0)
+
+        self.assertEqual(commits_count(), 1)
+        db.session.remove()
+        self.assertEqual(db.session.scalars(db.select(Ticker.id)).all(),
+                         ['btc'])
+
+    def test_rollback(self):
+        with self.assertRaises(ValueError):
+            with unit_of_work():
+                DefaultRepository.save(self.ticker('btc'))
+                raise ValueError
+
+        self.assertEqual(commits_count(), 0)
+        self.assertIsNone(db.session.get(Ticker, 'btc'))
+
+    def test_loaded_objects(self):
+        DefaultRepository.save(self.ticker('btc'))
+        btc = db.session.get(Ticker, 'btc')
+        btc.name
+
+        # Сохранение не сбрасывает загруженные объекты сессии
+        with unit_of_work():
+            DefaultRepository.save(self.ticker('eth'))
+            with count_queries() as statements:
+                self.assertEqual(btc.name, 'btc')
+            self.assertEqual(statements, [])
+
+    def test_after_commit(self):
+        calls = []
+        with unit_of_work():
+            DefaultRepository.save(self.ticker('btc'))
+            after_commit(calls.append, 'btc')
+            with unit_of_work():
+                after_commit(calls.append, 'eth')
+            self.assertEqual(calls, [])
+        self.assertEqual(calls, ['btc', 'eth'])
+        self.assertEqual(commits_count(), 1)
+
+        # Вне блока - сразу
+        after_commit(calls.append, 'usdt')
+        self.assertEqual(calls[-1], 'usdt')
+
+        # После отката - не вызывается
+        with self.assertRaises(ValueError):
+            with unit_of_work():
+                DefaultRepository.save(self.ticker('bnb'))
+                after_commit(calls.append, 'bnb')
+                raise ValueError
+        self.assertEqual(calls, ['btc', 'eth', 'usdt'])
+
+        # И не переносится в следующий блок
+        with unit_of_work():
+            pass
+        self.assertEqual(calls, ['btc', 'eth', 'usdt'])
+
+    def test_without_changes(self):
+        with unit_of_work():
+            db.session.get(Ticker, 'btc')
+        self.assertEqual(commits_count(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,11 +6,11 @@ from werkzeug.security import check_password_hash, generate_password_hash
 from flask import request
 
 from portfolio_tracker.portfolio.models import Asset, OtherAsset, OtherBody, \
-    OtherTransaction, Portfolio, Transaction
+    OtherTransaction, Portfolio, Ticker, Transaction
 from portfolio_tracker.wallet.models import Wallet, WalletAsset
 from portfolio_tracker.watchlist.models import Alert, WatchlistAsset
 from portfolio_tracker.user.models import User, UserInfo
-from tests import app, db
+from tests import app, count_queries, db
 
 
 class TestUser(unittest.TestCase):
@@ -179,9 +179,109 @@ class TestUserService(unittest.TestCase):
         self.user.service.unmake_admin()
         self.assertEqual(self.user.type, '')
 
+    def _positions_data(self):
+        db.session.add_all([
+            Portfolio(id=1, user_id=1, market='crypto', name='Portfolio'),
+            Wallet(id=1, user_id=1, name='Wallet'),
+            Ticker(id='btc', name='Bitcoin', symbol='btc', price=26000, market='crypto'),
+            Ticker(id='eth', name='Ethereum', symbol='eth', price=1600, market='crypto'),
+            Ticker(id='usdt', name='Tether', symbol='usdt', price=0.9, market='crypto'),
+            Asset(id=1, portfolio_id=1, ticker_id='btc', quantity=5, amount=7),
+            WalletAsset(id=1, wallet_id=1, ticker_id='btc', quantity=3)])
+
+        def trade(type, ticker_id, quantity, price, order=False):
+            return Transaction(type=type, portfolio_id=1, wallet_id=1,
+                               ticker_id=ticker_id, ticker2_id='usdt',
+                               quantity=quantity, price=price,
+                               price_usd=price * 0.9, order=order,
+                               quantity2=-quantity * price)
+
+        db.session.add_all([
+            Transaction(type='Input', portfolio_id=1, wallet_id=1,
+                        ticker_id='usdt', quantity=10000),
+            trade('Buy', 'btc', 0.2, 25000),
+            trade('Sell', 'btc', -0.05, 30000),
+            trade('Sell', 'btc', -0.1, 40000, order=True),
+            trade('Buy', 'eth', 2, 1500, order=True),
+            Transaction(type='Earning', portfolio_id=1, wallet_id=1,
+                        ticker_id='eth', quantity=0.5),
+            Transaction(type='Output', wallet_id=1, ticker_id='usdt',
+                        quantity=-100)])
+        db.session.commit()
+
+    def _snapshot(self):
+        assets = db.session.execute(db.select(Asset)).scalars()
+        wallet_assets = db.session.execute(db.select(WalletAsset)).scalars()
+        return (
+            {a.ticker_id: (a.quantity, a.amount, a.buy_orders, a.sell_orders)
+             for a in assets},
+            {a.ticker_id: (a.quantity, a.buy_orders, a.sell_orders)
+             for a in wallet_assets})
+
+    def assertSnapshotEqual(self, first, second):
+        for assets1, assets2 in zip(first, second):
+            self.assertEqual(set(assets1), set(assets2))
+            for ticker_id, values in assets1.items():
+                for value1, value2 in zip(values, assets2[ticker_id]):
+                    self.assertAlmostEqual(value1, value2, places=6)
+
     def test_recalculate(self):
-        # ToDo
-        pass
+        self._positions_data()
+
+        # Ожидаемое - последовательное применение транзакций
+        for asset in db.session.execute(db.select(Asset)).scalars():
+            asset.service.set_default_data()
+        for asset in db.session.execute(db.select(WalletAsset)).scalars():
+            asset.service.set_default_data()
+        transactions = db.session.execute(
+            db.select(Transaction).order_by(Transaction.id)).scalars().all()
+        for t in transactions:
+            t.service.update_dependencies()
+        db.session.commit()
+        expected = self._snapshot()
+
+        # Искажаем активы и пересчитываем
+        db.session.execute(db.update(Asset).values(quantity=1, amount=1,
+                                                   buy_orders=1, sell_orders=1))
+        db.session.execute(db.update(WalletAsset).values(quantity=1, buy_orders=1,
+                                                         sell_orders=1))
+        db.session.expire_all()
+        self.user.service.recalculate()
+        db.session.commit()
+
+        self.assertSnapshotEqual(self._snapshot(), expected)
+        self.assertEqual(len(expected[0]), 3)
+
+    def test_recalculate_since(self):
+        self._positions_data()
+        self.user.service.recalculate()
+        db.session.commit()
+        expected = self._snapshot()
+
+        # Не затронутый новой транзакцией актив не пересчитывается
+        wallet_btc = db.session.get(WalletAsset, 1)
+        wallet_btc.quantity = 100
+        transaction = Transaction(type='Buy', portfolio_id=1, wallet_id=1,
+                                  ticker_id='eth', ticker2_id='usdt',
+                                  quantity=1, quantity2=-1500, price=1500,
+                                  price_usd=1350)
+        db.session.add(transaction)
+        db.session.commit()
+        since_id = transaction.id
+        self.user.id
+
+        with count_queries() as statements:
+            self.user.service.recalculate(since_id=since_id)
+        db.session.commit()
+
+        assets, wallet_assets = self._snapshot()
+        self.assertEqual(wallet_assets['btc'][0], 100)
+        self.assertAlmostEqual(assets['eth'][0], expected[0]['eth'][0] + 1)
+        self.assertAlmostEqual(wallet_assets['usdt'][0],
+                               expected[1]['usdt'][0] - 1500)
+        # Портфели, кошельки, затронутые активы, позиции и активы (с записью
+        # изменений) - без запросов на каждую транзакцию
+        self.assertLessEqual(len(statements), 8)
 
     def test_create_portfolio(self):
         portfolio = self.user.service.create_portfolio()
@@ -0,0 +1,157 @@
+from array import array
+from datetime import date, datetime, timedelta
+import unittest
+from unittest.mock import patch
+
+from tests import app, db
+from portfolio_tracker.portfolio.models import Portfolio, PriceHistory, \
+    Ticker, Transaction
+from portfolio_tracker.portfolio.repository import PriceHistoryRepository, \
+    PriceSeries
+from portfolio_tracker.portfolio.services import value_series
+from portfolio_tracker.portfolio.services.value_series import \
+    calculate_series, get_value_series, invalidate_value_series
+
+
+class MockRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def pipeline(self):
+        return MockPipeline(self)
+
+
+class MockPipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            self.calls.append((getattr(self.redis, name), args, kwargs))
+        return call
+
+    def execute(self):
+        return [method(*args, **kwargs) for method, args, kwargs in self.calls]
+
+
+class TestCalculateSeries(unittest.TestCase):
+    """Класс для тестирования расчета динамики портфеля"""
+
+    def test_calculate_series(self):
+        start = date(2024, 1, 1)
+        prices = {'btc': PriceSeries(
+            array('l', [date(2024, 1, 2).toordinal(), date(2024, 1, 4).toordinal()]),
+            array('d', [20, 40]))}
+
+        value, amount, invested = calculate_series(
+            start, date(2024, 1, 5),
+            positions={'btc': (1, 10), 'usdt': (-10, -10)},
+            changes=[(date(2024, 1, 3), 'btc', 1, 30)],
+            prices=prices, last_prices={'btc': 10, 'usdt': 1},
+            end_prices={'btc': 50})
+
+        # Цена btc по дням: 10 (до периода), 20, 20 (пропуск), 40, 50 (текущая)
+        self.assertEqual(value.tolist(), [0, 10, 30, 70, 90])
+        self.assertEqual(amount.tolist(), [0, 0, 30, 30, 30])
+        self.assertEqual(invested.tolist(), [10, 10, 40, 40, 40])
+
+
+class TestValueSeries(unittest.TestCase):
+    """Класс для тестирования кэша динамики портфеля"""
+
+    def setUp(self):
+        self.app = app
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.redis = patch('portfolio_tracker.portfolio.services.value_series.redis',
+                           new_callable=MockRedis)
+        self.redis.start()
+
+        self.today = datetime.now().date()
+        self.start = self.today - timedelta(days=4)
+        db.session.add_all([
+            Ticker(id='btc', name='Bitcoin', symbol='btc', market='crypto', price=50),
+            Ticker(id='usdt', name='Tether', symbol='usdt', market='crypto', price=1),
+            Portfolio(id=1, user_id=1, market='crypto', name='Test')])
+        self.add_transaction(self.start, 1, 10)
+        PriceHistoryRepository.upsert(
+            [('btc', self.start + timedelta(days=n), 10 * (n + 1)) for n in range(4)]
+            + [('usdt', self.start + timedelta(days=n), 1) for n in range(4)])
+        # История записана давно (до проверок ряда)
+        db.session.execute(db.update(PriceHistory)
+                           .values(updated_at=datetime(2000, 1, 1)))
+        db.session.commit()
+
+    def tearDown(self):
+        self.redis.stop()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def add_transaction(self, day, quantity, price):
+        db.session.add(Transaction(
+            type='Buy', portfolio_id=1, wallet_id=1, date=datetime.combine(day, datetime.min.time()),
+            ticker_id='btc', ticker2_id='usdt', quantity=quantity,
+            quantity2=-quantity * price, price=price, price_usd=price, order=False))
+        db.session.commit()
+
+    def test_get_value_series(self):
+        series = get_value_series(1)
+
+        self.assertEqual(series.dates()[0], self.start)
+        self.assertEqual(series.end, self.today)
+        # btc по истории цен и текущей цене, usdt - -10
+        self.assertEqual(series.value.tolist(), [0, 10, 20, 30, 40])
+        self.assertEqual(series.profit.tolist(), [0, 10, 20, 30, 40])
+
+    def test_incremental(self):
+        get_value_series(1)
+
+        # Новая транзакция - пересчет с ее даты, прежние дни из кэша
+        self.add_transaction(self.start + timedelta(days=2), 1, 30)
+        with patch.object(value_series, 'calculate_series',
+                          wraps=value_series.calculate_series) as calculate:
+            series = get_value_series(1)
+        self.assertEqual(calculate.call_args.args[0], self.start + timedelta(days=2))
+        self.assertEqual(series.value.tolist(), [0, 10, 20 + 0, 30 + 10, 40 + 20])
+
+        # Отметка об изменении транзакции
+        invalidate_value_series(1, self.start + timedelta(days=1))
+        db.session.execute(db.update(Transaction).values(quantity=2, quantity2=-60)
+                           .where(Transaction.price == 30))
+        db.session.commit()
+        self.assertEqual(get_value_series(1).value.tolist(),
+                         [0, 10, 20, 30 + 20, 40 + 40])
+
+    def test_price_corrected(self):
+        get_value_series(1)
+
+        # Исправленная цена существующего дня - пересчет с этого дня
+        PriceHistoryRepository.upsert([('btc', self.start + timedelta(days=1), 25)])
+        with patch.object(value_series, 'calculate_series',
+                          wraps=value_series.calculate_series) as calculate:
+            series = get_value_series(1)
+        self.assertEqual(calculate.call_args.args[0], self.start + timedelta(days=1))
+        self.assertEqual(series.value.tolist(), [0, 15, 20, 30, 40])
+
+        # Та же цена не считается изменением
+        db.session.execute(db.update(PriceHistory)
+                           .values(updated_at=datetime(2000, 1, 1)))
+        db.session.commit()
+        PriceHistoryRepository.upsert([('btc', self.start + timedelta(days=1), 25)])
+        with patch.object(value_series, 'calculate_series',
+                          wraps=value_series.calculate_series) as calculate:
+            get_value_series(1)
+        self.assertEqual(calculate.call_args.args[0], self.today)
@@ -3,7 +3,68 @@ from unittest.mock import patch
 
 from portfolio_tracker.portfolio.models import Ticker
 from portfolio_tracker.watchlist.models import Alert, WatchlistAsset
-from tests import app, db
+from portfolio_tracker.admin.services.other_services import alerts_update
+from portfolio_tracker.watchlist.services import alert_index
+from tests import app, count_queries, db
+
+
+class MockRedis:
+    """Строки, множества и отсортированные множества в памяти"""
+
+    def __init__(self):
+        self.data = {}
+
+    def exists(self, key):
+        return int(key in self.data)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def sadd(self, key, *values):
+        self.data.setdefault(key, set()).update(values)
+
+    def smembers(self, key):
+        return {str(v).encode() for v in self.data.get(key, ())}
+
+    def zadd(self, key, mapping):
+        self.data.setdefault(key, {}).update(mapping)
+
+    def zrem(self, key, *members):
+        for member in members:
+            self.data.get(key, {}).pop(member, None)
+
+    def _range(self, key, min_, max_):
+        items = sorted(self.data.get(key, {}).items(), key=lambda i: i[1])
+        return [m for m, score in items if float(min_) <= score <= float(max_)]
+
+    def zrangebyscore(self, key, min_, max_):
+        return [str(m).encode() for m in self._range(key, min_, max_)]
+
+    def zremrangebyscore(self, key, min_, max_):
+        members = self._range(key, min_, max_)
+        self.zrem(key, *members)
+        return len(members)
+
+    def pipeline(self):
+        return MockPipeline(self)
+
+
+class MockPipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            self.calls.append((getattr(self.redis, name), args, kwargs))
+        return call
+
+    def execute(self):
+        return [method(*args, **kwargs) for method, args, kwargs in self.calls]
 
 
 class TestWalletAssetService(unittest.TestCase):
@@ -24,7 +85,12 @@ class TestWalletAssetService(unittest.TestCase):
         db.session.add_all([self.alert, self.usdt, self.btc, self.asset])
         db.session.commit()
 
+        self.redis = patch('portfolio_tracker.watchlist.services.alert_index.redis',
+                           new_callable=MockRedis)
+        self.mock_redis = self.redis.start()
+
     def tearDown(self):
+        self.redis.stop()
         db.session.remove()
         db.drop_all()
 
@@ -63,5 +129,115 @@ class TestWalletAssetService(unittest.TestCase):
         mock_delete.assert_not_called()
 
 
+class TestAlertsUpdate(unittest.TestCase):
+    """Класс для тестирования срабатывания уведомлений"""
+
+    def setUp(self):
+        self.app = app
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        db.session.add_all([
+            Ticker(id='btc', name='Bitcoin', price=55000, symbol='btc', market='crypto'),
+            Ticker(id='eth', name='Ethereum', price=0, symbol='eth', market='crypto'),
+            Ticker(id='aapl', name='Apple', price=150, symbol='aapl', market='stocks'),
+            WatchlistAsset(id=1, user_id=1, ticker_id='btc', comment=''),
+            WatchlistAsset(id=2, user_id=1, ticker_id='eth', comment=''),
+            WatchlistAsset(id=3, user_id=1, ticker_id='aapl', comment=''),
+        ])
+        alerts = [
+            # Сработают
+            (1, 60000, 'down', 'on'), (1, 50000, 'up', 'on'),
+            # Цена не достигнута
+            (1, 50000, 'down', 'on'), (1, 60000, 'up', 'on'),
+            # Выключено или уже сработало
+            (1, 60000, 'down', 'off'), (1, 60000, 'down', 'worked'),
+            # Нет цены тикера
+            (2, 1000, 'down', 'on'),
+            # Другой рынок
+            (3, 200, 'down', 'on'),
+        ]
+        db.session.add_all([
+            Alert(id=n, watchlist_asset_id=asset_id, price=price, price_usd=price,
+                  price_ticker_id='', type=type, status=status, comment='')
+            for n, (asset_id, price, type, status) in enumerate(alerts, 1)])
+        db.session.commit()
+
+        self.redis = patch('portfolio_tracker.watchlist.services.alert_index.redis',
+                           new_callable=MockRedis)
+        self.mock_redis = self.redis.start()
+
+    def tearDown(self):
+        self.redis.stop()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_alerts_update(self):
+        with count_queries() as statements:
+            worked = alerts_update('crypto')
+
+        self.assertEqual(sorted(worked), [1, 2])
+        statuses = dict(db.session.execute(db.select(Alert.id, Alert.status)).all())
+        self.assertEqual(statuses, {1: 'worked', 2: 'worked', 3: 'on', 4: 'on',
+                                    5: 'off', 6: 'worked', 7: 'on', 8: 'on'})
+        # Один UPDATE вместо загрузки активов и уведомлений
+        self.assertEqual(len([s for s in statements if s.startswith('UPDATE')]), 1)
+        self.assertFalse([s for s in statements if s.startswith('SELECT')])
+
+    def test_alerts_update_price_usd(self):
+        # Цена уведомления в другой валюте - сравнение по цене в USD
+        alert = db.session.get(Alert, 3)
+        alert.price, alert.price_usd = 1, 56000
+        db.session.commit()
+
+        self.assertIn(3, alerts_update('crypto'))
+
+    def test_alert_index_crossed(self):
+        index = alert_index.get_alert_index('crypto')
+        self.assertTrue(index.is_built())
+
+        # Пороги, достигнутые новой ценой, извлекаются из индекса
+        self.assertEqual(sorted(index.crossed({'btc': 55000})), [1, 2])
+        self.assertEqual(index.crossed({'btc': 55000}), [])
+        self.assertEqual(sorted(index.crossed({'btc': 49000, 'eth': 0})), [3])
+        self.assertEqual(index.crossed({'btc': 61000}), [4])
+        self.assertEqual(index.crossed({'eth': 1}), [7])
+
+    def test_alert_index_shared(self):
+        index = alert_index.get_alert_index('crypto')
+        index.crossed({'btc': 55000})
+
+        # Построенный индекс не перестраивается (общий для процессов)
+        with count_queries() as statements:
+            index = alert_index.get_alert_index('crypto')
+        self.assertEqual(statements, [])
+        self.assertEqual(index.crossed({'btc': 55000}), [])
+
+        # Перестроение по базе
+        index.load()
+        self.assertEqual(sorted(index.crossed({'btc': 55000})), [1, 2])
+
+    def test_alert_index_service(self):
+        index = alert_index.get_alert_index('crypto')
+        alert = db.session.get(Alert, 3)
+
+        alert.service.turn_off()
+        self.assertNotIn(3, index.crossed({'btc': 40000}))
+        alert.service.turn_on()
+        self.assertEqual(index.crossed({'btc': 40000}), [3])
+
+        alert.service.turn_on()
+        with patch('portfolio_tracker.watchlist.repository.AlertRepository.delete'):
+            alert.service.delete()
+        self.assertNotIn(3, index.crossed({'btc': 40000}))
+
+    def test_alert_index_without_redis(self):
+        index = alert_index.get_alert_index('crypto')
+        with patch.object(MockPipeline, 'execute', side_effect=ConnectionError):
+            self.assertEqual(index.crossed({'btc': 55000}), [])
+
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)